@@ -0,0 +1,178 @@
+"""
+端到端吞吐量基准测试
+在本地模拟服务器上依次运行 main.py、get_index.py、get_current_ranks.py 和
+IndexUploader.run，统计每一步的耗时、请求数、每秒请求数和重试次数
+
+用法:
+    python -m benchmarks.e2e --subjects 600 --latency 0.02 --error-rate 0.05
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from benchmarks.fake_server import FakeBangumiServer, create_state
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPORT_DIR = os.path.join("output", "bench")
+
+# 在子进程中运行上传器：数据文件路径在脚本中写死，需要指向工作目录
+UPLOADER_DRIVER = """
+import sys
+from pathlib import Path
+sys.path.insert(0, {repo_root!r})
+import upload_to_index
+upload_to_index.DATA_FILE = Path({data_file!r})
+upload_to_index.LAST_YEAR_INDICES_DIR = Path("output/indices")
+upload_to_index.LAST_YEAR_RANKS_DIR = Path("output/ranks")
+upload_to_index.IndexUploader().run()
+"""
+
+
+def build_steps(year: int) -> List[Dict]:
+    """
+    生成按顺序执行的基准测试步骤
+
+    Args:
+        year: main.py 导出的年份
+
+    Returns:
+        [{"name": 步骤名, "argv": 命令行}, ...]
+    """
+    data_file = os.path.join("output", "json", f"bangumi_worst_anime_{year}.json")
+    return [
+        {"name": "main.py", "argv": [sys.executable, os.path.join(REPO_ROOT, "main.py"),
+                                     "--year", str(year)]},
+        {"name": "get_index.py", "argv": [sys.executable, os.path.join(REPO_ROOT, "get_index.py"),
+                                          "--force"]},
+        {"name": "get_current_ranks.py", "argv": [sys.executable,
+                                                  os.path.join(REPO_ROOT, "get_current_ranks.py")]},
+        {"name": "IndexUploader.run", "argv": [sys.executable, "-c", UPLOADER_DRIVER.format(
+            repo_root=REPO_ROOT, data_file=data_file)]},
+    ]
+
+
+def run_step(step: Dict, server: FakeBangumiServer, env: Dict, workdir: str, verbose: bool) -> Dict:
+    """
+    运行单个步骤并根据服务器统计计算吞吐量
+
+    Args:
+        step: 步骤定义
+        server: 模拟服务器
+        env: 子进程环境变量
+        workdir: 子进程工作目录
+        verbose: 是否输出子进程日志
+
+    Returns:
+        步骤结果
+    """
+    server.state.reset_stats()
+    start = time.perf_counter()
+    completed = subprocess.run(step["argv"], cwd=workdir, env=env,
+                               stdout=None if verbose else subprocess.DEVNULL,
+                               stderr=None if verbose else subprocess.PIPE)
+    wall_time = time.perf_counter() - start
+    stats = server.state.stats()
+
+    retries = sum(count for statuses in stats["statuses"].values()
+                  for status, count in statuses.items() if int(status) == 429 or int(status) >= 500)
+    return {
+        "name": step["name"],
+        "exit_code": completed.returncode,
+        "wall_time": round(wall_time, 4),
+        "requests": stats["total_requests"],
+        "requests_per_second": round(stats["total_requests"] / wall_time, 2) if wall_time else 0.0,
+        "retries": retries,
+        "rate_limited": stats["rate_limited_429"],
+        "injected_429": stats["injected_429"],
+        "bytes_received": stats["bytes_sent"],
+        "requests_by_endpoint": stats["requests"],
+        "stderr": (completed.stderr or b"").decode("utf-8", "replace")[-2000:] if completed.returncode else "",
+    }
+
+
+def run_benchmark(args) -> Dict:
+    """启动模拟服务器并依次运行所有步骤"""
+    from config.config import NEW_INDEX_ID, OLD_INDEX_ID
+
+    state = create_state(args.subjects, index_ids=(OLD_INDEX_ID, NEW_INDEX_ID),
+                         recorded_dir=args.recorded, latency=args.latency, jitter=args.jitter,
+                         error_rate=args.error_rate, rate_limit=args.rate_limit, seed=args.seed)
+
+    with FakeBangumiServer(state) as server, tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ)
+        env.update({
+            "BANGUMI_BASE_URL": server.url,
+            "BANGUMI_ACCESS_TOKEN": "benchmark-token",
+            "BANGUMI_RATE_LIMIT_DELAY": str(args.rate_limit_delay),
+            "BANGUMI_RETRY_DELAY": str(args.retry_delay),
+            "PYTHONIOENCODING": "utf-8",
+        })
+
+        results = []
+        for step in build_steps(args.year):
+            result = run_step(step, server, env, workdir, args.verbose)
+            results.append(result)
+            status = "OK" if result["exit_code"] == 0 else f"exit {result['exit_code']}"
+            print(f"  {result['name']:<22s} {result['wall_time']:>8.2f}s "
+                  f"{result['requests']:>6d} req {result['requests_per_second']:>8.2f} req/s "
+                  f"{result['retries']:>4d} retries  [{status}]")
+            if result["exit_code"] and result["stderr"]:
+                print(result["stderr"])
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "config": {k: v for k, v in vars(args).items() if k != "verbose"},
+        "subjects": len(state.subjects),
+        "steps": results,
+        "total_wall_time": round(sum(r["wall_time"] for r in results), 4),
+        "total_requests": sum(r["requests"] for r in results),
+    }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="在本地模拟服务器上运行端到端基准测试")
+    parser.add_argument("--subjects", type=int, default=600, help="合成条目数量")
+    parser.add_argument("--recorded", default=None, metavar="DIR",
+                        help="使用 output/debug 中录制的搜索响应作为数据")
+    parser.add_argument("--year", type=int, default=datetime.now().year)
+    parser.add_argument("--latency", type=float, default=0.01, help="服务器每个请求的固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="服务器额外随机延迟上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="服务器随机返回429的概率")
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="服务器每秒允许的请求数（0为不限制）")
+    parser.add_argument("--rate-limit-delay", type=float, default=0.0,
+                        help="客户端请求间隔（覆盖 RATE_LIMIT_DELAY）")
+    parser.add_argument("--retry-delay", type=float, default=0.05,
+                        help="客户端重试延迟（覆盖 RETRY_DELAY）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="报告文件路径（默认写入 output/bench/）")
+    parser.add_argument("--verbose", action="store_true", help="输出各脚本的日志")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("端到端基准测试")
+    print("=" * 60)
+    report = run_benchmark(args)
+
+    output = args.output
+    if output is None:
+        os.makedirs(REPORT_DIR, exist_ok=True)
+        output = os.path.join(REPORT_DIR, f"e2e_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print("-" * 60)
+    print(f"总耗时: {report['total_wall_time']:.2f}s, 总请求数: {report['total_requests']}")
+    print(f"报告已保存到: {output}")
+    return 0 if all(r["exit_code"] == 0 for r in report["steps"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,466 @@
+"""
+本地模拟 Bangumi API 服务器
+提供搜索、条目、索引查询和索引写入接口，用于离线测量各脚本的性能
+
+支持的接口:
+1. POST /v0/search/subjects - 搜索条目（支持 type / rank / nsfw 过滤）
+2. GET  /v0/subjects/{id} - 获取条目信息
+3. GET  /v0/indices/{id} - 获取索引基本信息
+4. GET  /v0/indices/{id}/subjects - 获取索引中的条目列表
+5. PUT  /v0/indices/{id} - 更新索引信息
+6. PUT  /v0/indices/{id}/subjects/{subject_id} - 添加或修改索引条目
+7. GET  /__stats - 服务器统计（请求数、状态码、注入的429次数）
+
+用法:
+    python -m benchmarks.fake_server --port 8765 --latency 0.02 --error-rate 0.05
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.synthetic import generate_subjects
+from src.clock import SystemClock
+
+
+# 路径模式 -> 统计用的端点名
+ROUTES = [
+    ("POST", re.compile(r"^/v0/search/subjects$"), "search_subjects"),
+    ("GET", re.compile(r"^/v0/subjects/(\d+)$"), "get_subject"),
+    ("GET", re.compile(r"^/v0/indices/(\d+)$"), "get_index"),
+    ("GET", re.compile(r"^/v0/indices/(\d+)/subjects$"), "get_index_subjects"),
+    ("PUT", re.compile(r"^/v0/indices/(\d+)$"), "put_index"),
+    ("PUT", re.compile(r"^/v0/indices/(\d+)/subjects/(\d+)$"), "put_index_subject"),
+]
+
+
+def generate_band_subjects(count: int = 600, seed: int = 0, nsfw_ratio: float = 0.1,
+                           subject_type: int = 2, id_start: int = 100000) -> List[Dict]:
+    """
+    生成排名靠后的合成条目，rank 从 10000 - count 递增到 9999
+
+    Args:
+        count: 条目数量
+        seed: 随机种子
+        nsfw_ratio: 受限内容比例
+        subject_type: 条目类型
+        id_start: 第一个条目的ID
+
+    Returns:
+        与 /v0/subjects/{id} 响应结构一致的条目列表
+    """
+    return generate_subjects(count, seed=seed, nsfw_ratio=nsfw_ratio,
+                             subject_type=subject_type, rank_start=10000 - count, id_start=id_start)
+
+
+def build_index(index_id: int, subjects: List[Dict], top_n: int = 100) -> Dict:
+    """
+    用合成条目构造一个与线上格式一致的排行索引
+
+    普通条目录入索引并带有排名comment，受限条目写入描述中
+
+    Args:
+        index_id: 索引ID
+        subjects: 条目列表
+        top_n: 排行条目数量
+
+    Returns:
+        {"info": 索引信息, "subjects": 索引条目列表}
+    """
+    ranked = sorted(subjects, key=lambda s: -s["rating"]["rank"])[:top_n]
+    desc_lines = ["根据制表时的排名倒序排序", "受限条目不直接录入，在此单独列出："]
+    index_subjects = []
+    for position, subject in enumerate(ranked, 1):
+        if subject["nsfw"]:
+            desc_lines.append(f"{position} - [url=https://bgm.tv/subject/{subject['id']}]"
+                              f"{subject['name_cn']}[/url]")
+        else:
+            entry = {k: subject[k] for k in ("id", "type", "name", "name_cn", "image", "date")}
+            entry.update({"infobox": [], "comment": f"{position} -",
+                          "added_at": "2025-01-01T00:00:00Z"})
+            index_subjects.append(entry)
+
+    info = {
+        "id": index_id,
+        "title": f"模拟索引 {index_id}",
+        "desc": "\r\n".join(desc_lines),
+        "total": len(index_subjects),
+        "stat": {"comments": 0, "collects": 0},
+        "created_at": "2025-01-01T00:00:00Z",
+        "updated_at": "2025-01-01T00:00:00Z",
+        "creator": {"username": "fake", "nickname": "fake"},
+        "creator_id": 1,
+        "ban": False,
+        "nsfw": False,
+    }
+    return {"info": info, "subjects": index_subjects}
+
+
+def load_recorded_subjects(debug_dir: str) -> List[Dict]:
+    """
+    从 output/debug 中保存的搜索响应加载真实条目数据
+
+    Args:
+        debug_dir: 调试输出目录
+
+    Returns:
+        按ID去重后的条目列表
+    """
+    subjects = {}
+    for filename in sorted(os.listdir(debug_dir)):
+        if not filename.startswith("api_response_offset_"):
+            continue
+        with open(os.path.join(debug_dir, filename), "r", encoding="utf-8") as f:
+            result = json.load(f)
+        for item in (result or {}).get("data", []):
+            subjects[item["id"]] = item
+    return list(subjects.values())
+
+
+class FakeBangumiState:
+    """模拟服务器的数据、故障注入配置和统计"""
+
+    def __init__(self, subjects: List[Dict], indices: Dict[int, Dict],
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit: float = 0.0, seed: int = 0, clock: SystemClock = None):
+        """
+        Args:
+            subjects: 条目列表
+            indices: {索引ID: {"info": ..., "subjects": [...]}}
+            latency: 每个请求的固定延迟（秒）
+            jitter: 额外的随机延迟上限（秒）
+            error_rate: 随机返回429的概率
+            rate_limit: 每秒允许的请求数，超出时返回429（0表示不限制）
+            seed: 随机种子
+            clock: 计算限速和模拟延迟的时钟（与客户端共享 VirtualClock 时可模拟长时间运行）
+        """
+        self.subjects = {s["id"]: s for s in subjects}
+        self.indices = indices
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.clock = clock or SystemClock()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = rate_limit
+        self._last_refill = self.clock.now()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """清空统计"""
+        with self._lock:
+            self.started_at = self.clock.now()
+            self.requests = Counter()
+            self.statuses = defaultdict(Counter)
+            self.injected_429 = 0
+            self.rate_limited_429 = 0
+            self.bytes_sent = 0
+
+    def stats(self) -> Dict:
+        """返回统计快照"""
+        with self._lock:
+            return {
+                "elapsed": self.clock.now() - self.started_at,
+                "requests": dict(self.requests),
+                "total_requests": sum(self.requests.values()),
+                "statuses": {k: dict(v) for k, v in self.statuses.items()},
+                "injected_429": self.injected_429,
+                "rate_limited_429": self.rate_limited_429,
+                "bytes_sent": self.bytes_sent,
+            }
+
+    def record(self, endpoint: str, status: int, size: int):
+        """记录一次响应"""
+        with self._lock:
+            self.requests[endpoint] += 1
+            self.statuses[endpoint][str(status)] += 1
+            self.bytes_sent += size
+
+    def should_throttle(self) -> Optional[str]:
+        """判断本次请求是否应返回429，返回原因或None"""
+        with self._lock:
+            if self.rate_limit > 0:
+                now = self.clock.now()
+                self._tokens = min(self.rate_limit,
+                                   self._tokens + (now - self._last_refill) * self.rate_limit)
+                self._last_refill = now
+                if self._tokens < 1:
+                    self.rate_limited_429 += 1
+                    return "rate_limit"
+                self._tokens -= 1
+            if self.error_rate > 0 and self._rng.random() < self.error_rate:
+                self.injected_429 += 1
+                return "injected"
+        return None
+
+    def delay(self) -> float:
+        """本次请求的模拟延迟"""
+        with self._lock:
+            return self.latency + (self._rng.random() * self.jitter if self.jitter else 0.0)
+
+    def search(self, payload: Dict, limit: int, offset: int) -> Dict:
+        """按搜索条件过滤条目，按rank升序分页"""
+        filters = payload.get("filter", {})
+        types = filters.get("type") or []
+        rank_filters = filters.get("rank") or []
+        include_nsfw = filters.get("nsfw", False)
+
+        def matches(subject: Dict) -> bool:
+            if types and subject.get("type") not in types:
+                return False
+            if subject.get("nsfw") and not include_nsfw:
+                return False
+            rank = subject.get("rating", {}).get("rank", 0)
+            for expr in rank_filters:
+                op, value = re.match(r"^([<>]=?)(\d+)$", expr).groups()
+                value = int(value)
+                if ((op == ">" and not rank > value) or (op == ">=" and not rank >= value)
+                        or (op == "<" and not rank < value) or (op == "<=" and not rank <= value)):
+                    return False
+            return True
+
+        hits = sorted((s for s in self.subjects.values() if matches(s)),
+                      key=lambda s: s.get("rating", {}).get("rank", 0))
+        return {"total": len(hits), "limit": limit, "offset": offset,
+                "data": hits[offset:offset + limit]}
+
+
+class FakeBangumiHandler(BaseHTTPRequestHandler):
+    """模拟服务器请求处理"""
+
+    server_version = "FakeBangumi/1.0"
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分开写出，保持连接时避免 Nagle 算法与延迟确认叠加造成每个请求约 40ms 的等待
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionResetError:
+            # 客户端丢弃了未读完的流式响应（如 429）所在的连接
+            pass
+
+    @property
+    def state(self) -> FakeBangumiState:
+        return self.server.state
+
+    def _send(self, endpoint: str, status: int, body=None):
+        payload = b"" if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        if payload:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if payload:
+            self.wfile.write(payload)
+        self.state.record(endpoint, status, len(payload))
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode("utf-8"))
+
+    def _dispatch(self, method: str):
+        parsed = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        body = self._read_json() if method in ("POST", "PUT") else {}
+
+        if method == "GET" and parsed.path == "/__stats":
+            self._send("__stats", 200, self.state.stats())
+            return
+
+        for route_method, pattern, endpoint in ROUTES:
+            match = pattern.match(parsed.path)
+            if route_method == method and match:
+                break
+        else:
+            self._send("unknown", 404, {"title": "Not Found"})
+            return
+
+        delay = self.state.delay()
+        if delay:
+            self.state.clock.sleep(delay)
+
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            self._send(endpoint, 401, {"title": "Unauthorized"})
+            return
+
+        if self.state.should_throttle():
+            self._send(endpoint, 429, {"title": "Too Many Requests"})
+            return
+
+        args = [int(g) for g in match.groups()]
+        status, result = getattr(self, f"_handle_{endpoint}")(*args, query=query, body=body)
+        self._send(endpoint, status, result)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def _handle_search_subjects(self, query: Dict, body: Dict):
+        limit = int(query.get("limit", 10))
+        offset = int(query.get("offset", 0))
+        return 200, self.state.search(body, limit, offset)
+
+    def _handle_get_subject(self, subject_id: int, query: Dict, body: Dict):
+        subject = self.state.subjects.get(subject_id)
+        if subject is None:
+            return 404, {"title": "Not Found"}
+        return 200, subject
+
+    def _handle_get_index(self, index_id: int, query: Dict, body: Dict):
+        index = self.state.indices.get(index_id)
+        if index is None:
+            return 404, {"title": "Not Found"}
+        return 200, index["info"]
+
+    def _handle_get_index_subjects(self, index_id: int, query: Dict, body: Dict):
+        index = self.state.indices.get(index_id)
+        if index is None:
+            return 404, {"title": "Not Found"}
+        subject_type = int(query["type"]) if "type" in query else None
+        limit = int(query.get("limit", 30))
+        offset = int(query.get("offset", 0))
+        items = [s for s in index["subjects"] if subject_type is None or s.get("type") == subject_type]
+        return 200, {"total": len(items), "limit": limit, "offset": offset,
+                     "data": items[offset:offset + limit]}
+
+    def _handle_put_index(self, index_id: int, query: Dict, body: Dict):
+        index = self.state.indices.get(index_id)
+        if index is None:
+            return 404, {"title": "Not Found"}
+        index["info"]["title"] = body.get("title", index["info"]["title"])
+        index["info"]["desc"] = body.get("description", index["info"]["desc"])
+        return 200, None
+
+    def _handle_put_index_subject(self, index_id: int, subject_id: int, query: Dict, body: Dict):
+        index = self.state.indices.get(index_id)
+        if index is None:
+            return 404, {"title": "Not Found"}
+        subject = self.state.subjects.get(subject_id, {"id": subject_id, "type": 2})
+        for entry in index["subjects"]:
+            if entry["id"] == subject_id:
+                entry["comment"] = body.get("comment", entry.get("comment", ""))
+                break
+        else:
+            index["subjects"].append({
+                "id": subject_id, "type": subject.get("type", 2),
+                "name": subject.get("name", ""), "name_cn": subject.get("name_cn", ""),
+                "comment": body.get("comment", ""),
+            })
+            index["info"]["total"] = len(index["subjects"])
+        return 200, None
+
+
+class FakeBangumiServer:
+    """在后台线程中运行的模拟服务器"""
+
+    def __init__(self, state: FakeBangumiState, host: str = "127.0.0.1", port: int = 0):
+        self.state = state
+        self.httpd = ThreadingHTTPServer((host, port), FakeBangumiHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = state
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeBangumiServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def create_state(subject_count: int = 600, index_ids: tuple = (), recorded_dir: str = None,
+                 subject_types: tuple = (2,), **options) -> FakeBangumiState:
+    """
+    构造模拟服务器状态
+
+    Args:
+        subject_count: 合成条目数量（使用录制数据时忽略）
+        index_ids: 需要提供的索引ID
+        recorded_dir: 录制数据目录（output/debug），为空时使用合成数据
+        subject_types: 生成合成条目的类型，每个类型 subject_count 个条目
+        **options: 传给 FakeBangumiState 的延迟和故障注入参数
+
+    Returns:
+        模拟服务器状态
+    """
+    if recorded_dir:
+        subjects = load_recorded_subjects(recorded_dir)
+    else:
+        subjects = []
+        for position, subject_type in enumerate(subject_types):
+            subjects += generate_band_subjects(subject_count, seed=options.get("seed", 0) + position,
+                                               subject_type=subject_type,
+                                               id_start=100000 + position * 1000000)
+    # 索引只包含动画条目，与线上的排行索引一致
+    anime = [subject for subject in subjects if subject.get("type") == 2] or subjects
+    indices = {index_id: build_index(index_id, anime) for index_id in index_ids}
+    return FakeBangumiState(subjects, indices, **options)
+
+
+def main():
+    """主函数"""
+    from config.config import NEW_INDEX_ID, OLD_INDEX_ID
+
+    parser = argparse.ArgumentParser(description="本地模拟 Bangumi API 服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--subjects", type=int, default=600, help="合成条目数量")
+    parser.add_argument("--recorded", default=None, metavar="DIR",
+                        help="使用 output/debug 中录制的搜索响应作为数据")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="额外随机延迟上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回429的概率")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="每秒允许的请求数（0为不限制）")
+    parser.add_argument("--types", type=int, nargs="+", default=[2], help="合成条目的类型（默认：2）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    state = create_state(args.subjects, index_ids=(OLD_INDEX_ID, NEW_INDEX_ID),
+                         recorded_dir=args.recorded, subject_types=tuple(args.types), latency=args.latency, jitter=args.jitter,
+                         error_rate=args.error_rate, rate_limit=args.rate_limit, seed=args.seed)
+    server = FakeBangumiServer(state, args.host, args.port)
+    print(f"模拟服务器已启动: {server.url}（{len(state.subjects)} 个条目）")
+    print(f"使用方法: BANGUMI_BASE_URL={server.url} python main.py")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n已停止")
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
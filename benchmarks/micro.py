@@ -0,0 +1,221 @@
+"""
+CPU 阶段微基准测试
+用合成数据测量数据处理、导出、评论和描述生成等纯计算阶段的耗时，
+结果保存为 JSON 基线，超过阈值的退化会使测试失败
+
+用法:
+    python -m benchmarks.micro --sizes 10000 100000
+    python -m benchmarks.micro --sizes 10000 100000 --save-baseline
+    python -m benchmarks.micro --sizes 1000000 --repeat 1
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from benchmarks.synthetic import generate_pages, generate_subjects
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "micro.json")
+
+
+def time_stage(func: Callable, repeat: int) -> Dict:
+    """
+    多次运行一个阶段并记录耗时（阶段内的控制台输出被丢弃）
+
+    Args:
+        func: 无参数的阶段函数
+        repeat: 重复次数
+
+    Returns:
+        {"min": 秒, "median": 秒, "runs": [秒, ...]}
+    """
+    runs = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            runs.append(time.perf_counter() - start)
+    return {"min": min(runs), "median": statistics.median(runs), "runs": runs}
+
+
+def build_stages(size: int, seed: int, nsfw_ratio: float, workdir: str) -> Dict[str, Callable]:
+    """
+    准备指定规模的数据并返回各阶段的计时函数
+
+    Args:
+        size: 条目数量
+        seed: 随机种子
+        nsfw_ratio: 受限内容比例
+        workdir: 导出文件的临时目录
+
+    Returns:
+        {阶段名: 无参数函数}
+    """
+    os.environ.setdefault("BANGUMI_ACCESS_TOKEN", "benchmark-token")
+    from src.data_processor import DataProcessor
+    from src.exporters import JSONExporter
+    from src.stream_json import iter_array_items
+    from get_current_ranks import extract_subject_ids
+    from upload_to_index import IndexUploader
+
+    subjects = generate_subjects(size, seed=seed, nsfw_ratio=nsfw_ratio)
+    pages = generate_pages(subjects)
+    # 搜索响应的原始字节，按 16 KiB 分块模拟流式读取
+    raw_pages = [json.dumps(page, ensure_ascii=False).encode("utf-8") for page in pages]
+    chunked_pages = [[raw[i:i + 16384] for i in range(0, len(raw), 16384)] for raw in raw_pages]
+
+    processor = DataProcessor()
+    anime = [record for page in pages for record in processor.extract_anime_data(page)]
+    sorted_anime = processor.sort_by_score(anime)
+    normal, nsfw = processor.separate_nsfw(sorted_anime)
+    exporter = JSONExporter(output_dir=workdir)
+
+    # 上传器只使用内存中的数据，去年排名取一半条目并打乱位置
+    uploader = IndexUploader()
+    ranked = sorted(anime, key=lambda x: -x["rank"])
+    for position, record in enumerate(ranked, 1):
+        record["rank_position"] = position
+    uploader.normal_subjects = [r for r in ranked if not r["nsfw"]]
+    uploader.nsfw_subjects = [r for r in ranked if r["nsfw"]]
+    uploader.last_year_rankings = {r["id"]: (i * 7) % size + 1 for i, r in enumerate(ranked[::2])}
+    uploader.last_year_nsfw_rankings = {r["id"]: (i * 3) % size + 1
+                                        for i, r in enumerate(uploader.nsfw_subjects[::2])}
+
+    # 用全部条目生成一份大描述，用于测量解析
+    uploader_all = IndexUploader()
+    uploader_all.nsfw_subjects = ranked
+    uploader_all.last_year_nsfw_rankings = uploader.last_year_rankings
+    large_description = "\r\n".join(uploader_all.generate_description(max_length=None))
+
+    def generate_comments():
+        for record in uploader.normal_subjects:
+            uploader.generate_comment(record["rank_position"], record["id"])
+
+    return {
+        "extract_anime_data": lambda: [processor.extract_anime_data(page) for page in pages],
+        "json_parse_extract": lambda: [processor.extract_anime_data(json.loads(raw)) for raw in raw_pages],
+        "stream_parse_project": lambda: [[processor.project_item(item) for item in iter_array_items(chunks)]
+                                         for chunks in chunked_pages],
+        "sort_by_score": lambda: processor.sort_by_score(anime),
+        "separate_nsfw": lambda: processor.separate_nsfw(sorted_anime),
+        "json_export": lambda: exporter.export(list(normal), list(nsfw), year=2000, top_n=size),
+        "generate_comment": generate_comments,
+        "generate_description": uploader.generate_description,
+        "extract_subject_ids": lambda: extract_subject_ids(large_description),
+    }
+
+
+def run_benchmarks(sizes: List[int], repeat: int, seed: int, nsfw_ratio: float) -> Dict:
+    """
+    按规模依次运行所有阶段
+
+    Returns:
+        {"sizes": {规模: {阶段名: 计时结果}}}
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            print(f"\n规模: {size} 条")
+            stages = build_stages(size, seed, nsfw_ratio, workdir)
+            results[str(size)] = {}
+            for name, func in stages.items():
+                timing = time_stage(func, repeat)
+                results[str(size)][name] = timing
+                per_item = timing["min"] / size * 1e6
+                print(f"  {name:<22s} min {timing['min'] * 1000:>10.2f} ms  "
+                      f"median {timing['median'] * 1000:>10.2f} ms  {per_item:>8.3f} µs/条")
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": seed,
+        "nsfw_ratio": nsfw_ratio,
+        "repeat": repeat,
+        "sizes": results,
+    }
+
+
+def compare_with_baseline(report: Dict, baseline: Dict, threshold: float,
+                          min_delta: float = 0.005) -> List[str]:
+    """
+    与基线比较，返回超过阈值的退化描述
+
+    Args:
+        report: 本次结果
+        baseline: 基线结果
+        threshold: 允许的相对退化（0.2 表示慢 20% 以内不算退化）
+        min_delta: 忽略小于该绝对值（秒）的差异，避免极短阶段的计时噪声
+
+    Returns:
+        退化描述列表，为空表示没有退化
+    """
+    regressions = []
+    for size, stages in report["sizes"].items():
+        for name, timing in stages.items():
+            base = baseline.get("sizes", {}).get(size, {}).get(name)
+            if not base:
+                continue
+            ratio = timing["min"] / base["min"] if base["min"] else 1.0
+            if ratio > 1 + threshold and timing["min"] - base["min"] >= min_delta:
+                regressions.append(f"{name} @ {size}: {base['min'] * 1000:.2f} ms -> "
+                                   f"{timing['min'] * 1000:.2f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="CPU 阶段微基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000],
+                        help="合成条目数量（默认：10000 100000，最大可到 1000000）")
+    parser.add_argument("--repeat", type=int, default=3, help="每个阶段的重复次数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--nsfw-ratio", type=float, default=0.08, help="受限内容比例")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0,
+                        help="忽略小于该毫秒数的差异（默认：5）")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="允许的相对退化比例（默认：0.25）")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("CPU 阶段微基准测试")
+    print("=" * 60)
+    report = run_benchmarks(args.sizes, args.repeat, args.seed, args.nsfw_ratio)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存到: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\n未找到基线文件: {args.baseline}（使用 --save-baseline 生成）")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = compare_with_baseline(report, baseline, args.threshold,
+                                        min_delta=args.min_delta_ms / 1000)
+    if regressions:
+        print(f"\n[FAIL] 以下阶段退化超过 {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+
+    print(f"\n[OK] 所有阶段均在基线的 {args.threshold:.0%} 以内")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
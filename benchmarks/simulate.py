@@ -0,0 +1,166 @@
+"""
+限速场景模拟
+在进程内的模拟服务器上用虚拟时钟运行一次完整抓取和大量条目查询：请求间隔、429 退避和
+重试等待都不实际阻塞，只推进虚拟时间，数千次请求的运行在几秒内完成。
+对每个服务器限速场景和每种客户端请求策略（请求间隔、并发窗口数）分别运行，比较虚拟耗时、
+请求数、429 次数和失败数
+
+用法:
+    python -m benchmarks.simulate --lookups 2000
+    python -m benchmarks.simulate --scenarios limit1 limit2 --intervals 0.4 0.5 1.0 --concurrency 1 2
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from benchmarks.fake_server import FakeBangumiServer, create_state
+from src.clock import VirtualClock, set_clock
+
+REPORT_DIR = os.path.join("output", "bench")
+
+# 服务器场景: 名称 -> FakeBangumiState 的限速和故障注入参数
+SCENARIOS = {
+    "unlimited": {"rate_limit": 0.0, "error_rate": 0.0},
+    "limit1": {"rate_limit": 1.0, "error_rate": 0.0},  # 每秒 1 个请求
+    "limit2": {"rate_limit": 2.0, "error_rate": 0.0},  # 每秒 2 个请求
+    "flaky": {"rate_limit": 1.0, "error_rate": 0.05},  # 每秒 1 个请求，另有 5% 随机 429
+}
+
+
+def simulate(scenario: str, interval: float, concurrency: int, args) -> Dict:
+    """
+    在一个场景下用一种请求策略运行一次抓取和条目查询
+
+    Args:
+        scenario: 场景名称（见 SCENARIOS）
+        interval: 客户端请求间隔（秒）
+        concurrency: 同时抓取的分页窗口数
+        args: 命令行参数
+
+    Returns:
+        本次运行的结果
+    """
+    from config.config import ANIME_TYPE
+    from src.api_client import BangumiAPIClient
+    from src.crawler import BandCrawler
+    from src.data_processor import DataProcessor
+    from src.scheduler import RequestScheduler, set_scheduler
+
+    clock = VirtualClock()
+    state = create_state(args.subjects, latency=args.latency, seed=args.seed, clock=clock,
+                         **SCENARIOS[scenario])
+    previous_clock = set_clock(clock)
+    previous_scheduler = set_scheduler(RequestScheduler(interval, clock=clock))
+    failures = 0
+    error = None
+    real_start = time.perf_counter()
+    virtual_start = clock.now()
+    try:
+        with FakeBangumiServer(state) as server:
+            client = BangumiAPIClient(save_debug=False)
+            client.base_url = server.url
+            crawler = BandCrawler(client, ANIME_TYPE, project=DataProcessor.project_item,
+                                  concurrency=concurrency)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    items, report = crawler.crawl(label="模拟抓取")
+            except Exception as e:
+                # 重试耗尽时抓取失败，记录为该策略的结果
+                items, report, error = [], {"complete": False, "collected": 0}, str(e)
+            crawl_time = clock.now() - virtual_start
+
+            subject_ids = [item["id"] for item in items]
+            for position in range(args.lookups if subject_ids else 0):
+                try:
+                    client.get_subject(subject_ids[position % len(subject_ids)], priority="hydrate")
+                except Exception:
+                    failures += 1
+    finally:
+        set_clock(previous_clock)
+        set_scheduler(previous_scheduler)
+
+    stats = state.stats()
+    virtual_time = clock.now() - virtual_start
+    return {
+        "scenario": scenario,
+        "interval": interval,
+        "concurrency": concurrency,
+        "complete": report["complete"],
+        "collected": report["collected"],
+        "crawl_time": round(crawl_time, 2),
+        "virtual_time": round(virtual_time, 2),
+        "real_time": round(time.perf_counter() - real_start, 2),
+        "requests": stats["total_requests"],
+        "rate_limited": stats["rate_limited_429"],
+        "injected_429": stats["injected_429"],
+        "failed_lookups": failures,
+        "error": error,
+        "requests_per_virtual_second": round(stats["total_requests"] / virtual_time, 3) if virtual_time else 0.0,
+    }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="用虚拟时钟模拟不同限速场景下的长时间运行，比较请求策略")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS),
+                        metavar="SCENARIO", help=f"服务器场景（可选：{', '.join(SCENARIOS)}；默认全部）")
+    parser.add_argument("--intervals", nargs="+", type=float, default=[0.5, 1.0, 1.2],
+                        help="客户端请求间隔（秒，默认：0.5 1.0 1.2）")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[2],
+                        help="同时抓取的分页窗口数（默认：2）")
+    parser.add_argument("--subjects", type=int, default=600, help="合成条目数量")
+    parser.add_argument("--lookups", type=int, default=2000, help="抓取后的条目查询次数")
+    parser.add_argument("--latency", type=float, default=0.05, help="服务器每个请求的延迟（虚拟秒）")
+    parser.add_argument("--retry-delay", type=float, default=2.0, help="客户端重试延迟（覆盖 RETRY_DELAY）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="报告文件路径（默认写入 output/bench/）")
+    args = parser.parse_args()
+
+    # 客户端在导入时读取配置
+    os.environ.setdefault("BANGUMI_ACCESS_TOKEN", "benchmark-token")
+    os.environ["BANGUMI_RETRY_DELAY"] = str(args.retry_delay)
+
+    print("=" * 78)
+    print("限速场景模拟（虚拟时间）")
+    print("=" * 78)
+    print(f"  {'场景':<10s} {'间隔':>5s} {'并发':>4s} {'虚拟耗时':>10s} {'真实耗时':>8s} "
+          f"{'请求':>6s} {'429':>5s} {'失败':>4s} {'req/s':>7s}")
+    results: List[Dict] = []
+    for scenario in args.scenarios:
+        for interval in args.intervals:
+            for concurrency in args.concurrency:
+                result = simulate(scenario, interval, concurrency, args)
+                results.append(result)
+                rejected = result["rate_limited"] + result["injected_429"]
+                status = "" if result["complete"] else "  [抓取失败]" if result["error"] else "  [抓取不完整]"
+                print(f"  {scenario:<10s} {interval:>5g} {concurrency:>4d} {result['virtual_time']:>9.1f}s "
+                      f"{result['real_time']:>7.2f}s {result['requests']:>6d} {rejected:>5d} "
+                      f"{result['failed_lookups']:>4d} {result['requests_per_virtual_second']:>7.3f}{status}")
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "config": vars(args),
+        "results": results,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(REPORT_DIR, exist_ok=True)
+        output = os.path.join(REPORT_DIR, f"simulate_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print("-" * 78)
+    print(f"总真实耗时: {sum(r['real_time'] for r in results):.2f}s，"
+          f"模拟 {sum(r['virtual_time'] for r in results):.0f} 虚拟秒")
+    print(f"报告已保存到: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+合成数据生成器
+生成与 /v0/search/subjects 响应条目结构一致、分布接近真实数据的条目
+"""
+import random
+from typing import Dict, List
+
+
+def generate_subjects(count: int, seed: int = 0, nsfw_ratio: float = 0.08,
+                      subject_type: int = 2, rank_start: int = 1,
+                      catalog_size: int = None, id_start: int = 100000) -> List[Dict]:
+    """
+    生成合成条目
+
+    rank 从 rank_start 开始连续递增；评分随排名靠后而降低并带有噪声
+    （排名越靠后噪声越大，与真实数据中低分条目评分人数少的情况一致），
+    评分人数服从对数正态分布。
+
+    Args:
+        count: 条目数量
+        seed: 随机种子（相同参数生成的数据完全一致）
+        nsfw_ratio: 受限内容比例
+        subject_type: 条目类型
+        rank_start: 第一个条目的排名
+        catalog_size: 全站排名条目总数（默认为最后一个条目的排名），用于确定评分分布
+        id_start: 第一个条目的ID（生成多个类型时避免ID重复）
+
+    Returns:
+        条目列表
+    """
+    rng = random.Random(seed)
+    if catalog_size is None:
+        catalog_size = rank_start + count - 1
+
+    subjects = []
+    for i in range(count):
+        position = min(1.0, (rank_start + i - 1) / max(1, catalog_size - 1))
+        score = 8.8 - 5.5 * position ** 1.6 + rng.gauss(0, 0.15 + 0.45 * position)
+        subject_id = id_start + i
+        subjects.append({
+            "id": subject_id,
+            "type": subject_type,
+            "name": f"Synthetic Title {subject_id}",
+            "name_cn": f"合成条目 {subject_id}",
+            "summary": "",
+            "date": f"{rng.randint(1980, 2025)}-{rng.randint(1, 12):02d}-01",
+            "image": f"https://lain.bgm.tv/pic/cover/l/{subject_id % 100:02d}/{subject_id}.jpg",
+            "nsfw": rng.random() < nsfw_ratio,
+            "rating": {
+                "rank": rank_start + i,
+                "total": max(10, int(rng.lognormvariate(5.5 - 1.5 * position, 1.0))),
+                "score": round(min(10.0, max(1.0, score)), 1),
+            },
+        })
+    return subjects
+
+
+def generate_pages(subjects: List[Dict], page_size: int = 50) -> List[Dict]:
+    """
+    将条目切分为搜索接口的分页响应
+
+    Args:
+        subjects: 条目列表
+        page_size: 每页条目数
+
+    Returns:
+        分页响应列表
+    """
+    total = len(subjects)
+    return [{"total": total, "limit": page_size, "offset": offset,
+             "data": subjects[offset:offset + page_size]}
+            for offset in range(0, total, page_size)]
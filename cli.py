@@ -0,0 +1,69 @@
+"""
+Bangumi烂番排行 - 统一命令行入口
+
+用法: python cli.py <命令> [参数...]
+
+每个子命令在执行时才导入对应的模块，status 等快速命令不会加载 requests 等重量级依赖。
+子命令的参数与对应脚本相同，例如 `python cli.py fetch --year 2026` 等同于 `python main.py --year 2026`。
+"""
+import importlib
+import sys
+
+# 子命令: 名称 -> ("模块:函数", 说明)，函数接收参数列表并返回退出码
+COMMANDS = {
+    "fetch": ("main:main", "获取烂番排行数据（main.py）"),
+    "watch": ("main:watch", "监视模式：增量轮询榜单末位附近的排名并在变化时导出"),
+    "index": ("get_index:main", "获取/镜像Bangumi索引（get_index.py）"),
+    "ranks": ("get_current_ranks:main", "提取去年NSFW条目排名（get_current_ranks.py）"),
+    "upload": ("upload_to_index:main", "上传排行到Bangumi索引（upload_to_index.py）"),
+    "desc-diff": ("src.description_codec:main", "解析并比较两份索引描述中的受限条目列表"),
+    "pipeline": ("src.pipeline:main", "按依赖顺序运行完整流程，跳过输入未变化的阶段"),
+    "report": ("src.report:main", "统计历年榜单的评分分布和评分人数分位数"),
+    "analytics": ("src.analytics:main", "从保存的抓取分页和索引快照中计算每日榜单变化和条目时间序列"),
+    "lookup": ("src.title_index:main", "按标题模糊查找条目在各年份榜单和索引中的名次"),
+    "serve": ("src.ranking_service:main", "启动只读排行服务（内存中的预生成响应）"),
+    "status": ("src.status:main", "显示配置和本地输出文件状态"),
+}
+
+
+def usage() -> str:
+    """生成帮助信息"""
+    width = max(len(name) for name in COMMANDS)
+    lines = ["用法: python cli.py <命令> [参数...]", "", "命令:"]
+    for name, (_, help_text) in COMMANDS.items():
+        lines.append(f"  {name:<{width}s}  {help_text}")
+    lines += ["", "查看子命令参数: python cli.py <命令> --help"]
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    """
+    解析子命令并调用对应模块的入口函数
+
+    Args:
+        argv: 命令行参数（默认 sys.argv[1:]）
+
+    Returns:
+        退出码
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+
+    command, args = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"未知命令: {command}\n", file=sys.stderr)
+        print(usage(), file=sys.stderr)
+        return 2
+
+    module_name, function_name = COMMANDS[command][0].split(":")
+    entry = getattr(importlib.import_module(module_name), function_name)
+
+    # 子命令的帮助信息显示为 "cli.py <命令>"
+    sys.argv[0] = f"cli.py {command}"
+    return entry(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
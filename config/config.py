@@ -1,36 +1,89 @@
 """
 Bangumi烂番排行配置文件
+
+导入本模块没有副作用：依赖环境变量的配置项（见 _ENV_SETTINGS）在第一次访问时
+才读取 .env 并解析，输出目录由写入文件的代码自行创建。
 """
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# API配置
-BANGUMI_BASE_URL = "https://api.bgm.tv"
-BANGUMI_ACCESS_TOKEN = os.getenv("BANGUMI_ACCESS_TOKEN")
 
 # 搜索参数
 ANIME_TYPE = 2  # 动画类型
 MIN_RANK = 9500  # 最小排名阈值（从9500开始搜索，获取所有排名靠后的动漫）
 
+# 多类型排行: 条目类型 -> 英文名称（用于文件名）、中文名称和最小排名阈值
+# 阈值按各类型有排名的条目总数设置，只抓取排名最靠后的数百个条目
+SUBJECT_TYPES = {
+    1: {"name": "book", "label": "书籍", "min_rank": 4500},
+    2: {"name": "anime", "label": "动画", "min_rank": MIN_RANK},
+    3: {"name": "music", "label": "音乐", "min_rank": 4500},
+    4: {"name": "game", "label": "游戏", "min_rank": 5000},
+    6: {"name": "real", "label": "三次元", "min_rank": 3500},
+}
+
 # 索引配置
 NEW_INDEX_ID = 87084  # 今年的索引ID
 OLD_INDEX_ID = 74044  # 去年的索引ID，用于对比排名变化
+MIRROR_INDEX_IDS = [OLD_INDEX_ID]  # 批量镜像的索引ID列表（历年索引和用于对比的社区索引）
+INDEX_DESCRIPTION_LIMIT = 10000  # 索引描述每段的最大字符数，受限条目列表超出时拆分为多段
+MIRROR_CONCURRENCY = 3  # 批量镜像时同时处理的索引数量
+
+# 监视模式配置
+WATCH_INTERVAL = 600  # 两次轮询之间的间隔（秒）
+WATCH_RANK_MARGIN = 50  # 轮询范围：排名大于 (榜单末位排名 - 该值) 的条目
+WATCH_PREFETCH_COUNT = 10  # 轮询间隔空闲时，后台预取榜单末位附近的条目详情数（0 表示不预取）
 
 # 请求配置
 REQUEST_TIMEOUT = 30  # 请求超时时间（秒）
 RETRY_TIMES = 3  # 重试次数
-RETRY_DELAY = 2  # 重试延迟（秒）
-RATE_LIMIT_DELAY = 1  # 请求间隔（秒）
 
 # 分页配置
 PAGE_SIZE = 50  # 每页结果数
+STREAM_PARSE = True  # 边下载边逐条解析搜索响应（False 时读取完整响应后再解析）
+CRAWL_OVERLAP = 5  # 相邻分页窗口重叠的条目数，用于发现抓取期间排名变化造成的遗漏
+CRAWL_CONCURRENCY = 2  # 同时抓取的分页窗口数（共享请求间隔限制）
+CRAWL_REFETCH_ROUNDS = 3  # 补抓缺口的最多轮数
 
 # 输出配置
 OUTPUT_DIR = "output"
 JSON_OUTPUT_DIR = os.path.join(OUTPUT_DIR, "json")
+INDICES_DIR = os.path.join(OUTPUT_DIR, "indices")
+RANKS_DIR = os.path.join(OUTPUT_DIR, "ranks")
+EXPORTS_DIR = os.path.join(OUTPUT_DIR, "exports")  # CSV、Markdown、BBCode 等其他导出格式
+EXPORT_FORMATS = ["json", "csv", "markdown", "bbcode"]  # main.py 默认导出的格式
+REPORTS_DIR = os.path.join(OUTPUT_DIR, "reports")  # 评分分布等统计报告
 TOP_N = 100  # 最终输出的TOP N条目数量（设置为较大值以导出所有数据）
+SORT_MEMORY_BUDGET_MB = 0  # 外部排序的内存预算（MB），超出时把有序段写入临时文件；0 表示全部在内存中排序
+ANALYTICS_WORKERS = None  # 批量趋势分析的进程数（None 为CPU核数）
+ANALYTICS_CUTOFF_BAND = 10  # 趋势分析中统计榜单分界线上下各多少个名次的成员变化
+
+# 依赖环境变量的配置项: 名称 -> (环境变量, 默认值, 类型转换)
+_ENV_SETTINGS = {
+    "BANGUMI_BASE_URL": ("BANGUMI_BASE_URL", "https://api.bgm.tv", str),  # 可指向本地模拟服务器
+    "BANGUMI_ACCESS_TOKEN": ("BANGUMI_ACCESS_TOKEN", None, str),
+    "RETRY_DELAY": ("BANGUMI_RETRY_DELAY", 2, float),  # 重试延迟（秒）
+    "RATE_LIMIT_DELAY": ("BANGUMI_RATE_LIMIT_DELAY", 1, float),  # 请求间隔（秒）
+}
+
+_env_loaded = False
+
+
+def load_env():
+    """读取 .env 文件（只执行一次，已存在的环境变量不会被覆盖）"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+def __getattr__(name):
+    """第一次访问依赖环境变量的配置项时解析并缓存"""
+    if name not in _ENV_SETTINGS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# 确保输出目录存在
-os.makedirs(JSON_OUTPUT_DIR, exist_ok=True)
+    load_env()
+    env_name, default, cast = _ENV_SETTINGS[name]
+    raw = os.getenv(env_name)
+    value = cast(raw) if raw is not None else default
+    globals()[name] = value
+    return value
@@ -1,28 +1,37 @@
-import re
+import argparse
 import requests
+import sys
 import time
 import json
-import os
 from pathlib import Path
 from typing import List, Dict
-from dotenv import load_dotenv
+from config.config import BANGUMI_BASE_URL, BANGUMI_ACCESS_TOKEN, INDICES_DIR, OLD_INDEX_ID, RANKS_DIR, RETRY_DELAY
+from src.description_codec import parse_description
+from src.log import add_logging_arguments, get_logger, kv, setup_logging_from_args
+from src.metrics import enable_run_report, pace, send_request, sleep_before_retry
+from src.profiling import add_profile_argument, setup_profiling
+from src.progress import ProgressReporter
+from src.tracing import add_trace_argument, setup_tracing, span
 
 
 ##等sai老板修，这个操作只能对公开目录生效，私密目录没法用
-# 加载环境变量
-load_dotenv()
 
-# 获取访问令牌
-BANGUMI_ACCESS_TOKEN = os.getenv("BANGUMI_ACCESS_TOKEN")
+logger = get_logger("get_current_ranks")
 
-def get_latest_index_file(indices_dir: str = "output/indices") -> str:
-    """获取最新的index文件路径"""
+def get_latest_index_file(indices_dir: str = INDICES_DIR, index_id: int = None) -> str:
+    """获取最新的index文件路径
+
+    Args:
+        indices_dir: 索引快照目录
+        index_id: 只查找该索引ID的快照（目录中可能镜像了多个索引）
+    """
     indices_path = Path(indices_dir)
     if not indices_path.exists():
         raise FileNotFoundError(f"目录不存在: {indices_dir}")
 
     # 获取所有index_*.json文件
-    index_files = list(indices_path.glob("index_*.json"))
+    pattern = f"index_{index_id}_*.json" if index_id else "index_*.json"
+    index_files = list(indices_path.glob(pattern))
     if not index_files:
         raise FileNotFoundError(f"在 {indices_dir} 中未找到index文件")
 
@@ -33,25 +42,18 @@ def get_latest_index_file(indices_dir: str = "output/indices") -> str:
 def extract_subject_ids(desc_text: str) -> List[Dict]:
     """从描述文本中提取所有条目ID和排名位置
 
+    无法解析的条目行会带行号记录到日志中。
+
     Returns:
         List[Dict]: 包含 {'id': int, 'rank_position': int} 的列表
     """
-    # 匹配格式: 数字 空格 任意字符 [url=https://bgm.tv/subject/数字]
-    # 例如: "9 - [url=https://bgm.tv/subject/121724]"
-    # 或: "34 NEW [url=https://bgm.tv/subject/328012]"
-    pattern = r'(\d+)\s+[^\[]*\[url=https://bgm\.tv/subject/(\d+)\]'
-    matches = re.findall(pattern, desc_text)
+    parsed = parse_description(desc_text)
+    for error in parsed['errors']:
+        logger.warning("描述行无法解析", extra=kv(line=error['line'], error=error['error'], text=error['text']))
 
-    results = []
-    for rank_pos, subject_id in matches:
-        results.append({
-            'id': int(subject_id),
-            'rank_position': int(rank_pos)
-        })
-
-    return results
+    return [{'id': entry['id'], 'rank_position': entry['rank_position']} for entry in parsed['entries']]
 
-def get_subject_rank(subject_id: int, rank_position: int = None, retry_times: int = 3, retry_delay: int = 2) -> Dict:
+def get_subject_rank(subject_id: int, rank_position: int = None, retry_times: int = 3, retry_delay: float = RETRY_DELAY) -> Dict:
     """获取指定条目的rank信息，带重试机制
 
     Args:
@@ -63,7 +65,7 @@ def get_subject_rank(subject_id: int, rank_position: int = None, retry_times: in
     Returns:
         包含条目信息的字典，其中rank字段为TOP100排名位置
     """
-    url = f"https://api.bgm.tv/v0/subjects/{subject_id}"
+    url = f"{BANGUMI_BASE_URL}/v0/subjects/{subject_id}"
 
     # 设置请求头
     headers = {
@@ -75,7 +77,8 @@ def get_subject_rank(subject_id: int, rank_position: int = None, retry_times: in
 
     for attempt in range(retry_times):
         try:
-            response = requests.get(url, headers=headers, timeout=30)
+            pace("GET", url, "hydrate")
+            response = send_request(requests, "GET", url, headers=headers, timeout=30)
 
             if response.status_code == 200:
                 data = response.json()
@@ -88,7 +91,7 @@ def get_subject_rank(subject_id: int, rank_position: int = None, retry_times: in
                     'total': data.get('rating', {}).get('total', None)
                 }
             elif response.status_code == 401:
-                print(f"  认证失败：Token无效或已过期")
+                logger.error("认证失败：Token无效或已过期", extra=kv(subject_id=subject_id))
                 return {
                     'id': subject_id,
                     'name': '',
@@ -99,20 +102,21 @@ def get_subject_rank(subject_id: int, rank_position: int = None, retry_times: in
                     'error': '认证失败'
                 }
             elif response.status_code == 429:
-                print(f"  触发速率限制，等待{retry_delay * (attempt + 1)}秒后重试...")
-                time.sleep(retry_delay * (attempt + 1))
+                logger.warning("触发速率限制，等待后重试",
+                               extra=kv(url=url, wait=retry_delay * (attempt + 1), attempt=attempt + 1))
+                sleep_before_retry("GET", url, retry_delay * (attempt + 1), "rate_limit")
                 continue
             else:
-                print(f"  请求失败，状态码: {response.status_code}")
+                logger.warning("请求失败", extra=kv(url=url, status=response.status_code, attempt=attempt + 1))
                 if attempt < retry_times - 1:
-                    time.sleep(retry_delay)
+                    sleep_before_retry("GET", url, retry_delay)
                     continue
                 response.raise_for_status()
 
         except requests.exceptions.Timeout:
-            print(f"  请求超时，尝试 {attempt + 1}/{retry_times}")
+            logger.warning("请求超时", extra=kv(url=url, attempt=attempt + 1, retries=retry_times))
             if attempt < retry_times - 1:
-                time.sleep(retry_delay)
+                sleep_before_retry("GET", url, retry_delay)
             else:
                 return {
                     'id': subject_id,
@@ -124,9 +128,9 @@ def get_subject_rank(subject_id: int, rank_position: int = None, retry_times: in
                     'error': '请求超时'
                 }
         except Exception as e:
-            print(f"  请求异常: {e}")
+            logger.warning("请求异常", extra=kv(url=url, error=str(e), attempt=attempt + 1))
             if attempt < retry_times - 1:
-                time.sleep(retry_delay)
+                sleep_before_retry("GET", url, retry_delay)
             else:
                 return {
                     'id': subject_id,
@@ -148,62 +152,90 @@ def get_subject_rank(subject_id: int, rank_position: int = None, retry_times: in
         'error': '请求失败，已达到最大重试次数'
     }
 
-def main():
+def fetch_subject_ranks(subject_ids: List[Dict]) -> List[Dict]:
+    """逐个获取条目信息
+
+    Args:
+        subject_ids: extract_subject_ids 的结果
+
+    Returns:
+        List[Dict]: get_subject_rank 的结果列表
+    """
+    results = []
+    with ProgressReporter("获取条目信息", total=len(subject_ids)) as progress:
+        for item in subject_ids:
+            subject_id = item['id']
+            rank_position = item['rank_position']
+            with span("subject", "subject", id=subject_id, rank_position=rank_position):
+                result = get_subject_rank(subject_id, rank_position)
+            results.append(result)
+
+            # 只单独打印失败的条目，成功的条目在汇总中列出
+            if 'error' in result:
+                print(f"\n  ❌ 条目 {subject_id} (排名位置: {rank_position}) 错误: {result['error']}")
+
+            progress.update()
+
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="从去年的目录描述中提取NSFW条目排名")
+    add_trace_argument(parser)
+    add_profile_argument(parser)
+    add_logging_arguments(parser)
+    args = parser.parse_args(argv)
+    setup_logging_from_args(args)
+
+    enable_run_report("get_current_ranks")
+    setup_tracing("get_current_ranks", args.trace)
+    setup_profiling("get_current_ranks", args.profile)
+
+    with span("get_current_ranks", "run"):
+        return run()
+
+def run() -> int:
+    """提取去年描述中的条目并获取其信息
+
+    Returns:
+        退出码：缺少令牌或快照、读取失败或有条目获取失败时为 1
+    """
     # 检查访问令牌
     if not BANGUMI_ACCESS_TOKEN:
         print("错误: 未找到 BANGUMI_ACCESS_TOKEN")
         print("请在 .env 文件中设置 BANGUMI_ACCESS_TOKEN")
-        return
+        return 1
 
     # 获取最新的index文件
     try:
-        latest_index = get_latest_index_file()
+        latest_index = get_latest_index_file(index_id=OLD_INDEX_ID)
         print(f"读取最新的index文件: {latest_index}\n")
     except FileNotFoundError as e:
         print(f"错误: {e}")
-        return
+        return 1
 
     # 读取index文件并提取desc字段
     try:
-        with open(latest_index, 'r', encoding='utf-8') as f:
-            index_data = json.load(f)
+        with span("load_index"):
+            with open(latest_index, 'r', encoding='utf-8') as f:
+                index_data = json.load(f)
 
         # desc字段在index_info对象中
         desc_text = index_data.get('index_info', {}).get('desc', '')
         if not desc_text:
             print("错误: index文件中没有找到desc字段")
-            return
+            return 1
 
         print(f"从desc字段中提取条目ID...\n")
     except Exception as e:
         print(f"读取index文件失败: {e}")
-        return
+        return 1
 
-    subject_ids = extract_subject_ids(desc_text)
+    with span("extract_subject_ids"):
+        subject_ids = extract_subject_ids(desc_text)
     print(f"找到 {len(subject_ids)} 个条目\n")
 
-    results = []
-    for item in subject_ids:
-        subject_id = item['id']
-        rank_position = item['rank_position']
-        print(f"正在获取条目 {subject_id} (排名位置: {rank_position}) 的信息...")
-        result = get_subject_rank(subject_id, rank_position)
-        results.append(result)
-
-        # 打印结果
-        if 'error' in result:
-            print(f"  ❌ 错误: {result['error']}\n")
-        else:
-            name = result['name_cn'] or result['name']
-            rank = result['rank'] if result['rank'] else 'N/A'
-            score = result['score'] if result['score'] else 'N/A'
-            print(f"  ✓ {name}")
-            print(f"    TOP100排名: {rank}")
-            print(f"    评分: {score}")
-            print(f"    评分人数: {result['total']}\n")
-
-        # 避免请求过快
-        time.sleep(0.5)
+    with span("fetch_subjects", items=len(subject_ids)):
+        results = fetch_subject_ranks(subject_ids)
 
     # 输出汇总
     print("\n" + "="*60)
@@ -216,16 +248,24 @@ def main():
             print(f"ID {result['id']:6d} | TOP100排名 {str(rank):>3s} | {name}")
 
     # 保存结果到JSON文件
-    output_dir = Path("output/ranks")
+    output_dir = Path(RANKS_DIR)
     output_dir.mkdir(parents=True, exist_ok=True)
 
     timestamp = time.strftime("%Y%m%d_%H%M%S")
     output_file = output_dir / f"ranks_{timestamp}.json"
 
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    with span("save"):
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
 
     print(f"\n结果已保存到: {output_file}")
 
+    # 有条目获取失败时结果不完整，以非零退出码结束，流水线下次会重新运行该阶段
+    failed = [result['id'] for result in results if 'error' in result]
+    if failed:
+        print(f"错误: {len(failed)} 个条目获取失败: {', '.join(str(i) for i in failed)}")
+        return 1
+    return 0
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
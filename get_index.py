@@ -4,22 +4,32 @@
 1. GET /v0/indices/{index_id} - 获取索引基本信息
 2. GET /v0/indices/{index_id}/subjects - 获取索引中的条目列表
 """
+import argparse
 import requests
 import json
 import os
-import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from datetime import datetime
-from dotenv import load_dotenv
 from config.config import (
     BANGUMI_BASE_URL,
     BANGUMI_ACCESS_TOKEN,
     REQUEST_TIMEOUT,
     RETRY_TIMES,
     RETRY_DELAY,
-    RATE_LIMIT_DELAY,
-    OLD_INDEX_ID
+    OLD_INDEX_ID,
+    MIRROR_INDEX_IDS,
+    MIRROR_CONCURRENCY,
+    INDICES_DIR
 )
+from src.index_snapshot import write_snapshot_subjects
+from src.log import add_logging_arguments, get_logger, kv, setup_logging_from_args
+from src.metrics import enable_run_report, pace, send_request, sleep_before_retry
+from src.profiling import add_profile_argument, setup_profiling
+from src.tracing import add_trace_argument, setup_tracing, span
 
+logger = get_logger("get_index")
 
 def get_index_by_id(index_id: int) -> dict:
     """
@@ -41,47 +51,47 @@ def get_index_by_id(index_id: int) -> dict:
         "Accept": "application/json"
     }
 
-    print(f"正在获取索引 ID: {index_id}")
-    print(f"请求URL: {url}")
+    logger.debug("正在获取索引", extra=kv(index_id=index_id, url=url, sample=True))
 
     for attempt in range(RETRY_TIMES):
         try:
-            response = requests.get(
+            # 与其他请求共享请求间隔，多个索引并发镜像时按索引轮流放行
+            pace("GET", url, "fetch", flow=f"index{index_id}")
+            response = send_request(
+                requests,
+                "GET",
                 url,
                 headers=headers,
                 timeout=REQUEST_TIMEOUT
             )
 
             if response.status_code == 200:
-                print(f"✓ 成功获取索引信息")
+                logger.debug("成功获取索引信息", extra=kv(index_id=index_id, sample=True))
                 return response.json()
             elif response.status_code == 404:
-                print(f"✗ 索引不存在 (ID: {index_id})")
+                logger.warning("索引不存在", extra=kv(index_id=index_id))
                 return None
             elif response.status_code == 401:
                 raise Exception("认证失败：Token无效或已过期")
             else:
-                print(f"请求失败，状态码: {response.status_code}")
+                logger.warning("请求失败", extra=kv(url=url, status=response.status_code, attempt=attempt + 1))
                 if attempt < RETRY_TIMES - 1:
-                    print(f"等待 {RETRY_DELAY} 秒后重试...")
-                    import time
-                    time.sleep(RETRY_DELAY)
+                    sleep_before_retry("GET", url, RETRY_DELAY,
+                                       "rate_limit" if response.status_code == 429 else "retry")
                     continue
                 else:
                     response.raise_for_status()
 
         except requests.exceptions.Timeout:
-            print(f"请求超时，尝试 {attempt + 1}/{RETRY_TIMES}")
+            logger.warning("请求超时", extra=kv(url=url, attempt=attempt + 1, retries=RETRY_TIMES))
             if attempt < RETRY_TIMES - 1:
-                import time
-                time.sleep(RETRY_DELAY)
+                sleep_before_retry("GET", url, RETRY_DELAY)
             else:
                 raise
         except requests.exceptions.RequestException as e:
-            print(f"请求异常: {e}")
+            logger.warning("请求异常", extra=kv(url=url, error=str(e), attempt=attempt + 1))
             if attempt < RETRY_TIMES - 1:
-                import time
-                time.sleep(RETRY_DELAY)
+                sleep_before_retry("GET", url, RETRY_DELAY)
             else:
                 raise
 
@@ -116,11 +126,15 @@ def get_index_subjects(index_id: int, subject_type: int = 2, limit: int = 30, of
         "Accept": "application/json"
     }
 
-    print(f"正在获取索引条目列表 (offset={offset}, limit={limit})")
+    logger.debug("正在获取索引条目列表", extra=kv(index_id=index_id, offset=offset, limit=limit, sample=True))
 
     for attempt in range(RETRY_TIMES):
         try:
-            response = requests.get(
+            # 与其他请求共享请求间隔，多个索引并发镜像时按索引轮流放行
+            pace("GET", url, "fetch", flow=f"index{index_id}")
+            response = send_request(
+                requests,
+                "GET",
                 url,
                 headers=headers,
                 params=params,
@@ -130,35 +144,78 @@ def get_index_subjects(index_id: int, subject_type: int = 2, limit: int = 30, of
             if response.status_code == 200:
                 return response.json()
             elif response.status_code == 404:
-                print(f"✗ 索引不存在或无条目 (ID: {index_id})")
+                logger.warning("索引不存在或无条目", extra=kv(index_id=index_id))
                 return None
             elif response.status_code == 401:
                 raise Exception("认证失败：Token无效或已过期")
             else:
-                print(f"请求失败，状态码: {response.status_code}")
+                logger.warning("请求失败", extra=kv(url=url, status=response.status_code, attempt=attempt + 1))
                 if attempt < RETRY_TIMES - 1:
-                    print(f"等待 {RETRY_DELAY} 秒后重试...")
-                    time.sleep(RETRY_DELAY)
+                    sleep_before_retry("GET", url, RETRY_DELAY,
+                                       "rate_limit" if response.status_code == 429 else "retry")
                     continue
                 else:
                     response.raise_for_status()
 
         except requests.exceptions.Timeout:
-            print(f"请求超时，尝试 {attempt + 1}/{RETRY_TIMES}")
+            logger.warning("请求超时", extra=kv(url=url, attempt=attempt + 1, retries=RETRY_TIMES))
             if attempt < RETRY_TIMES - 1:
-                time.sleep(RETRY_DELAY)
+                sleep_before_retry("GET", url, RETRY_DELAY)
             else:
                 raise
         except requests.exceptions.RequestException as e:
-            print(f"请求异常: {e}")
+            logger.warning("请求异常", extra=kv(url=url, error=str(e), attempt=attempt + 1))
             if attempt < RETRY_TIMES - 1:
-                time.sleep(RETRY_DELAY)
+                sleep_before_retry("GET", url, RETRY_DELAY)
             else:
                 raise
 
     raise Exception("请求失败，已达到最大重试次数")
 
 
+def iter_index_subject_pages(index_id: int, subject_type: int = 2, limit: int = 50):
+    """
+    逐页获取索引中的条目（自动分页，预取下一页）
+
+    当前页交给调用方处理（例如写入磁盘）的同时，后台线程已在请求下一页。
+    偏移量按实际返回的条目数推进，短页不会导致跳过或重复条目。
+
+    Args:
+        index_id: 索引ID
+        subject_type: 条目类型
+        limit: 每页数量
+
+    Yields:
+        (offset, total, 条目列表)
+    """
+    def fetch(offset: int) -> dict:
+        with span("page", "page", index_id=index_id, offset=offset, limit=limit):
+            return get_index_subjects(index_id, subject_type, limit, offset)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        offset = 0
+        pending = executor.submit(fetch, offset)
+
+        while pending is not None:
+            result = pending.result()
+            pending = None
+
+            if not result or "data" not in result:
+                break
+
+            subjects = result.get("data", [])
+            if not subjects:
+                break
+
+            total = result.get("total", 0)
+            next_offset = offset + len(subjects)
+            if next_offset < total:
+                pending = executor.submit(fetch, next_offset)
+
+            yield offset, total, subjects
+            offset = next_offset
+
+
 def get_all_index_subjects(index_id: int, subject_type: int = 2) -> list:
     """
     获取索引中的所有条目（自动分页）
@@ -171,48 +228,67 @@ def get_all_index_subjects(index_id: int, subject_type: int = 2) -> list:
         所有条目列表
     """
     all_subjects = []
-    offset = 0
-    limit = 50  # 每页50条
-
-    while True:
-        result = get_index_subjects(index_id, subject_type, limit, offset)
+    for _, _, subjects in iter_index_subject_pages(index_id, subject_type):
+        all_subjects.extend(subjects)
+        logger.info("已获取条目", extra=kv(index_id=index_id, count=len(all_subjects)))
 
-        if not result or "data" not in result:
-            break
+    return all_subjects
 
-        subjects = result.get("data", [])
-        if not subjects:
-            break
 
-        all_subjects.extend(subjects)
-        print(f"✓ 已获取 {len(all_subjects)} 条目")
+def stream_index_subjects_to_file(index_id: int, filepath: str, subject_type: int = 2) -> int:
+    """
+    将索引中的条目逐页追加写入NDJSON快照（每行一个条目）
 
-        total = result.get("total", 0)
-        if len(all_subjects) >= total:
-            break
+    Args:
+        index_id: 索引ID
+        filepath: NDJSON文件路径
+        subject_type: 条目类型
 
-        offset += limit
-        time.sleep(RATE_LIMIT_DELAY)  # 避免触发速率限制
+    Returns:
+        写入的条目数
+    """
+    count = 0
+    with open(filepath, "w", encoding="utf-8") as f:
+        for _, total, subjects in iter_index_subject_pages(index_id, subject_type):
+            count += write_snapshot_subjects(f, subjects)
+            logger.info("已写入条目", extra=kv(index_id=index_id, count=count, total=total))
 
-    return all_subjects
+    return count
 
 
-def save_index_to_file(index_data: dict, index_id: int, output_dir: str = "output/indices"):
+def get_snapshot_paths(index_id: int, output_dir: str = INDICES_DIR) -> tuple:
     """
-    保存索引信息到JSON文件
+    生成同一次快照的索引JSON文件路径和条目NDJSON文件路径
 
     Args:
-        index_data: 索引数据
         index_id: 索引ID
         output_dir: 输出目录
+
+    Returns:
+        (索引JSON文件路径, 条目NDJSON文件路径)
     """
     # 创建输出目录
     os.makedirs(output_dir, exist_ok=True)
 
     # 生成文件名
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"index_{index_id}_{timestamp}.json"
-    filepath = os.path.join(output_dir, filename)
+    base = os.path.join(output_dir, f"index_{index_id}_{timestamp}")
+    return f"{base}.json", f"{base}.subjects.ndjson"
+
+
+def save_index_to_file(index_data: dict, index_id: int, output_dir: str = INDICES_DIR,
+                       filepath: str = None):
+    """
+    保存索引信息到JSON文件
+
+    Args:
+        index_data: 索引数据
+        index_id: 索引ID
+        output_dir: 输出目录
+        filepath: 指定的文件路径（默认按时间戳生成）
+    """
+    if filepath is None:
+        filepath, _ = get_snapshot_paths(index_id, output_dir)
 
     # 保存数据
     with open(filepath, "w", encoding="utf-8") as f:
@@ -222,91 +298,237 @@ def save_index_to_file(index_data: dict, index_id: int, output_dir: str = "outpu
     return filepath
 
 
-def main():
-    """主函数"""
-    print("=" * 60)
-    print("Bangumi 索引信息获取工具")
-    print("=" * 60)
+def find_latest_snapshot(index_id: int, output_dir: str = INDICES_DIR) -> str:
+    """
+    查找指定索引最新的本地快照文件
+
+    Args:
+        index_id: 索引ID
+        output_dir: 快照目录
 
+    Returns:
+        最新快照的文件路径，没有快照时返回None
+    """
+    snapshot_dir = Path(output_dir)
+    if not snapshot_dir.exists():
+        return None
+
+    snapshot_files = list(snapshot_dir.glob(f"index_{index_id}_*.json"))
+    if not snapshot_files:
+        return None
+
+    return str(max(snapshot_files, key=lambda f: f.stat().st_mtime))
+
+
+def is_snapshot_current(index_data: dict, snapshot_path: str) -> bool:
+    """
+    判断本地快照是否与线上索引一致（条目总数和更新时间都未变化）
+
+    Args:
+        index_data: 刚获取的索引基本信息
+        snapshot_path: 本地快照文件路径
+
+    Returns:
+        快照是否仍是最新的
+    """
     try:
-        # 从配置文件读取索引ID
-        if not OLD_INDEX_ID:
-            print("✗ 配置文件中未设置 OLD_INDEX_ID")
-            print("请在 config/config.py 中设置 OLD_INDEX_ID")
-            return
+        with open(snapshot_path, "r", encoding="utf-8") as f:
+            cached_info = json.load(f).get("index_info", {})
+    except (OSError, ValueError):
+        return False
 
-        index_id = OLD_INDEX_ID
-        print(f"\n使用配置的索引ID: {index_id}")
+    return (cached_info.get("total") == index_data.get("total")
+            and cached_info.get("updated_at") == index_data.get("updated_at"))
 
-        # 1. 获取索引基本信息
-        print("\n" + "=" * 60)
-        print("步骤 1/3: 获取索引基本信息")
-        print("=" * 60)
-        index_data = get_index_by_id(index_id)
 
-        if not index_data:
-            print("\n✗ 未找到该索引")
-            return
+def mirror_index(index_id: int, force: bool = False) -> dict:
+    """
+    镜像单个索引到本地快照
 
-        # 显示基本信息
-        print("\n索引信息:")
-        print(f"  ID: {index_data.get('id', 'N/A')}")
-        print(f"  标题: {index_data.get('title', 'N/A')}")
-        desc = index_data.get('desc', 'N/A')
-        print(f"  描述: {desc[:100]}..." if len(desc) > 100 else f"  描述: {desc}")
-        print(f"  创建者ID: {index_data.get('creator_id', 'N/A')}")
-        print(f"  条目总数: {index_data.get('total', 'N/A')}")
+    先获取索引基本信息，若条目总数和更新时间与上次快照一致则直接跳过，
+    未变化的索引只消耗一次请求。
 
-        # 2. 获取索引中的所有动画条目
-        print("\n" + "=" * 60)
-        print("步骤 2/3: 获取索引中的动画条目列表")
-        print("=" * 60)
-        subjects = get_all_index_subjects(index_id, subject_type=2)
+    Args:
+        index_id: 索引ID
+        force: 是否忽略本地快照强制重新获取
 
-        if subjects:
-            print(f"\n✓ 共获取 {len(subjects)} 个动画条目")
-        else:
-            print("\n⚠ 该索引中没有动画条目")
+    Returns:
+        镜像结果 {"index_id", "status", "filepath", "subject_count"}，
+        status 为 "updated"、"unchanged" 或 "missing"
+    """
+    # 1. 获取索引基本信息
+    print("\n" + "=" * 60)
+    print(f"步骤 1/3: 获取索引基本信息 (ID: {index_id})")
+    print("=" * 60)
+    with span("index_info", index_id=index_id):
+        index_data = get_index_by_id(index_id)
 
-        # 3. 保存数据
-        print("\n" + "=" * 60)
-        print("步骤 3/3: 保存数据到文件")
-        print("=" * 60)
+    if not index_data:
+        print(f"\n✗ 未找到该索引 (ID: {index_id})")
+        return {"index_id": index_id, "status": "missing", "filepath": None, "subject_count": 0}
+
+    # 显示基本信息
+    print("\n索引信息:")
+    print(f"  ID: {index_data.get('id', 'N/A')}")
+    print(f"  标题: {index_data.get('title', 'N/A')}")
+    desc = index_data.get('desc', 'N/A')
+    print(f"  描述: {desc[:100]}..." if len(desc) > 100 else f"  描述: {desc}")
+    print(f"  创建者ID: {index_data.get('creator_id', 'N/A')}")
+    print(f"  条目总数: {index_data.get('total', 'N/A')}")
+
+    latest_snapshot = find_latest_snapshot(index_id)
+    if not force and latest_snapshot and is_snapshot_current(index_data, latest_snapshot):
+        print(f"\n✓ 索引 {index_id} 自上次镜像后未变化，跳过: {latest_snapshot}")
+        return {"index_id": index_id, "status": "unchanged", "filepath": latest_snapshot,
+                "subject_count": index_data.get("total", 0)}
+
+    # 2. 获取索引中的所有动画条目（逐页写入NDJSON快照）
+    print("\n" + "=" * 60)
+    print(f"步骤 2/3: 获取索引中的动画条目列表 (ID: {index_id})")
+    print("=" * 60)
+    index_file, subjects_file = get_snapshot_paths(index_id)
+    with span("index_subjects", index_id=index_id) as stage:
+        subject_count = stream_index_subjects_to_file(index_id, subjects_file, subject_type=2)
+        stage.set(items=subject_count)
+
+    if subject_count:
+        print(f"\n✓ 共获取 {subject_count} 个动画条目")
+    else:
+        print("\n⚠ 该索引中没有动画条目")
+
+    # 3. 保存数据
+    print("\n" + "=" * 60)
+    print(f"步骤 3/3: 保存数据到文件 (ID: {index_id})")
+    print("=" * 60)
 
-        # 合并数据
-        complete_data = {
-            "index_info": index_data,
-            "subjects": subjects,
-            "metadata": {
-                "fetch_date": datetime.now().isoformat(),
-                "total_subjects": len(subjects),
-                "subject_type": 2,
-                "subject_type_name": "动画"
-            }
+    # 合并数据（条目保存在同目录的NDJSON文件中）
+    complete_data = {
+        "index_info": index_data,
+        "subjects_file": os.path.basename(subjects_file),
+        "metadata": {
+            "fetch_date": datetime.now().isoformat(),
+            "total_subjects": subject_count,
+            "subject_type": 2,
+            "subject_type_name": "动画"
         }
+    }
 
-        filepath = save_index_to_file(complete_data, index_id)
+    with span("save", index_id=index_id):
+        filepath = save_index_to_file(complete_data, index_id, filepath=index_file)
 
-        # 显示统计信息
-        print(f"\n数据统计:")
-        print(f"  索引ID: {index_id}")
-        print(f"  索引标题: {index_data.get('title', 'N/A')}")
-        print(f"  动画条目数: {len(subjects)}")
-        print(f"  保存位置: {filepath}")
+    # 显示统计信息
+    print(f"\n数据统计:")
+    print(f"  索引ID: {index_id}")
+    print(f"  索引标题: {index_data.get('title', 'N/A')}")
+    print(f"  动画条目数: {subject_count}")
+    print(f"  保存位置: {filepath}")
 
+    return {"index_id": index_id, "status": "updated", "filepath": filepath,
+            "subject_count": subject_count}
+
+
+def mirror_indices(index_ids: list, force: bool = False,
+                   concurrency: int = MIRROR_CONCURRENCY) -> list:
+    """
+    并发镜像多个索引，所有请求共享同一个速率限制
+
+    Args:
+        index_ids: 索引ID列表
+        force: 是否忽略本地快照强制重新获取
+        concurrency: 同时处理的索引数量
+
+    Returns:
+        与 index_ids 顺序一致的镜像结果列表
+    """
+    def run(index_id: int) -> dict:
+        try:
+            with span("mirror_index", "stage", index_id=index_id):
+                return mirror_index(index_id, force=force)
+        except Exception as e:
+            print(f"\n✗ 镜像索引 {index_id} 失败: {e}")
+            return {"index_id": index_id, "status": "failed", "filepath": None,
+                    "subject_count": 0, "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        return list(executor.map(run, index_ids))
+
+
+def main(argv=None):
+    """主函数"""
+    parser = argparse.ArgumentParser(description="获取Bangumi索引信息")
+    parser.add_argument("--index-ids", type=int, nargs="+",
+                        help="要镜像的索引ID列表（默认：配置中的 OLD_INDEX_ID）")
+    parser.add_argument("--mirror", action="store_true",
+                        help="镜像配置中 MIRROR_INDEX_IDS 列出的所有索引")
+    parser.add_argument("--force", action="store_true",
+                        help="忽略本地快照，强制重新获取所有条目")
+    parser.add_argument("--concurrency", type=int, default=MIRROR_CONCURRENCY,
+                        help=f"同时镜像的索引数量（默认：{MIRROR_CONCURRENCY}）")
+    add_trace_argument(parser)
+    add_profile_argument(parser)
+    add_logging_arguments(parser)
+    args = parser.parse_args(argv)
+    setup_logging_from_args(args)
+    enable_run_report("get_index")
+    setup_tracing("get_index", args.trace)
+    setup_profiling("get_index", args.profile)
+
+    print("=" * 60)
+    print("Bangumi 索引信息获取工具")
+    print("=" * 60)
+
+    try:
+        if args.index_ids:
+            index_ids = args.index_ids
+        elif args.mirror:
+            index_ids = list(MIRROR_INDEX_IDS)
+        else:
+            # 从配置文件读取索引ID
+            if not OLD_INDEX_ID:
+                print("✗ 配置文件中未设置 OLD_INDEX_ID")
+                print("请在 config/config.py 中设置 OLD_INDEX_ID")
+                return 1
+            index_ids = [OLD_INDEX_ID]
+
+        # 去重并保持顺序
+        index_ids = list(dict.fromkeys(index_ids))
+        print(f"\n使用的索引ID: {', '.join(str(i) for i in index_ids)}")
+
+        with span("get_index", "run", index_ids=index_ids):
+            if len(index_ids) == 1:
+                results = [mirror_index(index_ids[0], force=args.force)]
+            else:
+                results = mirror_indices(index_ids, force=args.force, concurrency=args.concurrency)
+
+        if len(results) > 1:
+            print("\n" + "=" * 60)
+            print("镜像汇总:")
+            print("=" * 60)
+            for result in results:
+                print(f"  索引 {result['index_id']:>6d} | {result['status']:<9s} | "
+                      f"{result['subject_count']} 条 | {result['filepath'] or '-'}")
+
+        # 未找到或镜像失败的索引没有新的快照，以非零退出码结束，流水线不会把该阶段记为完成
+        failed = [result["index_id"] for result in results if result["status"] in ("failed", "missing")]
         print("\n" + "=" * 60)
+        if failed:
+            print(f"✗ {len(failed)} 个索引未能镜像: {', '.join(str(i) for i in failed)}")
+            print("=" * 60)
+            return 1
         print("✓ 所有操作完成")
         print("=" * 60)
+        return 0
 
-    except ValueError:
-        print("✗ 请输入有效的数字ID")
+    except ValueError as e:
+        print(f"✗ {e}")
     except KeyboardInterrupt:
         print("\n\n操作已取消")
     except Exception as e:
         print(f"\n✗ 发生错误: {e}")
         import traceback
         traceback.print_exc()
+    return 1
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
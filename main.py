@@ -2,14 +2,61 @@
 Bangumi烂番排行数据获取工具 - 主入口
 """
 import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from src.api_client import BangumiAPIClient
+from src.crawler import BandCrawler, print_crawl_report, save_crawl_report
 from src.data_processor import DataProcessor
-from src.exporters import JSONExporter
-from config.config import TOP_N
+from src.exporters import EXPORTERS, JSONExporter, export_all
+from src.external_sort import SpillingRanking, write_jsonl
+from src.log import add_logging_arguments, setup_logging_from_args
+from src.metrics import enable_run_report
+from src.replay import DEBUG_DIR, load_captured_pages
+from src.progress import ProgressReporter
+from src.report import build_report, write_report
+from src.profiling import add_profile_argument, setup_profiling
+from src.tracing import add_trace_argument, setup_tracing, span
+from src.watcher import RankingWatcher
+from config.config import (ANIME_TYPE, EXPORT_FORMATS, EXPORTS_DIR, JSON_OUTPUT_DIR, SORT_MEMORY_BUDGET_MB,
+                           SUBJECT_TYPES, TOP_N, WATCH_INTERVAL, WATCH_RANK_MARGIN)
 
 
-def main():
+def collect_anime(pages, data_processor: DataProcessor, label: str = "获取数据",
+                  projected: bool = False, store: SpillingRanking = None):
+    """
+    从分页响应中提取所有动漫数据（按条目ID去重，分页窗口可以互相重叠）
+
+    Args:
+        pages: 按顺序排列的API响应（离线回放，见 src.replay.load_captured_pages）
+        data_processor: 数据处理器
+        label: 进度显示的任务名称
+        projected: 响应的 data 是否已经是投影后的条目（流式解析）
+        store: 外部排序模式下的去重索引，为空时在内存字典中去重
+
+    Returns:
+        提取的动漫列表（指定 store 时为 store 本身）
+    """
+    all_anime = {} if store is None else store
+    with ProgressReporter(label) as progress:
+        # 分页列表已在读取时截止到最后一页，其后是补抓的分页，逐页合并，后出现的数据覆盖先前的
+        for result in pages:
+            if not result or "data" not in result:
+                continue
+
+            anime_list = result["data"] if projected else data_processor.extract_anime_data(result)
+            before = len(all_anime)
+            for anime in anime_list:
+                all_anime[anime["id"]] = anime
+
+            progress.set_total(result.get("total", 0))
+            progress.update(len(all_anime) - before)
+
+    print(f"已获取所有数据，共 {len(all_anime)} 条")
+    return list(all_anime.values()) if store is None else store
+
+
+def main(argv=None):
     """主函数"""
     # 解析命令行参数
     parser = argparse.ArgumentParser(description="获取Bangumi最差动漫排行数据")
@@ -17,77 +64,196 @@ def main():
                         help="年份（默认：当前年份）")
     parser.add_argument("--limit", type=int, default=TOP_N,
                         help=f"结果数量（默认：{TOP_N}）")
-    args = parser.parse_args()
+    parser.add_argument("--replay", nargs="?", const=DEBUG_DIR, default=None, metavar="DIR",
+                        help=f"离线回放已保存的API响应，不访问网络（默认目录：{DEBUG_DIR}）")
+    parser.add_argument("--replay-run", default=None, metavar="TIMESTAMP",
+                        help="回放的抓取批次（offset=0 响应文件名中的时间戳，默认最新一次）")
+    parser.add_argument("--output-dir", default=None,
+                        help="JSON输出目录（默认：配置中的 JSON_OUTPUT_DIR）")
+    parser.add_argument("--formats", nargs="+", default=EXPORT_FORMATS, choices=list(EXPORTERS),
+                        metavar="FORMAT",
+                        help=f"导出格式（可选：{', '.join(EXPORTERS)}；默认：{' '.join(EXPORT_FORMATS)}）")
+    parser.add_argument("--types", nargs="+", default=["anime"], metavar="TYPE",
+                        help=f"条目类型，多个类型并发抓取并分别导出（可选：{', '.join(t['name'] for t in SUBJECT_TYPES.values())}，"
+                             f"all 表示全部；默认：anime）")
+    parser.add_argument("--memory-budget", type=float, default=SORT_MEMORY_BUDGET_MB, metavar="MB",
+                        help="外部排序的内存预算（MB）：抓取完整目录时超出预算的条目写入临时文件后归并排序，"
+                             f"并输出按评分排序的完整目录（默认：{SORT_MEMORY_BUDGET_MB}，0 表示全部在内存中排序）")
+    parser.add_argument("--watch", action="store_true",
+                        help="监视模式：完整抓取一次后只轮询榜单末位附近的排名区间，榜单变化时重新导出")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL,
+                        help=f"监视模式的轮询间隔（秒，默认：{WATCH_INTERVAL}）")
+    parser.add_argument("--margin", type=int, default=WATCH_RANK_MARGIN,
+                        help=f"监视模式轮询区间在榜单末位排名之下额外包含的排名数（默认：{WATCH_RANK_MARGIN}）")
+    parser.add_argument("--delta", action="store_true",
+                        help="监视模式下榜单变化时写出变化记录文件")
+    parser.add_argument("--iterations", type=int, default=None,
+                        help="监视模式的轮询次数（默认不限，按 Ctrl+C 停止）")
+    add_trace_argument(parser)
+    add_profile_argument(parser)
+    add_logging_arguments(parser)
+    args = parser.parse_args(argv)
+    type_ids = {t["name"]: type_id for type_id, t in SUBJECT_TYPES.items()}
+    if "all" in args.types:
+        args.types = list(type_ids)
+    unknown = [name for name in args.types if name not in type_ids]
+    if unknown:
+        parser.error(f"未知条目类型: {', '.join(unknown)}")
+    args.subject_types = [type_ids[name] for name in dict.fromkeys(args.types)]
+    if (args.replay or args.watch) and args.subject_types != [ANIME_TYPE]:
+        parser.error("--replay 和 --watch 只支持 anime 类型")
+    setup_logging_from_args(args)
+    enable_run_report("main")
+    setup_tracing("main", args.trace)
+    setup_profiling("main", args.profile)
 
     print("=" * 60)
     print("Bangumi烂番排行数据获取工具")
     print("=" * 60)
     print(f"年份: {args.year}")
     print(f"目标数量: {args.limit}")
+    print(f"条目类型: {', '.join(SUBJECT_TYPES[t]['label'] for t in args.subject_types)}")
+    if args.replay:
+        print(f"回放目录: {args.replay}")
+    if args.watch:
+        print(f"监视模式: 每 {args.interval:g} 秒轮询一次")
     print("-" * 60)
 
     try:
-        # 初始化组件
-        api_client = BangumiAPIClient()
-        data_processor = DataProcessor()
-        json_exporter = JSONExporter()
+        with span("main", "run", year=args.year, limit=args.limit, replay=bool(args.replay)):
+            if args.watch:
+                run_watch(args)
+            elif len(args.subject_types) > 1:
+                run_categories(args)
+            else:
+                run_pipeline(args, args.subject_types[0])
 
-        # 获取数据
-        print("\n[1/4] 正在从Bangumi API获取数据...")
-        all_anime = []
-        offset = 0
-        page = 1
+        print("\n" + "=" * 60)
+        print("[OK] 数据获取完成！")
+        print("=" * 60)
 
-        while True:
-            result = api_client.search_worst_anime(offset=offset)
+    except Exception as e:
+        print(f"\n[ERROR] 错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
 
-            if not result or "data" not in result:
-                print("没有更多数据")
-                break
+    return 0
 
-            anime_list = data_processor.extract_anime_data(result)
-            if not anime_list:
-                print("没有更多数据")
-                break
 
-            all_anime.extend(anime_list)
-            print(f"  第 {page} 页: 获取到 {len(anime_list)} 条数据，累计 {len(all_anime)} 条")
+def run_pipeline(args, subject_type: int = ANIME_TYPE, api_client: BangumiAPIClient = None):
+    """
+    执行获取、处理、分离、导出和统计五个阶段
 
-            # 检查是否还有更多数据
-            total = result.get("total", 0)
-            if offset + len(anime_list) >= total:
-                print(f"已获取所有数据，共 {len(all_anime)} 条")
-                break
+    Args:
+        args: 命令行参数
+        subject_type: 条目类型
+        api_client: API客户端（多个类型并发抓取时共享），为空时新建
+    """
+    category = SUBJECT_TYPES[subject_type]
+    # 多个类型并发运行时，在输出前加上类型名称以便区分
+    prefix = f"[{category['label']}] " if len(args.subject_types) > 1 else ""
 
-            offset += len(anime_list)
-            page += 1
+    # 初始化组件
+    data_processor = DataProcessor()
+    json_output_dir = args.output_dir or JSON_OUTPUT_DIR
+    # 指定内存预算时，条目进入外部排序器，超出预算的部分写入临时文件
+    store = SpillingRanking(args.memory_budget) if args.memory_budget else None
+
+    try:
+        # 获取数据
+        with span("fetch", category=category["name"]) as stage:
+            if args.replay:
+                print("\n[1/5] 正在回放已保存的API响应...")
+                pages = load_captured_pages(args.replay, run=args.replay_run)
+                all_anime = collect_anime(pages, data_processor, label="获取数据", store=store)
+            else:
+                print(f"\n{prefix}[1/5] 正在从Bangumi API获取数据...")
+                crawler = BandCrawler(api_client or BangumiAPIClient(), subject_type,
+                                      project=data_processor.project_item, store=store)
+                all_anime, crawl_report = crawler.crawl(label=f"{prefix}获取数据")
+                print_crawl_report(crawl_report, prefix)
+                save_crawl_report(crawl_report, args.year)
+                stage.set(refetched_pages=crawl_report["refetched_pages"], complete=crawl_report["complete"])
+            stage.set(items=len(all_anime))
 
         # 处理数据
-        print("\n[2/4] 正在处理数据...")
-        sorted_anime = data_processor.sort_by_score(all_anime)
-        print(f"  已按评分排序，共 {len(sorted_anime)} 条")
+        with span("process", category=category["name"]) as stage:
+            print(f"\n{prefix}[2/5] 正在处理数据...")
+            if store is None:
+                sorted_anime = data_processor.sort_by_score(all_anime)
+                print(f"  {prefix}已按评分排序，共 {len(sorted_anime)} 条")
+            else:
+                # 完整目录按评分顺序逐条写出，不在内存中保留
+                catalog_path = os.path.join(EXPORTS_DIR, f"bangumi_catalog_{category['name']}_{args.year}.jsonl")
+                count = write_jsonl(store.by_score(), catalog_path)
+                sort_stats = store.stats()
+                stage.set(**sort_stats)
+                print(f"  {prefix}已按评分排序，共 {count} 条（外部排序，内存预算 {args.memory_budget:g} MB，"
+                      f"{sort_stats['runs']} 个有序段，临时文件 {sort_stats['spilled_mb']} MB）")
+                print(f"  {prefix}完整目录已保存: {catalog_path}")
 
         # 分离普通和受限内容
-        print("\n[3/4] 正在分离普通和受限内容...")
-        normal_list, nsfw_list = data_processor.separate_nsfw(sorted_anime)
-        print(f"  普通内容: {len(normal_list)} 条")
-        print(f"  受限内容: {len(nsfw_list)} 条")
+        with span("separate_nsfw", category=category["name"]):
+            print(f"\n{prefix}[3/5] 正在分离普通和受限内容...")
+            if store is None:
+                normal_list, nsfw_list = data_processor.separate_nsfw(sorted_anime)
+                normal_count, nsfw_count = len(normal_list), len(nsfw_list)
+            else:
+                # 导出只需要按排名顺序的前 N 条
+                normal_list, nsfw_list = data_processor.separate_nsfw(store.top_by_rank(args.limit))
+                normal_count, nsfw_count = store.counts()
+            print(f"  {prefix}普通内容: {normal_count} 条")
+            print(f"  {prefix}受限内容: {nsfw_count} 条")
 
         # 导出数据
-        print("\n[4/4] 正在导出数据...")
-        json_exporter.export(normal_list, nsfw_list, year=args.year, top_n=args.limit)
+        with span("export", category=category["name"]):
+            print(f"\n{prefix}[4/5] 正在导出数据...")
+            export_all(normal_list, nsfw_list, year=args.year, top_n=args.limit, category=category["name"],
+                       formats=args.formats, output_dirs={"json": json_output_dir})
 
-        print("\n" + "=" * 60)
-        print("[OK] 数据获取完成！")
-        print("=" * 60)
+        # 统计报告（本次抓取的完整区间和历年榜单）
+        with span("report", category=category["name"]):
+            print(f"\n{prefix}[5/5] 正在生成统计报告...")
+            report = build_report(category["name"], crawled=sorted_anime if store is None else store.by_score(),
+                                  year=args.year, export_dir=json_output_dir)
+            write_report(report)
+    finally:
+        if store is not None:
+            store.close()
 
-    except Exception as e:
-        print(f"\n[ERROR] 错误: {e}")
-        import traceback
-        traceback.print_exc()
-        return 1
 
-    return 0
+def run_categories(args):
+    """
+    并发抓取多个条目类型，共享同一个客户端的连接池和请求间隔，每个类型分别导出
+
+    Args:
+        args: 命令行参数
+    """
+    api_client = BangumiAPIClient()
+    with ThreadPoolExecutor(max_workers=len(args.subject_types)) as executor:
+        futures = [executor.submit(run_pipeline, args, subject_type, api_client)
+                   for subject_type in args.subject_types]
+        for future in futures:
+            future.result()
+
+
+def run_watch(args):
+    """
+    监视模式：在内存中维护榜单，只在榜单变化时导出
+
+    Args:
+        args: 命令行参数
+    """
+    watcher = RankingWatcher(BangumiAPIClient(save_debug=False), DataProcessor(),
+                             JSONExporter(output_dir=args.output_dir), year=args.year,
+                             top_n=args.limit, margin=args.margin, write_delta=args.delta)
+    watcher.run(interval=args.interval, iterations=args.iterations)
+
+
+def watch(argv=None):
+    """监视模式入口（cli.py watch）"""
+    return main(["--watch"] + list(argv or []))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,273 @@
+"""
+批量趋势分析
+从长期保存的抓取分页（output/debug）和索引快照（output/indices）中计算趋势数据：
+每天榜单末位附近的成员变化，以及每个条目的名次和评分随时间的变化。
+
+每个快照的解码和单快照聚合在进程池中并行执行，主进程按时间顺序合并各快照的部分结果，
+最终为每个条目输出一条紧凑的时间序列。
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config.config import ANALYTICS_CUTOFF_BAND, ANALYTICS_WORKERS, INDICES_DIR, REPORTS_DIR, TOP_N
+from src.data_processor import DataProcessor
+from src.index_snapshot import iter_snapshot_subjects
+from src.log import add_logging_arguments, get_logger, kv, setup_logging_from_args
+from src.progress import ProgressReporter
+from src.replay import DEBUG_DIR, group_captured_runs, list_captured_responses, read_run_pages
+from src.title_index import SNAPSHOT_FILE_PATTERN
+
+logger = get_logger("analytics")
+
+CHURN_FILE = "analytics_churn.json"
+SERIES_FILE = "analytics_series.jsonl"
+
+# 时间序列的列：抓取批次有排名和评分，索引快照只有名次
+CRAWL_COLUMNS = ("t", "position", "rank", "score", "rating_total")
+INDEX_COLUMNS = ("t", "position")
+
+
+def find_snapshot_tasks(debug_dir: str = DEBUG_DIR, indices_dir: str = INDICES_DIR,
+                        since: Optional[str] = None, until: Optional[str] = None) -> List[Tuple]:
+    """
+    列出所有待分析的快照
+
+    Args:
+        debug_dir: 保存抓取分页的调试目录
+        indices_dir: 索引快照目录
+        since: 只分析时间戳不早于该值的快照（如 "20260101"）
+        until: 只分析时间戳早于该值的快照
+
+    Returns:
+        [("crawl", 时间戳, {偏移量: [路径, ...]}) 或 ("index", 时间戳, 索引ID, 路径), ...]，按时间戳排序
+    """
+    tasks = []
+    if os.path.isdir(debug_dir):
+        for run, by_offset in group_captured_runs(list_captured_responses(debug_dir)).items():
+            tasks.append(("crawl", run, by_offset))
+    if os.path.isdir(indices_dir):
+        for filename in os.listdir(indices_dir):
+            match = SNAPSHOT_FILE_PATTERN.match(filename)
+            if match:
+                tasks.append(("index", match.group(2), int(match.group(1)), os.path.join(indices_dir, filename)))
+
+    tasks = [task for task in tasks
+             if (since is None or task[1] >= since) and (until is None or task[1] < until)]
+    tasks.sort(key=lambda task: (task[1], task[0]))
+    return tasks
+
+
+def analyze_crawl_run(timestamp: str, by_offset: Dict[int, List[str]]) -> Dict:
+    """
+    解码一次抓取并计算每个条目在榜单中的位置
+
+    Returns:
+        {"source": "crawl", "timestamp", "entries": [[id, 名次, rank, score, rating_total], ...],
+         "names": {id: [name, name_cn]}}，entries 按名次排列
+    """
+    processor = DataProcessor()
+    items = {}
+    for page in read_run_pages(by_offset):
+        for anime in processor.extract_anime_data(page):
+            items[anime["id"]] = anime
+    ranked = sorted(items.values(), key=DataProcessor.rank_key)
+    return {
+        "source": "crawl",
+        "timestamp": timestamp,
+        "entries": [[anime["id"], position, anime["rank"], anime["score"], anime["rating_total"]]
+                    for position, anime in enumerate(ranked, 1)],
+        "names": {anime["id"]: [anime["name"], anime["name_cn"]] for anime in ranked},
+    }
+
+
+def analyze_index_snapshot(timestamp: str, index_id: int, path: str) -> Dict:
+    """
+    解码一个索引快照，名次取自条目评论开头的数字（如 "1 -"、"3 ↑2"）
+
+    Returns:
+        {"source": "index/<ID>", "timestamp", "entries": [[id, 名次], ...], "names": {id: [name, name_cn]}}
+    """
+    entries = []
+    names = {}
+    for subject in iter_snapshot_subjects(path):
+        anime = DataProcessor.project_item(subject)
+        parts = (subject.get("comment") or "").split()
+        position = int(parts[0]) if parts and parts[0].isdigit() else None
+        entries.append([anime["id"], position])
+        names[anime["id"]] = [anime["name"], anime["name_cn"]]
+    return {"source": f"index/{index_id}", "timestamp": timestamp, "entries": entries, "names": names}
+
+
+def analyze_snapshot(task: Tuple) -> Dict:
+    """进程池中执行的单快照分析（task 见 find_snapshot_tasks）"""
+    if task[0] == "crawl":
+        return analyze_crawl_run(task[1], task[2])
+    return analyze_index_snapshot(task[1], task[2], task[3])
+
+
+class TrendAggregator:
+    """按时间顺序合并各快照的部分结果"""
+
+    def __init__(self, top_n: int = TOP_N, band: int = ANALYTICS_CUTOFF_BAND):
+        """
+        Args:
+            top_n: 榜单条目数（末位即为分界线）
+            band: 分界线上下各统计的名次数
+        """
+        self.top_n = top_n
+        self.band = band
+        self.series: Dict[int, Dict] = {}  # 条目ID -> {"name", "name_cn", "sources": {来源: {列名: [...]}}}
+        self.daily: Dict[str, Dict] = {}  # 日期 -> 当天最后一次抓取的榜单摘要
+        self.snapshots = 0
+
+    def add(self, partial: Dict):
+        """合并一个快照（需按时间戳顺序调用）"""
+        self.snapshots += 1
+        source, timestamp = partial["source"], partial["timestamp"]
+        columns = CRAWL_COLUMNS if source == "crawl" else INDEX_COLUMNS
+        for entry in partial["entries"]:
+            subject_id = entry[0]
+            title = self.series.get(subject_id)
+            if title is None:
+                title = self.series[subject_id] = {"sources": {}}
+            # 保留最近一次的标题
+            title["name"], title["name_cn"] = partial["names"][subject_id]
+            series = title["sources"].get(source)
+            if series is None:
+                series = title["sources"][source] = {column: [] for column in columns}
+            series["t"].append(timestamp)
+            for column, value in zip(columns[1:], entry[1:]):
+                series[column].append(value)
+
+        if source == "crawl":
+            entries = partial["entries"]
+            cutoff = entries[self.top_n - 1] if len(entries) >= self.top_n else None
+            lower = max(0, self.top_n - self.band)
+            self.daily[datetime.strptime(timestamp, "%Y%m%d_%H%M%S").date().isoformat()] = {
+                "run": timestamp,
+                "top": [entry[0] for entry in entries[:self.top_n]],
+                "band": [entry[0] for entry in entries[lower:self.top_n + self.band]],
+                "cutoff_rank": cutoff[2] if cutoff else None,
+                "cutoff_score": cutoff[3] if cutoff else None,
+            }
+
+    def churn(self) -> List[Dict]:
+        """每天（当天最后一次抓取）与前一天相比，榜单和分界线附近的成员变化"""
+        days = []
+        previous = None
+        for date in sorted(self.daily):
+            day = self.daily[date]
+            entry = {"date": date, "run": day["run"], "size": len(day["top"]),
+                     "cutoff_rank": day["cutoff_rank"], "cutoff_score": day["cutoff_score"]}
+            if previous is not None:
+                top, previous_top = set(day["top"]), set(previous["top"])
+                entry.update(entered=len(top - previous_top), left=len(previous_top - top),
+                             band_changed=len(set(day["band"]) - set(previous["band"])))
+            days.append(entry)
+            previous = day
+        return days
+
+    def title_series(self) -> Iterable[Dict]:
+        """每个条目一条时间序列，附带首末次出现时间和抓取中的评分变化"""
+        for subject_id in sorted(self.series):
+            title = self.series[subject_id]
+            sources = title["sources"]
+            timestamps = [t for series in sources.values() for t in series["t"]]
+            record = {"id": subject_id, "name": title["name"], "name_cn": title["name_cn"],
+                      "first_seen": min(timestamps), "last_seen": max(timestamps)}
+            scores = [score for score in sources.get("crawl", {}).get("score", []) if score]
+            record["score_drift"] = round(scores[-1] - scores[0], 2) if scores else None
+            record.update(sources)
+            yield record
+
+
+def run_analytics(tasks: List[Tuple], workers: Optional[int] = ANALYTICS_WORKERS, top_n: int = TOP_N,
+                  band: int = ANALYTICS_CUTOFF_BAND) -> TrendAggregator:
+    """
+    在进程池中分析所有快照并按时间顺序合并
+
+    Args:
+        tasks: find_snapshot_tasks() 的结果
+        workers: 进程数（None 为CPU核数，1 为在当前进程中依次执行）
+        top_n: 榜单条目数
+        band: 分界线上下各统计的名次数
+
+    Returns:
+        合并后的聚合结果
+    """
+    aggregator = TrendAggregator(top_n, band)
+    with ProgressReporter("分析快照", total=len(tasks)) as progress:
+        if workers == 1 or len(tasks) <= 1:
+            for task in tasks:
+                aggregator.add(analyze_snapshot(task))
+                progress.update()
+            return aggregator
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map 按提交顺序返回结果，合并始终按时间顺序进行
+            chunksize = max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 8))
+            for partial in executor.map(analyze_snapshot, tasks, chunksize=chunksize):
+                aggregator.add(partial)
+                progress.update()
+    return aggregator
+
+
+def write_analytics(aggregator: TrendAggregator, output_dir: str = REPORTS_DIR) -> Tuple[str, str]:
+    """
+    保存每日变化和条目时间序列
+
+    Returns:
+        (每日变化JSON路径, 时间序列JSON Lines路径)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    churn_path = os.path.join(output_dir, CHURN_FILE)
+    with open(churn_path, "w", encoding="utf-8") as f:
+        json.dump({"generated_at": datetime.now().isoformat(), "snapshots": aggregator.snapshots,
+                   "top_n": aggregator.top_n, "band": aggregator.band, "days": aggregator.churn()},
+                  f, ensure_ascii=False, indent=2)
+    series_path = os.path.join(output_dir, SERIES_FILE)
+    with open(series_path, "w", encoding="utf-8") as f:
+        for record in aggregator.title_series():
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+    return churn_path, series_path
+
+
+def main(argv=None):
+    """主函数"""
+    parser = argparse.ArgumentParser(description="从保存的抓取分页和索引快照中计算每日榜单变化和条目时间序列")
+    parser.add_argument("--debug-dir", default=DEBUG_DIR, help=f"抓取分页目录（默认：{DEBUG_DIR}）")
+    parser.add_argument("--indices-dir", default=INDICES_DIR, help=f"索引快照目录（默认：{INDICES_DIR}）")
+    parser.add_argument("--since", default=None, metavar="YYYYMMDD", help="只分析该日期及之后的快照")
+    parser.add_argument("--until", default=None, metavar="YYYYMMDD", help="只分析该日期之前的快照")
+    parser.add_argument("--workers", type=int, default=ANALYTICS_WORKERS,
+                        help="进程数（默认：CPU核数；1 表示不使用进程池）")
+    parser.add_argument("--limit", type=int, default=TOP_N, help=f"榜单条目数（默认：{TOP_N}）")
+    parser.add_argument("--band", type=int, default=ANALYTICS_CUTOFF_BAND,
+                        help=f"分界线上下各统计的名次数（默认：{ANALYTICS_CUTOFF_BAND}）")
+    parser.add_argument("--output-dir", default=REPORTS_DIR, help=f"输出目录（默认：{REPORTS_DIR}）")
+    add_logging_arguments(parser)
+    args = parser.parse_args(argv)
+    setup_logging_from_args(args)
+
+    tasks = find_snapshot_tasks(args.debug_dir, args.indices_dir, args.since, args.until)
+    if not tasks:
+        print("未找到可分析的快照")
+        return 1
+    crawl_runs = sum(1 for task in tasks if task[0] == "crawl")
+    print(f"快照: {crawl_runs} 次抓取，{len(tasks) - crawl_runs} 个索引快照")
+
+    aggregator = run_analytics(tasks, workers=args.workers, top_n=args.limit, band=args.band)
+    churn_path, series_path = write_analytics(aggregator, args.output_dir)
+    logger.info("分析完成", extra=kv(snapshots=aggregator.snapshots, titles=len(aggregator.series),
+                                    days=len(aggregator.daily)))
+    print(f"[OK] 每日变化已保存: {churn_path}（{len(aggregator.daily)} 天）")
+    print(f"[OK] 条目时间序列已保存: {series_path}（{len(aggregator.series)} 个条目）")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
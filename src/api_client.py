@@ -2,29 +2,46 @@
 Bangumi API客户端
 处理HTTP请求、认证、分页和错误处理
 """
+import json
+import os
 import requests
-import time
-from typing import Dict, List, Optional
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
 from config.config import (
     BANGUMI_BASE_URL,
     BANGUMI_ACCESS_TOKEN,
     REQUEST_TIMEOUT,
     RETRY_TIMES,
     RETRY_DELAY,
-    RATE_LIMIT_DELAY,
     PAGE_SIZE,
     ANIME_TYPE,
-    MIN_RANK
+    MIN_RANK,
+    STREAM_PARSE
 )
+from src.log import get_logger, kv, redact
+from src.metrics import pace, send_request, sleep_before_retry
+from src.stream_json import iter_array_items, tee_chunks
+from src.tracing import span
+
+logger = get_logger("api_client")
+
+# 流式解析时每次读取的字节数
+STREAM_CHUNK_SIZE = 16 * 1024
 
 
 class BangumiAPIClient:
     """Bangumi API客户端类"""
 
-    def __init__(self):
+    def __init__(self, save_debug: bool = True):
+        """
+        Args:
+            save_debug: 是否将每页的请求和响应保存到 output/debug（离线回放依赖这些文件）
+        """
         self.base_url = BANGUMI_BASE_URL
+        self.save_debug = save_debug
         self.access_token = BANGUMI_ACCESS_TOKEN
         self.session = requests.Session()
+        # 同一个客户端并发抓取多个类型时共享连接池
         self._setup_headers()
 
     def _setup_headers(self):
@@ -38,13 +55,17 @@ class BangumiAPIClient:
             "Content-Type": "application/json"
         })
 
-    def _make_request(self, method: str, endpoint: str, **kwargs) -> Dict:
+    def _make_request(self, method: str, endpoint: str, consume: Callable = None, priority: str = "fetch",
+                      flow: str = "", **kwargs) -> Dict:
         """
-        发送HTTP请求，带重试机制
+        发送HTTP请求，带重试机制；每次尝试（包括重试）都在请求调度器中排队
 
         Args:
             method: HTTP方法
             endpoint: API端点
+            consume: 以流式方式读取成功响应的函数；为空时读取完整响应后解析JSON
+            priority: 请求优先级（见 src.scheduler.PRIORITIES）
+            flow: 请求来源，同一优先级内不同来源轮流放行
             **kwargs: 其他请求参数
 
         Returns:
@@ -54,54 +75,73 @@ class BangumiAPIClient:
 
         for attempt in range(RETRY_TIMES):
             try:
-                response = self.session.request(
-                    method=method,
-                    url=url,
+                # 请求间隔，避免触发速率限制；重试同样计入请求间隔
+                pace(method, url, priority, flow)
+                response = send_request(
+                    self.session,
+                    method,
+                    url,
                     timeout=REQUEST_TIMEOUT,
+                    stream=consume is not None,
                     **kwargs
                 )
 
                 if response.status_code == 200:
-                    return response.json()
+                    return consume(response) if consume else response.json()
                 elif response.status_code == 401:
                     raise Exception("认证失败：Token无效或已过期")
                 elif response.status_code == 429:
-                    print(f"触发速率限制，等待{RETRY_DELAY * (attempt + 1)}秒后重试...")
-                    time.sleep(RETRY_DELAY * (attempt + 1))
+                    logger.warning("触发速率限制，等待后重试",
+                                   extra=kv(url=url, wait=RETRY_DELAY * (attempt + 1), attempt=attempt + 1))
+                    sleep_before_retry(method, url, RETRY_DELAY * (attempt + 1), "rate_limit")
                     continue
                 else:
-                    print(f"请求失败，状态码: {response.status_code}")
+                    logger.warning("请求失败", extra=kv(url=url, status=response.status_code,
+                                                        attempt=attempt + 1))
                     if attempt < RETRY_TIMES - 1:
-                        time.sleep(RETRY_DELAY)
+                        sleep_before_retry(method, url, RETRY_DELAY)
                         continue
                     response.raise_for_status()
 
             except requests.exceptions.Timeout:
-                print(f"请求超时，尝试 {attempt + 1}/{RETRY_TIMES}")
+                logger.warning("请求超时", extra=kv(url=url, attempt=attempt + 1, retries=RETRY_TIMES))
                 if attempt < RETRY_TIMES - 1:
-                    time.sleep(RETRY_DELAY)
+                    sleep_before_retry(method, url, RETRY_DELAY)
                 else:
                     raise
             except requests.exceptions.RequestException as e:
-                print(f"请求异常: {e}")
+                logger.warning("请求异常", extra=kv(url=url, error=str(e), attempt=attempt + 1))
                 if attempt < RETRY_TIMES - 1:
-                    time.sleep(RETRY_DELAY)
+                    sleep_before_retry(method, url, RETRY_DELAY)
                 else:
                     raise
 
         raise Exception("请求失败，已达到最大重试次数")
 
-    def search_worst_anime(self, offset: int = 0, limit: int = PAGE_SIZE) -> Dict:
+    def search_worst_anime(self, offset: int = 0, limit: int = PAGE_SIZE, min_rank: int = MIN_RANK,
+                           subject_type: int = ANIME_TYPE, project: Callable[[Dict], Dict] = None,
+                           debug_prefix: str = "") -> Dict:
         """
-        搜索排名靠后的动漫
+        搜索排名靠后的动漫（或其他类型的条目）
 
         Args:
             offset: 偏移量
             limit: 每页数量
+            min_rank: 只返回排名大于该值的条目
+            subject_type: 条目类型（默认动画）
+            project: 条目投影函数；指定时边下载边逐条解析响应，data 中为投影后的条目
+            debug_prefix: 调试文件名前缀（补抓的分页使用 src.replay.REFETCH_PREFIX，回放时附在最后合并）
 
         Returns:
             搜索结果
         """
+        with span("page", "page", offset=offset, limit=limit, min_rank=min_rank, subject_type=subject_type):
+            return self._search_page(offset, limit, min_rank, subject_type, project, debug_prefix)
+
+    def _search_page(self, offset: int, limit: int, min_rank: int = MIN_RANK,
+                     subject_type: int = ANIME_TYPE, project: Callable[[Dict], Dict] = None,
+                     debug_prefix: str = "") -> Dict:
+        """获取一页搜索结果并保存请求和响应到调试目录"""
         # limit 和 offset 应该作为 URL 查询参数
         endpoint = f"/v0/search/subjects?limit={limit}&offset={offset}"
 
@@ -110,33 +150,75 @@ class BangumiAPIClient:
             "keyword": "",
             "sort": "rank",
             "filter": {
-                "type": [ANIME_TYPE],
-                "rank": [f">{MIN_RANK}"],
+                "type": [subject_type],
+                "rank": [f">{min_rank}"],
                 "nsfw": True
             }
         }
 
-        print(f"正在获取数据: offset={offset}, limit={limit}")
+        logger.debug("正在获取数据", extra=kv(offset=offset, limit=limit, subject_type=subject_type,
+                                              sample=True))
+
+        # 多个类型并发抓取时按类型轮流放行
+        flow = f"type{subject_type}"
+
+        response_file = None
+        if self.save_debug:
+            # 动画的文件名保持不变（离线回放依赖），其他类型在文件名中加上类型
+            name = f"offset_{offset}" if subject_type == ANIME_TYPE else f"type{subject_type}_offset_{offset}"
+            response_file = self._save_debug_request(endpoint, payload, debug_prefix + name)
+
+        if project is not None and STREAM_PARSE:
+            # 边下载边解析，每个条目解析后立即投影，不保留完整的响应
+            return self._make_request(
+                "POST", endpoint, json=payload, flow=flow,
+                consume=lambda response: self._consume_search_response(response, project, response_file))
+
+        result = self._make_request("POST", endpoint, json=payload, flow=flow)
+        if response_file:
+            with open(response_file, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            logger.debug("API 响应已保存", extra=kv(path=response_file, sample=True))
+        if project is not None:
+            result = dict(result, data=[project(item) for item in result.get("data", [])])
+        return result
+
+    def get_subject(self, subject_id: int, priority: str = "interactive") -> Dict:
+        """
+        获取单个条目的详情
+
+        Args:
+            subject_id: 条目ID
+            priority: 请求优先级（见 src.scheduler.PRIORITIES），后台预取使用 "prefetch"
+
+        Returns:
+            条目详情
+        """
+        endpoint = f"/v0/subjects/{subject_id}"
+        with span("subject", "subject", id=subject_id, priority=priority):
+            return self._make_request("GET", endpoint, priority=priority)
 
-        # 打印请求信息到文件
-        import json
-        import os
-        from datetime import datetime
+    def _save_debug_request(self, endpoint: str, payload: Dict, name: str) -> str:
+        """
+        将请求保存到调试目录
 
+        Returns:
+            对应的响应文件路径
+        """
         # 创建调试输出目录
         debug_dir = "output/debug"
         os.makedirs(debug_dir, exist_ok=True)
 
         # 生成文件名（包含时间戳和offset）
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        request_file = os.path.join(debug_dir, f"api_request_offset_{offset}_{timestamp}.json")
-        response_file = os.path.join(debug_dir, f"api_response_offset_{offset}_{timestamp}.json")
+        request_file = os.path.join(debug_dir, f"api_request_{name}_{timestamp}.json")
+        response_file = os.path.join(debug_dir, f"api_response_{name}_{timestamp}.json")
 
         # 保存请求信息
         request_info = {
             "url": f"{self.base_url}{endpoint}",
             "method": "POST",
-            "headers": dict(self.session.headers),
+            "headers": redact(dict(self.session.headers)),
             "payload": payload,
             "timestamp": datetime.now().isoformat()
         }
@@ -144,18 +226,28 @@ class BangumiAPIClient:
         with open(request_file, "w", encoding="utf-8") as f:
             json.dump(request_info, f, ensure_ascii=False, indent=2)
 
-        print(f"API 请求已保存到: {request_file}")
-
-        # 发送请求
-        result = self._make_request("POST", endpoint, json=payload)
+        logger.debug("API 请求已保存", extra=kv(path=request_file, sample=True))
+        return response_file
 
-        # 保存响应信息
-        with open(response_file, "w", encoding="utf-8") as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
-
-        print(f"API 响应已保存到: {response_file}")
+    def _consume_search_response(self, response, project: Callable[[Dict], Dict],
+                                 response_file: Optional[str]) -> Dict:
+        """
+        逐条解析搜索响应的 data 数组并投影，原始字节同时写入调试文件
 
-        # 请求间隔，避免触发速率限制
-        time.sleep(RATE_LIMIT_DELAY)
+        Args:
+            response: 以 stream=True 发出的响应
+            project: 条目投影函数（如 DataProcessor.project_item）
+            response_file: 保存原始响应的路径，为空时不保存
 
-        return result
+        Returns:
+            与搜索响应结构相同的字典，data 为投影后的条目
+        """
+        meta = {}
+        chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+        if not response_file:
+            data = [project(item) for item in iter_array_items(chunks, "data", meta)]
+        else:
+            with open(response_file, "wb") as f:
+                data = [project(item) for item in iter_array_items(tee_chunks(chunks, f), "data", meta)]
+            logger.debug("API 响应已保存", extra=kv(path=response_file, sample=True))
+        return {**meta, "data": data}
@@ -0,0 +1,81 @@
+"""
+时钟
+请求间隔、429 退避、失败重试和监视模式的轮询间隔都通过进程内共享的时钟等待。
+默认使用真实时间；模拟长时间运行时换成 VirtualClock，等待不再阻塞，
+直接把时钟拨到等待结束的时刻，数千次请求的运行可以在几秒内完成。
+"""
+import threading
+import time
+from typing import Optional
+
+
+class SystemClock:
+    """真实时间"""
+
+    def now(self) -> float:
+        """单调时间（秒）"""
+        return time.monotonic()
+
+    def sleep(self, seconds: float):
+        """等待指定秒数"""
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def wait(self, condition: threading.Condition, timeout: float):
+        """在已持有的条件变量上等待，最多 timeout 秒（可被 notify 提前唤醒）"""
+        condition.wait(timeout)
+
+
+class VirtualClock(SystemClock):
+    """
+    虚拟时间：真实经过的时间加上所有被跳过的等待
+
+    请求本身的耗时仍按真实时间计入。多个线程同时等待时，时钟只拨到最晚的结束时刻，
+    不会把各线程的等待时间相加（对并发等待的近似）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._offset = 0.0
+        self.skipped = 0.0  # 被跳过的等待总秒数
+
+    def now(self) -> float:
+        return time.monotonic() + self._offset
+
+    def sleep(self, seconds: float):
+        if seconds <= 0:
+            return
+        target = self.now() + seconds
+        with self._lock:
+            advance = target - self.now()
+            if advance > 0:
+                self._offset += advance
+                self.skipped += advance
+
+    def wait(self, condition: threading.Condition, timeout: float):
+        # 不阻塞，由调用方重新检查条件
+        self.sleep(timeout)
+
+
+_clock = SystemClock()
+
+
+def get_clock() -> SystemClock:
+    """进程内共享的时钟"""
+    return _clock
+
+
+def set_clock(clock: Optional[SystemClock] = None) -> SystemClock:
+    """
+    替换进程内共享的时钟
+
+    Args:
+        clock: 新的时钟，为空时恢复真实时间
+
+    Returns:
+        替换前的时钟
+    """
+    global _clock
+    previous = _clock
+    _clock = clock or SystemClock()
+    return previous
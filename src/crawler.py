@@ -0,0 +1,199 @@
+"""
+排名区间抓取
+排名可能在抓取各页之间变化，按偏移量分页会重复或漏掉条目（并发抓取时更明显）。
+本模块以互相重叠的窗口抓取，按条目ID去重；相邻窗口没有共同条目时说明中间可能漏掉了条目，
+只重新抓取这些缺口，最后与 total 对比生成完整性报告。
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, MutableMapping, Tuple
+
+from config.config import (ANIME_TYPE, CRAWL_CONCURRENCY, CRAWL_OVERLAP, CRAWL_REFETCH_ROUNDS, PAGE_SIZE,
+                           REPORTS_DIR, SUBJECT_TYPES)
+from src.api_client import BangumiAPIClient
+from src.log import get_logger, kv
+from src.progress import ProgressReporter
+from src.replay import REFETCH_PREFIX
+
+logger = get_logger("crawler")
+
+
+class BandCrawler:
+    """以重叠窗口抓取一个条目类型的排名区间"""
+
+    def __init__(self, api_client: BangumiAPIClient, subject_type: int = ANIME_TYPE,
+                 project: Callable[[Dict], Dict] = None, page_size: int = PAGE_SIZE,
+                 overlap: int = CRAWL_OVERLAP, concurrency: int = CRAWL_CONCURRENCY,
+                 refetch_rounds: int = CRAWL_REFETCH_ROUNDS, store: MutableMapping = None):
+        """
+        Args:
+            api_client: API客户端
+            subject_type: 条目类型（阈值见配置 SUBJECT_TYPES）
+            project: 条目投影函数（见 DataProcessor.project_item）
+            page_size: 每个窗口的条目数
+            overlap: 相邻窗口重叠的条目数（必须小于 page_size）
+            concurrency: 同时抓取的窗口数
+            refetch_rounds: 补抓缺口的最多轮数
+            store: 去重索引（条目ID -> 条目），默认为内存字典；外部排序模式传入 SpillingRanking
+        """
+        if not 0 <= overlap < page_size:
+            raise ValueError(f"窗口重叠数 {overlap} 必须小于每页数量 {page_size}")
+        self.api_client = api_client
+        self.subject_type = subject_type
+        self.min_rank = SUBJECT_TYPES[subject_type]["min_rank"]
+        self.project = project
+        self.page_size = page_size
+        self.overlap = overlap
+        self.concurrency = max(1, concurrency)
+        self.refetch_rounds = refetch_rounds
+
+        self._lock = threading.Lock()
+        self.items = {} if store is None else store  # 条目ID -> 条目（去重索引）
+        self.windows: Dict[int, List[int]] = {}  # 窗口偏移量 -> 最近一次抓取到的条目ID
+        self.total = 0
+        self.pages = 0
+        self.refetched_pages = 0
+        self.duplicates = 0
+
+    def fetch_window(self, offset: int, refetch: bool = False) -> int:
+        """
+        抓取一个窗口并合并到去重索引
+
+        Returns:
+            新增的条目数
+        """
+        result = self.api_client.search_worst_anime(offset=offset, limit=self.page_size, min_rank=self.min_rank,
+                                                    subject_type=self.subject_type, project=self.project,
+                                                    debug_prefix=REFETCH_PREFIX if refetch else "")
+        data = (result or {}).get("data") or []
+        with self._lock:
+            if result:
+                self.total = result.get("total", self.total)
+            self.pages += 1
+            self.refetched_pages += refetch
+            added = 0
+            for item in data:
+                if item["id"] in self.items:
+                    self.duplicates += 1
+                else:
+                    added += 1
+                # 保留最近一次抓取到的数据
+                self.items[item["id"]] = item
+            self.windows[offset] = [item["id"] for item in data]
+        return added
+
+    def window_offsets(self) -> List[int]:
+        """根据 total 计算覆盖整个区间的重叠窗口偏移量"""
+        step = self.page_size - self.overlap
+        offsets = []
+        offset = step
+        while offset - step + self.page_size < self.total:
+            offsets.append(offset)
+            offset += step
+        return offsets
+
+    def find_gaps(self) -> List[Tuple[int, int]]:
+        """
+        找出相邻窗口之间的缺口
+
+        Returns:
+            [(前一窗口偏移量, 后一窗口偏移量), ...]：两个重叠的窗口没有共同条目
+        """
+        if not self.overlap:
+            return []
+        gaps = []
+        offsets = sorted(self.windows)
+        for previous, current in zip(offsets, offsets[1:]):
+            # 区间缩小后超出 total 的窗口本来就应为空
+            if current >= self.total or previous + self.page_size <= current:
+                continue
+            if not set(self.windows[previous]) & set(self.windows[current]):
+                gaps.append((previous, current))
+        return gaps
+
+    def _fetch_all(self, offsets: List[int], progress: ProgressReporter, refetch: bool = False):
+        if self.concurrency == 1 or len(offsets) <= 1:
+            for offset in offsets:
+                progress.update(self.fetch_window(offset, refetch))
+            return
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for added in executor.map(lambda o: self.fetch_window(o, refetch), offsets):
+                progress.update(added)
+
+    def crawl(self, label: str = "获取数据") -> Tuple[List[Dict], Dict]:
+        """
+        抓取整个排名区间
+
+        Args:
+            label: 进度显示的任务名称
+
+        Returns:
+            (去重后的条目列表（按首次抓取的窗口顺序；指定 store 时为 store 本身）, 完整性报告)
+        """
+        first_gaps = []
+        with ProgressReporter(label) as progress:
+            progress.update(self.fetch_window(0))
+            progress.set_total(self.total)
+            self._fetch_all(self.window_offsets(), progress)
+            progress.set_total(self.total)
+
+            rounds = 0
+            gaps = self.find_gaps()
+            first_gaps = list(gaps)
+            while gaps and rounds < self.refetch_rounds:
+                rounds += 1
+                logger.info("补抓缺口", extra=kv(subject_type=self.subject_type, round=rounds, gaps=len(gaps)))
+                # 缺口中漏掉的条目此时位于前一窗口的范围内，重新抓取前一窗口
+                self._fetch_all(sorted({previous for previous, _ in gaps}), progress, refetch=True)
+                gaps = self.find_gaps()
+
+        if isinstance(self.items, dict):
+            # 区间内的条目按最近一次抓取时的窗口顺序排列
+            order = {}
+            for offset in sorted(self.windows):
+                for position, subject_id in enumerate(self.windows[offset]):
+                    order.setdefault(subject_id, offset + position)
+            items = sorted(self.items.values(), key=lambda item: order.get(item["id"], len(order)))
+        else:
+            items = self.items
+
+        report = {
+            "subject_type": self.subject_type,
+            "category": SUBJECT_TYPES[self.subject_type]["name"],
+            "min_rank": self.min_rank,
+            "total": self.total,
+            "collected": len(items),
+            "missing": max(0, self.total - len(items)),
+            "extra": max(0, len(items) - self.total),
+            "complete": len(items) >= self.total and not gaps,
+            "pages": self.pages,
+            "refetched_pages": self.refetched_pages,
+            "duplicates": self.duplicates,
+            "gaps_found": [list(gap) for gap in first_gaps],
+            "gaps_unresolved": [list(gap) for gap in gaps],
+            "refetch_rounds": rounds,
+        }
+        return items, report
+
+
+def print_crawl_report(report: Dict, prefix: str = ""):
+    """输出完整性报告摘要"""
+    status = "[OK] 抓取完整" if report["complete"] else "[WARN] 抓取可能不完整"
+    print(f"  {prefix}{status}: 获取 {report['collected']} 条 / 总数 {report['total']} 条，"
+          f"{report['pages']} 页（补抓 {report['refetched_pages']} 页），去除重复 {report['duplicates']} 条")
+    if report["gaps_found"]:
+        print(f"  {prefix}发现缺口 {len(report['gaps_found'])} 处，未解决 {len(report['gaps_unresolved'])} 处")
+    if report["missing"]:
+        print(f"  {prefix}缺少 {report['missing']} 条（排名可能在抓取期间持续变化，可重新运行）")
+
+
+def save_crawl_report(report: Dict, year: int, output_dir: str = REPORTS_DIR) -> str:
+    """保存完整性报告到 output/reports/crawl_<类型>_<年份>.json"""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"crawl_{report['category']}_{year}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "year": year, **report}, f, ensure_ascii=False, indent=2)
+    return path
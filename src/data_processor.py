@@ -25,26 +25,43 @@ class DataProcessor:
         if not api_response or "data" not in api_response:
             return []
 
-        anime_list = []
-        for item in api_response.get("data", []):
-
-            rating = item.get("rating", {})
-
-            anime_data = {
-                "id": item.get("id"),
-                "name": item.get("name", ""),
-                "name_cn": item.get("name_cn", ""),
-                "score": rating.get("score", 0),
-                "rank": rating.get("rank", 0),
-                "rating_total": rating.get("total", 0),  # 评分人数
-                "nsfw": item.get("nsfw", False),
-                "date": item.get("date", ""),
-                "image": item.get("image", ""),
-                "summary": item.get("summary", "")
-            }
-            anime_list.append(anime_data)
-
-        return anime_list
+        return [self.project_item(item) for item in api_response.get("data", [])]
+
+    @staticmethod
+    def project_item(item: Dict) -> Dict:
+        """
+        将一个搜索结果条目转换为导出所需的字段
+
+        Args:
+            item: API响应中 data 数组的一个元素
+
+        Returns:
+            动漫数据
+        """
+        rating = item.get("rating", {})
+
+        return {
+            "id": item.get("id"),
+            "name": item.get("name", ""),
+            "name_cn": item.get("name_cn", ""),
+            "score": rating.get("score", 0),
+            "rank": rating.get("rank", 0),
+            "rating_total": rating.get("total", 0),  # 评分人数
+            "nsfw": item.get("nsfw", False),
+            "date": item.get("date", ""),
+            "image": item.get("image", ""),
+            "summary": item.get("summary", "")
+        }
+
+    @staticmethod
+    def score_key(anime: Dict) -> tuple:
+        """评分顺序的排序键：评分从低到高，评分相同时排名靠后的在前"""
+        return anime.get("score", 0), -anime.get("rank", 0)
+
+    @staticmethod
+    def rank_key(anime: Dict) -> int:
+        """排名顺序的排序键：rank 从大到小（与导出榜单的顺序一致）"""
+        return -anime.get("rank", 0)
 
     def sort_by_score(self, anime_list: List[Dict]) -> List[Dict]:
         """
@@ -56,7 +73,7 @@ class DataProcessor:
         Returns:
             排序后的列表
         """
-        return sorted(anime_list, key=lambda x: (x.get("score", 0), -x.get("rank", 0)))
+        return sorted(anime_list, key=self.score_key)
 
     def separate_nsfw(self, anime_list: List[Dict]) -> tuple:
         """
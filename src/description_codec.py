@@ -0,0 +1,174 @@
+"""
+索引描述编解码
+索引描述中的受限条目列表每行一条，格式为 "名次 变化 [url=https://bgm.tv/subject/ID]名称[/url]"，
+例如 "9 - [url=https://bgm.tv/subject/121724]名称[/url]" 或 "34 NEW [url=...]名称[/url]"。
+本模块逐行一次解析出条目并报告无法解析的行，把条目渲染回描述（超过长度时拆分），
+以及按条目ID比较两份描述。
+"""
+import argparse
+import json
+import re
+from typing import Dict, List, Optional, Union
+
+from config.config import INDEX_DESCRIPTION_LIMIT
+
+SUBJECT_URL = "https://bgm.tv/subject/"
+LINE_SEPARATOR = "\r\n"
+# 拆分后第二段起的首行
+CONTINUATION_LINE = "（续）"
+
+_RANK_PREFIX = re.compile(r"^\s*\d+\s")
+_ENTRY_LINE = re.compile(r"^\s*(\d+)\s+([^\[]*)\[url=https?://bgm\.tv/subject/(\d+)\](.*)")
+
+
+def parse_description(text: str) -> Dict:
+    """
+    解析索引描述
+
+    Args:
+        text: 描述文本（\\r\\n 或 \\n 分行）
+
+    Returns:
+        {"header": [...], "entries": [...], "text": [...], "errors": [...]}：
+        header 为第一个条目之前的文本行，text 为条目之间和之后的其他文本行，
+        entries 中每项为 {"rank_position", "change", "id", "name", "line"}，
+        errors 中每项为 {"line", "text", "error"}（行号从 1 开始）
+    """
+    header, other, entries, errors = [], [], [], []
+    for line_no, line in enumerate((text or "").splitlines(), 1):
+        # 先用子串判断筛掉普通文本行，只对可能的条目行执行正则匹配
+        match = _ENTRY_LINE.match(line) if "bgm.tv/subject/" in line else None
+        if match is None:
+            if "bgm.tv/subject/" in line:
+                error = "条目链接格式错误" if _RANK_PREFIX.match(line) else "行首缺少名次"
+                errors.append({"line": line_no, "text": line, "error": error})
+            elif line.strip():
+                (other if entries else header).append(line)
+            continue
+        name = match.group(4).rstrip()
+        if "bgm.tv/subject/" in name:
+            errors.append({"line": line_no, "text": line, "error": "一行包含多个条目链接"})
+            continue
+        entries.append({
+            "rank_position": int(match.group(1)),
+            "change": match.group(2).strip(),
+            "id": int(match.group(3)),
+            "name": name[:-6] if name.endswith("[/url]") else name,
+            "line": line_no,
+        })
+    return {"header": header, "entries": entries, "text": other, "errors": errors}
+
+
+def render_entry(entry: Dict) -> str:
+    """渲染一个条目行"""
+    change = f" {entry['change']}" if entry.get("change") else ""
+    return f"{entry['rank_position']}{change} [url={SUBJECT_URL}{entry['id']}]{entry.get('name', '')}[/url]"
+
+
+def render_description(header: List[str], entries: List[Dict],
+                       max_length: Optional[int] = INDEX_DESCRIPTION_LIMIT) -> List[str]:
+    """
+    渲染索引描述，超过长度限制时按行拆分为多段
+
+    Args:
+        header: 描述开头的文本行
+        entries: 条目（render_entry 所需的字段）
+        max_length: 每段的最大字符数，None 表示不拆分
+
+    Returns:
+        各段描述；第一段包含开头文本，之后每段以 CONTINUATION_LINE 开头
+
+    Raises:
+        ValueError: 开头文本或单个条目行本身就超过长度限制
+    """
+    parts = []
+    lines = list(header)
+    length = len(LINE_SEPARATOR.join(lines))
+    if max_length is not None and length > max_length:
+        raise ValueError(f"描述开头文本超过长度限制 {max_length} 字符")
+    for entry in entries:
+        line = render_entry(entry)
+        added = len(line) + (len(LINE_SEPARATOR) if lines else 0)
+        if max_length is not None and length + added > max_length:
+            if len(lines) <= (len(header) if not parts else 1):
+                raise ValueError(f"描述长度限制 {max_length} 字符过小，无法容纳: {line[:40]}")
+            parts.append(LINE_SEPARATOR.join(lines))
+            lines = [CONTINUATION_LINE]
+            length = len(CONTINUATION_LINE)
+            added = len(line) + len(LINE_SEPARATOR)
+            # 续段中只有这一个条目时仍超出限制
+            if length + added > max_length:
+                raise ValueError(f"描述长度限制 {max_length} 字符过小，无法容纳: {line[:40]}")
+        lines.append(line)
+        length += added
+    parts.append(LINE_SEPARATOR.join(lines))
+    return parts
+
+
+def diff_descriptions(old: Union[str, Dict], new: Union[str, Dict]) -> Dict:
+    """
+    按条目ID比较两份描述
+
+    Args:
+        old: 旧描述文本，或 parse_description() 的结果
+        new: 新描述文本，或 parse_description() 的结果
+
+    Returns:
+        {"added": [...], "removed": [...], "moved": [...], "renamed": [...]}，
+        moved 中每项带有 old_position 和 rank_position
+    """
+    if isinstance(old, str) and isinstance(new, str) and old == new:
+        return {"added": [], "removed": [], "moved": [], "renamed": []}
+    old_entries = {e["id"]: e for e in (parse_description(old) if isinstance(old, str) else old)["entries"]}
+    new_entries = {e["id"]: e for e in (parse_description(new) if isinstance(new, str) else new)["entries"]}
+
+    def brief(entry: Dict, **extra) -> Dict:
+        return {"id": entry["id"], "name": entry["name"], "rank_position": entry["rank_position"], **extra}
+
+    return {
+        "added": [brief(e) for subject_id, e in new_entries.items() if subject_id not in old_entries],
+        "removed": [brief(e) for subject_id, e in old_entries.items() if subject_id not in new_entries],
+        "moved": [brief(e, old_position=old_entries[subject_id]["rank_position"])
+                  for subject_id, e in new_entries.items()
+                  if subject_id in old_entries and old_entries[subject_id]["rank_position"] != e["rank_position"]],
+        "renamed": [brief(e, old_name=old_entries[subject_id]["name"])
+                    for subject_id, e in new_entries.items()
+                    if subject_id in old_entries and old_entries[subject_id]["name"] != e["name"]],
+    }
+
+
+def load_description(path: str) -> str:
+    """读取描述：索引快照JSON（index_info.desc）或纯文本文件"""
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    if path.endswith(".json"):
+        return json.loads(content).get("index_info", {}).get("desc", "")
+    return content
+
+
+def main(argv=None):
+    """主函数：检查并比较两份索引描述"""
+    parser = argparse.ArgumentParser(description="解析并比较两份索引描述中的受限条目列表")
+    parser.add_argument("old", help="旧描述（索引快照JSON或文本文件）")
+    parser.add_argument("new", help="新描述（索引快照JSON或文本文件）")
+    args = parser.parse_args(argv)
+
+    parsed = {}
+    for label, path in (("旧描述", args.old), ("新描述", args.new)):
+        parsed[label] = parse_description(load_description(path))
+        print(f"{label}: {path}（{len(parsed[label]['entries'])} 个条目）")
+        for error in parsed[label]["errors"]:
+            print(f"  第 {error['line']} 行: {error['error']}: {error['text']}")
+
+    changes = diff_descriptions(parsed["旧描述"], parsed["新描述"])
+    for entry in changes["added"]:
+        print(f"+ {entry['rank_position']:>3d} {entry['name']} ({entry['id']})")
+    for entry in changes["removed"]:
+        print(f"- {entry['rank_position']:>3d} {entry['name']} ({entry['id']})")
+    for entry in changes["moved"]:
+        print(f"~ {entry['old_position']:>3d} -> {entry['rank_position']} {entry['name']} ({entry['id']})")
+    for entry in changes["renamed"]:
+        print(f"~ {entry['old_name']} -> {entry['name']} ({entry['id']})")
+    print(f"新增 {len(changes['added'])}，移除 {len(changes['removed'])}，"
+          f"名次变化 {len(changes['moved'])}，名称变化 {len(changes['renamed'])}")
+    return 0
@@ -1,22 +1,202 @@
 """
 数据导出器
-支持JSON格式导出
+同一份排好序的榜单由多个格式的导出器并发写出：JSON、CSV、Markdown（讨论帖）和 BBCode（索引描述）。
+每个导出器边生成边写入临时文件并计算内容哈希，内容未变化的文件不会被替换。
 """
+import csv
+import hashlib
 import json
 import os
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List
-from config.config import JSON_OUTPUT_DIR
+from typing import Dict, Iterable, List, Tuple
+from config.config import EXPORTS_DIR, JSON_OUTPUT_DIR, SUBJECT_TYPES
 
+# 每个输出目录中记录各文件内容哈希的清单
+MANIFEST_FILE = ".export_hashes.json"
+_manifest_lock = threading.Lock()
 
-class JSONExporter:
+CSV_FIELDS = ["rank_position", "id", "name", "name_cn", "score", "rank", "rating_total", "nsfw", "date"]
+
+
+def build_ranked_table(normal_list: List[Dict], nsfw_list: List[Dict], year: int = None,
+                       top_n: int = 100, category: str = "anime") -> Dict:
+    """
+    生成所有导出格式共用的榜单
+
+    Args:
+        normal_list: 普通内容列表
+        nsfw_list: 受限内容列表
+        year: 年份
+        top_n: 导出前N条
+        category: 条目类型名称（见配置 SUBJECT_TYPES），用于文件名
+
+    Returns:
+        {"metadata": {...}, "normal": [...], "nsfw": [...], "entries": [...]}，
+        entries 为按 rank 从大到小排列的全部条目
+    """
+    if year is None:
+        year = datetime.now().year
+
+    # 合并 normal 和 nsfw 列表，按 rank 从大到小排序后取前 top_n 条
+    top_anime = sorted(normal_list + nsfw_list, key=lambda x: -x.get("rank", 0))[:top_n]
+
+    # 添加排名位置（rank_position）
+    for idx, anime in enumerate(top_anime, 1):
+        anime["rank_position"] = idx
+
+    # 分离 normal 和 nsfw
+    normal_output = [anime for anime in top_anime if not anime.get("nsfw", False)]
+    nsfw_output = [anime for anime in top_anime if anime.get("nsfw", False)]
+
+    return {
+        "metadata": {
+            "fetch_date": datetime.now().isoformat(),
+            "total_results": len(top_anime),
+            "year": year,
+            "category": category,
+            "normal_count": len(normal_output),
+            "nsfw_count": len(nsfw_output)
+        },
+        "normal": normal_output,
+        "nsfw": nsfw_output,
+        "entries": top_anime,
+    }
+
+
+def category_label(category: str) -> str:
+    """条目类型的中文名称"""
+    return next((t["label"] for t in SUBJECT_TYPES.values() if t["name"] == category), category)
+
+
+class HashingWriter:
+    """
+    写入文件的同时计算内容哈希；标记为易变的内容（如生成时间）不计入哈希
+
+    小段文本先在内存中合并，累计到 FLUSH_SIZE 个字符后再写入文件和更新哈希。
+    """
+
+    FLUSH_SIZE = 64 * 1024
+
+    def __init__(self, file):
+        self.file = file
+        self._hash = hashlib.sha256()
+        self._pending: List[str] = []
+        self._pending_size = 0
+
+    def write(self, text: str, volatile: bool = False):
+        if volatile:
+            self.flush()
+            self.file.write(text)
+            return
+        self._pending.append(text)
+        self._pending_size += len(text)
+        if self._pending_size >= self.FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            text = "".join(self._pending)
+            self.file.write(text)
+            self._hash.update(text.encode("utf-8"))
+            self._pending = []
+            self._pending_size = 0
+
+    def hexdigest(self) -> str:
+        self.flush()
+        return self._hash.hexdigest()
+
+
+class Exporter(ABC):
+    """导出器基类：子类实现 write() 逐段写出一种格式"""
+
+    format_name = ""
+    extension = ""
+    default_dir = EXPORTS_DIR
+
+    def __init__(self, output_dir: str = None):
+        self.output_dir = output_dir or self.default_dir
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def filepath(self, table: Dict) -> str:
+        metadata = table["metadata"]
+        filename = f"bangumi_worst_{metadata['category']}_{metadata['year']}.{self.extension}"
+        return os.path.join(self.output_dir, filename)
+
+    @abstractmethod
+    def write(self, table: Dict, out: HashingWriter):
+        """把榜单逐段写入 out（易变的内容以 volatile=True 写入，不计入内容哈希）"""
+
+    def write_file(self, table: Dict) -> Tuple[str, bool]:
+        """
+        写出一个格式的文件
+
+        先写入临时文件，内容哈希与上次相同时丢弃临时文件，保留原文件。
+
+        Args:
+            table: build_ranked_table() 的结果
+
+        Returns:
+            (文件路径, 内容是否变化)
+        """
+        path = self.filepath(table)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8", newline="") as f:
+            out = HashingWriter(f)
+            self.write(table, out)
+            digest = out.hexdigest()
+
+        manifest_path = os.path.join(self.output_dir, MANIFEST_FILE)
+        filename = os.path.basename(path)
+        with _manifest_lock:
+            manifest = {}
+            if os.path.exists(manifest_path):
+                with open(manifest_path, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+            if manifest.get(filename) == digest and os.path.exists(path):
+                os.remove(temp_path)
+                return path, False
+            os.replace(temp_path, path)
+            manifest[filename] = digest
+            with open(manifest_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return path, True
+
+
+class JSONExporter(Exporter):
     """JSON导出器"""
 
-    def __init__(self):
-        self.output_dir = JSON_OUTPUT_DIR
+    format_name = "json"
+    extension = "json"
+    default_dir = JSON_OUTPUT_DIR
+
+    def write(self, table: Dict, out: HashingWriter):
+        # 与 json.dump(indent=2) 的输出相同，逐个列表元素写出
+        encoder = json.JSONEncoder(ensure_ascii=False, indent=2)
+        metadata = table["metadata"]
+        out.write('{\n  "metadata": {\n    "fetch_date": ')
+        out.write(json.dumps(metadata["fetch_date"]), volatile=True)
+        for key, value in metadata.items():
+            if key != "fetch_date":
+                out.write(f",\n    {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}")
+        out.write("\n  }")
+        for section in ("normal", "nsfw"):
+            out.write(f',\n  "{section}": ')
+            # 编码器逐段产出，每 4096 段合并写入一次；
+            # JSON 字符串中的换行都已转义，可以直接为每一行增加一级缩进
+            pending = []
+            for chunk in encoder.iterencode(table[section]):
+                pending.append(chunk)
+                if len(pending) >= 4096:
+                    out.write("".join(pending).replace("\n", "\n  "))
+                    pending = []
+            out.write("".join(pending).replace("\n", "\n  "))
+        out.write("\n}")
 
     def export(self, normal_list: List[Dict], nsfw_list: List[Dict],
-               year: int = None, top_n: int = 100) -> str:
+               year: int = None, top_n: int = 100, category: str = "anime") -> str:
         """
         导出为JSON格式
 
@@ -25,54 +205,110 @@ class JSONExporter:
             nsfw_list: 受限内容列表
             year: 年份
             top_n: 导出前N条
+            category: 条目类型名称（见配置 SUBJECT_TYPES），用于文件名
 
         Returns:
             输出文件路径
         """
-        if year is None:
-            year = datetime.now().year
-
-        # 合并 normal 和 nsfw 列表
-        all_anime = normal_list + nsfw_list
-
-        # 按 rank 从大到小排序
-        sorted_anime = sorted(all_anime, key=lambda x: -x.get("rank", 0))
-
-        # 取前 top_n 条
-        top_anime = sorted_anime[:top_n]
-
-        # 添加排名位置（rank_position）
-        for idx, anime in enumerate(top_anime, 1):
-            anime["rank_position"] = idx
-
-        # 分离 normal 和 nsfw
-        normal_output = [anime for anime in top_anime if not anime.get("nsfw", False)]
-        nsfw_output = [anime for anime in top_anime if anime.get("nsfw", False)]
-
-        # 构建输出数据
-        output_data = {
-            "metadata": {
-                "fetch_date": datetime.now().isoformat(),
-                "total_results": len(top_anime),
-                "year": year,
-                "normal_count": len(normal_output),
-                "nsfw_count": len(nsfw_output)
-            },
-            "normal": normal_output,
-            "nsfw": nsfw_output
-        }
-
-        # 生成文件名
-        filename = f"bangumi_worst_anime_{year}.json"
-        filepath = os.path.join(self.output_dir, filename)
-
-        # 写入文件
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(output_data, f, ensure_ascii=False, indent=2)
-
-        print(f"[OK] JSON文件已导出: {filepath}")
-        print(f"  - 总计: {len(top_anime)} 条（按rank从大到小排序）")
-        print(f"  - 普通内容: {len(normal_output)} 条")
-        print(f"  - 受限内容: {len(nsfw_output)} 条")
-
+        table = build_ranked_table(normal_list, nsfw_list, year=year, top_n=top_n, category=category)
+        filepath, changed = self.write_file(table)
+        print_export_summary(table, {self.format_name: (filepath, changed)})
         return filepath
+
+
+class CSVExporter(Exporter):
+    """CSV导出器（电子表格）"""
+
+    format_name = "csv"
+    extension = "csv"
+
+    def write(self, table: Dict, out: HashingWriter):
+        writer = csv.DictWriter(out, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for anime in table["entries"]:
+            writer.writerow(anime)
+
+
+class MarkdownExporter(Exporter):
+    """Markdown导出器（讨论帖）"""
+
+    format_name = "markdown"
+    extension = "md"
+
+    def write(self, table: Dict, out: HashingWriter):
+        metadata = table["metadata"]
+        out.write(f"# {metadata['year']}年Bangumi{category_label(metadata['category'])}烂番排行\n\n")
+        out.write(f"制表时间：{metadata['fetch_date'][:10]}\n\n", volatile=True)
+        out.write("| 名次 | 条目 | 评分 | 排名 | 评分人数 | 受限 |\n")
+        out.write("|------|------|------|------|----------|------|\n")
+        for anime in table["entries"]:
+            name = (anime.get("name_cn") or anime.get("name", "")).replace("|", "\\|")
+            out.write(f"| {anime['rank_position']} | [{name}](https://bgm.tv/subject/{anime['id']}) | "
+                      f"{anime.get('score', 0)} | {anime.get('rank', 0)} | {anime.get('rating_total', 0)} | "
+                      f"{'是' if anime.get('nsfw') else ''} |\n")
+
+
+class BBCodeExporter(Exporter):
+    """BBCode导出器（Bangumi索引描述和帖子）"""
+
+    format_name = "bbcode"
+    extension = "bbcode.txt"
+
+    def write(self, table: Dict, out: HashingWriter):
+        metadata = table["metadata"]
+        out.write(f"[b]{metadata['year']}年Bangumi{category_label(metadata['category'])}烂番排行[/b]\n")
+        out.write(f"制表时间：{metadata['fetch_date'][:10]}\n", volatile=True)
+        for section, title in (("normal", "普通条目"), ("nsfw", "受限条目")):
+            if not table[section]:
+                continue
+            out.write(f"\n[b]{title}[/b]\n")
+            for anime in table[section]:
+                name = anime.get("name_cn") or anime.get("name", "")
+                out.write(f"{anime['rank_position']}. [url=https://bgm.tv/subject/{anime['id']}]{name}[/url]"
+                          f" {anime.get('score', 0)}分\n")
+
+
+# 导出格式注册表: 格式名称 -> 导出器类
+EXPORTERS = {exporter.format_name: exporter
+             for exporter in (JSONExporter, CSVExporter, MarkdownExporter, BBCodeExporter)}
+
+
+def print_export_summary(table: Dict, results: Dict[str, Tuple[str, bool]]):
+    """输出各格式的导出结果"""
+    for format_name, (filepath, changed) in results.items():
+        if changed:
+            print(f"[OK] {format_name.upper()}文件已导出: {filepath}")
+        else:
+            print(f"[--] {format_name.upper()}文件内容未变化: {filepath}")
+    metadata = table["metadata"]
+    print(f"  - 总计: {metadata['total_results']} 条（按rank从大到小排序）")
+    print(f"  - 普通内容: {metadata['normal_count']} 条")
+    print(f"  - 受限内容: {metadata['nsfw_count']} 条")
+
+
+def export_all(normal_list: List[Dict], nsfw_list: List[Dict], year: int = None, top_n: int = 100,
+               category: str = "anime", formats: Iterable[str] = tuple(EXPORTERS),
+               output_dirs: Dict[str, str] = None) -> Dict[str, Tuple[str, bool]]:
+    """
+    生成一次榜单，并发写出多个格式
+
+    Args:
+        normal_list: 普通内容列表
+        nsfw_list: 受限内容列表
+        year: 年份
+        top_n: 导出前N条
+        category: 条目类型名称
+        formats: 导出格式（EXPORTERS 的键）
+        output_dirs: 按格式覆盖输出目录
+
+    Returns:
+        {格式名称: (文件路径, 内容是否变化)}
+    """
+    table = build_ranked_table(normal_list, nsfw_list, year=year, top_n=top_n, category=category)
+    output_dirs = output_dirs or {}
+    exporters = [EXPORTERS[name](output_dir=output_dirs.get(name)) for name in formats]
+    with ThreadPoolExecutor(max_workers=len(exporters) or 1) as executor:
+        futures = {exporter.format_name: executor.submit(exporter.write_file, table) for exporter in exporters}
+        results = {name: future.result() for name, future in futures.items()}
+    print_export_summary(table, results)
+    return results
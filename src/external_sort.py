@@ -0,0 +1,261 @@
+"""
+外部排序
+抓取整个条目目录时，全部条目可能放不进小内存的机器。本模块在内存中最多保留约一个内存预算的记录，
+超出时把已排序的一段（run）写入临时文件，输出时对各段做 k 路归并（heapq.merge）。
+同时打开的段数不超过 MERGE_FAN_IN，段更多时先把相邻的段分批归并成较长的中间段。
+归并是稳定的，结果与对全部记录调用 sorted() 相同。
+"""
+import contextlib
+import heapq
+import itertools
+import json
+import os
+import sys
+import tempfile
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config.config import SORT_MEMORY_BUDGET_MB
+from src.data_processor import DataProcessor
+from src.log import get_logger, kv
+
+logger = get_logger("external_sort")
+
+MB = 1024 * 1024
+
+# 缓冲记录的内存占用按 sys.getsizeof(序列化文本) 计算（Python 字符串的实际大小，
+# 中日韩文字每字 2 字节、表情等每字 4 字节，另含对象头），再加上每条记录的元组和排序键的大致开销
+RECORD_OVERHEAD = 120
+
+# 一次归并同时打开的有序段文件数上限
+MERGE_FAN_IN = 64
+
+
+class ExternalSorter:
+    """按 key 排序任意数量的可序列化为 JSON 的记录，内存占用受 memory_budget 限制"""
+
+    def __init__(self, key: Callable, memory_budget: int = SORT_MEMORY_BUDGET_MB * MB,
+                 tmp_dir: Optional[str] = None, fan_in: int = MERGE_FAN_IN):
+        """
+        Args:
+            key: 排序键函数（作用于记录）
+            memory_budget: 内存中缓冲记录的最大字节数（按 RECORD_OVERHEAD 处说明的方法估算）
+            tmp_dir: 有序段临时文件所在目录（默认系统临时目录）
+            fan_in: 一次归并同时打开的有序段数上限（至少为 2）
+        """
+        self.key = key
+        self.memory_budget = memory_budget
+        self.tmp_dir = tmp_dir
+        self.fan_in = max(2, fan_in)
+        self.runs: List[str] = []
+        self.count = 0
+        self.spilled_bytes = 0
+        self._buffer: List[Tuple] = []  # (排序键, 序列化文本)
+        self._buffer_bytes = 0
+
+    def add(self, record):
+        """添加一条记录，缓冲超出内存预算时写出一个有序段"""
+        line = json.dumps(record, ensure_ascii=False)
+        self._buffer.append((self.key(record), line))
+        self._buffer_bytes += sys.getsizeof(line) + RECORD_OVERHEAD
+        self.count += 1
+        if self._buffer_bytes >= self.memory_budget:
+            self.spill()
+
+    def extend(self, records: Iterable):
+        """添加多条记录"""
+        for record in records:
+            self.add(record)
+
+    def spill(self):
+        """把缓冲中的记录排序后写入一个临时文件"""
+        if not self._buffer:
+            return
+        self._buffer.sort(key=lambda entry: entry[0])
+        path = self._write_run(line for _, line in self._buffer)
+        self.runs.append(path)
+        self.spilled_bytes += os.path.getsize(path)
+        logger.debug("写出有序段", extra=kv(path=path, records=len(self._buffer), runs=len(self.runs)))
+        self._buffer = []
+        self._buffer_bytes = 0
+
+    def _write_run(self, lines: Iterable[str]) -> str:
+        fd, path = tempfile.mkstemp(prefix="sort_run_", suffix=".jsonl", dir=self.tmp_dir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line)
+                f.write("\n")
+        return path
+
+    def _read_run(self, path: str) -> Iterator:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def _read_run_lines(self, path: str) -> Iterator[Tuple]:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                yield self.key(json.loads(line)), line
+
+    def _reduce_runs(self):
+        """
+        段数超过 fan_in 时，把相邻的 fan_in 个段归并为一个中间段，直到最终归并
+        （另加内存中的缓冲）同时打开的文件数不超过 fan_in
+
+        只归并相邻的段并保持先后顺序，键相同的记录仍按添加顺序输出。
+        """
+        while len(self.runs) > self.fan_in - 1:
+            merged = []
+            for start in range(0, len(self.runs), self.fan_in):
+                group = self.runs[start:start + self.fan_in]
+                if len(group) == 1:
+                    merged.append(group[0])
+                    continue
+                readers = [self._read_run_lines(path) for path in group]
+                lines = (line for _, line in heapq.merge(*readers, key=lambda entry: entry[0]))
+                merged.append(self._write_run(lines))
+                for path in group:
+                    os.remove(path)
+            logger.debug("归并中间段", extra=kv(runs_before=len(self.runs), runs_after=len(merged)))
+            self.runs = merged
+
+    def __iter__(self) -> Iterator:
+        """
+        按 key 顺序输出全部记录（可以多次遍历）
+
+        返回的生成器提前停止遍历时应调用 close()，以关闭打开的有序段文件。
+        """
+        self._buffer.sort(key=lambda entry: entry[0])
+        buffered = (json.loads(line) for _, line in self._buffer)
+        if not self.runs:
+            return buffered
+        self._reduce_runs()
+        return self._merge(buffered)
+
+    def _merge(self, buffered: Iterator) -> Iterator:
+        readers = [self._read_run(path) for path in self.runs]
+        try:
+            # 先写出的段在前，键相同时保持添加顺序
+            yield from heapq.merge(*readers, buffered, key=self.key)
+        finally:
+            for reader in readers:
+                reader.close()
+
+    def close(self):
+        """删除临时文件"""
+        for path in self.runs:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.runs = []
+        self._buffer = []
+        self._buffer_bytes = 0
+
+    def __enter__(self) -> "ExternalSorter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SpillingRanking:
+    """
+    按条目ID去重、内存受限的条目集合，可按评分顺序和排名顺序输出
+
+    同一条目多次加入时保留最后一次（与字典赋值相同），可直接作为 BandCrawler 的去重索引。
+    内存中只保留每个条目的版本号和是否为受限内容，条目本身进入两个外部排序器。
+    """
+
+    def __init__(self, memory_budget_mb: float = SORT_MEMORY_BUDGET_MB, tmp_dir: Optional[str] = None):
+        """
+        Args:
+            memory_budget_mb: 内存预算（MB），由评分顺序和排名顺序两个排序器平分
+            tmp_dir: 临时文件目录
+        """
+        budget = int(memory_budget_mb * MB / 2)
+        self._latest: Dict[int, Tuple[int, bool]] = {}  # 条目ID -> (最新版本号, 是否受限内容)
+        self._version = 0
+        self.by_score_sorter = ExternalSorter(lambda record: DataProcessor.score_key(record[1]), budget, tmp_dir)
+        self.by_rank_sorter = ExternalSorter(lambda record: DataProcessor.rank_key(record[1]), budget, tmp_dir)
+
+    def __contains__(self, subject_id: int) -> bool:
+        return subject_id in self._latest
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    def __setitem__(self, subject_id: int, anime: Dict):
+        self._version += 1
+        self._latest[subject_id] = (self._version, bool(anime.get("nsfw", False)))
+        record = (self._version, anime)
+        self.by_score_sorter.add(record)
+        self.by_rank_sorter.add(record)
+
+    def _current(self, records: Iterator) -> Iterator[Dict]:
+        """跳过被后来的版本替换的旧记录"""
+        latest = self._latest
+        try:
+            for version, anime in records:
+                if latest[anime["id"]][0] == version:
+                    yield anime
+        finally:
+            records.close()
+
+    def by_score(self) -> Iterator[Dict]:
+        """按评分从低到高输出（与 DataProcessor.sort_by_score 的顺序一致）"""
+        return self._current(iter(self.by_score_sorter))
+
+    def by_rank(self) -> Iterator[Dict]:
+        """按 rank 从大到小输出（与导出榜单的顺序一致）"""
+        return self._current(iter(self.by_rank_sorter))
+
+    def top_by_rank(self, top_n: int) -> List[Dict]:
+        """按 rank 从大到小取前 top_n 条"""
+        # 提前停止归并时关闭生成器，立即释放有序段的文件句柄
+        with contextlib.closing(self.by_rank()) as ranked:
+            return list(itertools.islice(ranked, top_n))
+
+    def counts(self) -> Tuple[int, int]:
+        """(普通内容条目数, 受限内容条目数)"""
+        nsfw = sum(1 for _, is_nsfw in self._latest.values() if is_nsfw)
+        return len(self._latest) - nsfw, nsfw
+
+    def stats(self) -> Dict:
+        """写出的有序段数和临时文件大小"""
+        sorters = (self.by_score_sorter, self.by_rank_sorter)
+        return {
+            "items": len(self._latest),
+            "records": self.by_score_sorter.count,
+            "runs": sum(len(sorter.runs) for sorter in sorters),
+            "spilled_mb": round(sum(sorter.spilled_bytes for sorter in sorters) / MB, 1),
+        }
+
+    def close(self):
+        self.by_score_sorter.close()
+        self.by_rank_sorter.close()
+
+    def __enter__(self) -> "SpillingRanking":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def write_jsonl(records: Iterable[Dict], path: str) -> int:
+    """
+    逐条写出 JSON Lines 文件
+
+    Returns:
+        写出的条目数
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    count = 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write("\n")
+            count += 1
+    os.replace(tmp_path, path)
+    return count
@@ -0,0 +1,58 @@
+"""
+索引快照格式
+get_index.py 把索引基本信息写入 index_{索引ID}_{时间戳}.json，条目逐页追加写入同目录下的
+NDJSON 文件（每行一个条目），JSON 中的 "subjects_file" 字段指向该文件。
+旧版快照的条目直接内联在 "subjects" 字段中，读取时两种格式都兼容。
+"""
+import json
+import os
+from typing import Dict, Iterable, Iterator, TextIO
+
+
+def write_snapshot_subjects(f: TextIO, subjects: Iterable[Dict]) -> int:
+    """
+    把一页条目追加写入NDJSON快照
+
+    Args:
+        f: 已打开的NDJSON文件
+        subjects: 条目列表
+
+    Returns:
+        写入的条目数
+    """
+    count = 0
+    for subject in subjects:
+        f.write(json.dumps(subject, ensure_ascii=False))
+        f.write("\n")
+        count += 1
+    f.flush()
+    return count
+
+
+def iter_snapshot_subjects(filepath: str) -> Iterator[Dict]:
+    """
+    逐条读取索引快照中的条目
+
+    兼容两种格式：条目内联在 "subjects" 字段中的旧版JSON快照，
+    以及通过 "subjects_file" 指向同目录下NDJSON文件的流式快照。
+
+    Args:
+        filepath: 索引快照JSON文件路径
+
+    Yields:
+        条目字典
+    """
+    with open(filepath, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    subjects_file = data.get("subjects_file")
+    if not subjects_file:
+        yield from data.get("subjects", [])
+        return
+
+    subjects_path = os.path.join(os.path.dirname(filepath), subjects_file)
+    with open(subjects_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
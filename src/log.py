@@ -0,0 +1,169 @@
+"""
+结构化日志
+分级日志通过队列交给后台线程写出，避免控制台I/O阻塞请求循环；
+输出前自动隐藏访问令牌，请求级别的详细日志可以按比例采样
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+from datetime import datetime
+
+ROOT_LOGGER = "bgm"
+
+# 通过环境变量设置默认日志级别和采样比例
+LOG_LEVEL_ENV = "BGM_LOG_LEVEL"
+LOG_SAMPLE_ENV = "BGM_LOG_SAMPLE"
+
+_BEARER_PATTERN = re.compile(r"(Bearer\s+)[A-Za-z0-9._\-~+/=]+")
+_SECRET_KEYS = {"authorization", "access_token", "token", "bangumi_access_token"}
+REDACTED = "***"
+
+_listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """获取项目日志记录器（bgm.{name}）"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def kv(sample: bool = False, **fields) -> dict:
+    """
+    构造结构化字段，作为 logging 的 extra 参数使用
+
+    例如: logger.debug("请求详情", extra=kv(method="GET", url=url, sample=True))
+
+    Args:
+        sample: 是否为请求级别的详细日志（受 --log-sample 采样比例控制）
+        **fields: 结构化字段
+    """
+    return {"fields": fields, "sample": sample}
+
+
+def redact(value):
+    """递归隐藏字符串、字典和列表中的访问令牌"""
+    if isinstance(value, str):
+        token = os.getenv("BANGUMI_ACCESS_TOKEN")
+        value = _BEARER_PATTERN.sub(rf"\1{REDACTED}", value)
+        if token and len(token) >= 8:
+            value = value.replace(token, REDACTED)
+        return value
+    if isinstance(value, dict):
+        return {k: REDACTED if str(k).lower() in _SECRET_KEYS else redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(redact(v) for v in value)
+    return value
+
+
+class RedactingFilter(logging.Filter):
+    """在日志进入队列前隐藏消息和字段中的访问令牌"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.msg = redact(record.getMessage())
+        record.args = None
+        if hasattr(record, "fields"):
+            record.fields = redact(record.fields)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """按比例保留请求级别的详细日志，其他日志不受影响"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sample", False) or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class StructuredFormatter(logging.Formatter):
+    """输出 `时间 级别 记录器 消息 key=value ...` 或每行一个JSON对象"""
+
+    def __init__(self, json_format: bool = False):
+        super().__init__()
+        self.json_format = json_format
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", None) or {}
+        timestamp = datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds")
+        if self.json_format:
+            entry = {"ts": timestamp, "level": record.levelname, "logger": record.name,
+                     "msg": record.getMessage(), **fields}
+            if record.exc_info:
+                entry["exc"] = self.formatException(record.exc_info)
+            return json.dumps(entry, ensure_ascii=False, default=str)
+
+        parts = [timestamp, f"{record.levelname:<7s}", record.name, record.getMessage()]
+        for key, value in fields.items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                value = json.dumps(value, ensure_ascii=False, default=str)
+            parts.append(f"{key}={value}")
+        line = " ".join(parts)
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def setup_logging(level: str = "INFO", json_format: bool = False, sample_rate: float = 1.0,
+                  stream=None):
+    """
+    配置项目日志：过滤和格式化在调用线程完成，写出由后台队列线程完成
+
+    Args:
+        level: 日志级别（DEBUG 时输出请求和响应详情）
+        json_format: 是否每行输出一个JSON对象
+        sample_rate: 请求级别详细日志的保留比例（0~1）
+        stream: 输出流，默认标准输出
+    """
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(StructuredFormatter(json_format))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+    queue_handler.addFilter(RedactingFilter())
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level.upper())
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """写出队列中剩余的日志并停止后台线程"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def add_logging_arguments(parser):
+    """为入口脚本添加日志参数"""
+    parser.add_argument("--log-level", default=os.getenv(LOG_LEVEL_ENV, "INFO"),
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR"], type=str.upper,
+                        help=f"日志级别，DEBUG 输出每个请求的详情（默认：INFO，环境变量 {LOG_LEVEL_ENV}）")
+    parser.add_argument("--log-json", action="store_true", help="每行输出一个JSON格式的日志")
+    parser.add_argument("--log-sample", type=float, default=float(os.getenv(LOG_SAMPLE_ENV, 1.0)),
+                        help=f"请求级别详细日志的采样比例 0~1（默认：1，环境变量 {LOG_SAMPLE_ENV}）")
+
+
+def setup_logging_from_args(args):
+    """根据 add_logging_arguments 添加的参数配置日志"""
+    setup_logging(args.log_level, json_format=args.log_json, sample_rate=args.log_sample)
@@ -0,0 +1,353 @@
+"""
+HTTP请求指标
+按端点记录延迟直方图、状态码、重试、速率限制等待和传输字节数，
+运行结束时输出JSON报告和Prometheus文本格式文件
+"""
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from src.clock import get_clock
+from src.scheduler import get_scheduler
+from src.tracing import span
+
+METRICS_DIR = os.path.join("output", "metrics")
+
+# 延迟直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def normalize_endpoint(url: str) -> str:
+    """
+    将URL归一化为端点名：去掉域名和查询参数，数字路径段替换为 {id}
+
+    例如 https://api.bgm.tv/v0/indices/74044/subjects?limit=50 -> /v0/indices/{id}/subjects
+    """
+    return _NUMERIC_SEGMENT.sub("/{id}", urlparse(url).path or "/")
+
+
+class EndpointStats:
+    """单个端点的统计"""
+
+    def __init__(self):
+        self.requests = 0
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.sleep_seconds = Counter()
+
+    def observe_latency(self, latency: float):
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.bucket_counts[i] += 1
+                return
+        self.bucket_counts[-1] += 1
+
+    def to_dict(self) -> Dict:
+        observed = sum(self.bucket_counts)
+        return {
+            "requests": self.requests,
+            "statuses": dict(self.statuses),
+            "errors": dict(self.errors),
+            "retries": self.retries,
+            "latency": {
+                "count": observed,
+                "sum": round(self.latency_sum, 6),
+                "mean": round(self.latency_sum / observed, 6) if observed else 0.0,
+                "max": round(self.latency_max, 6),
+                "buckets": {str(bound): count for bound, count
+                            in zip(LATENCY_BUCKETS + ("+Inf",), self.bucket_counts)},
+            },
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "sleep_seconds": {k: round(v, 6) for k, v in self.sleep_seconds.items()},
+        }
+
+
+class HTTPMetrics:
+    """线程安全的HTTP指标注册表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空所有指标"""
+        with self._lock:
+            self.started_at = time.time()
+            self._endpoints = defaultdict(EndpointStats)
+
+    def _stats(self, method: str, url: str) -> EndpointStats:
+        return self._endpoints[(method.upper(), normalize_endpoint(url))]
+
+    def observe_response(self, method: str, url: str, status: int, latency: float,
+                         bytes_sent: int = 0, bytes_received: int = 0):
+        """记录一次收到响应的请求"""
+        with self._lock:
+            stats = self._stats(method, url)
+            stats.requests += 1
+            stats.statuses[str(status)] += 1
+            stats.observe_latency(latency)
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+
+    def add_bytes_received(self, method: str, url: str, size: int):
+        """累计流式响应在读取时收到的字节数"""
+        with self._lock:
+            self._stats(method, url).bytes_received += size
+
+    def observe_error(self, method: str, url: str, error: str, latency: float, bytes_sent: int = 0):
+        """记录一次未收到响应的请求（超时、连接错误等）"""
+        with self._lock:
+            stats = self._stats(method, url)
+            stats.requests += 1
+            stats.errors[error] += 1
+            stats.observe_latency(latency)
+            stats.bytes_sent += bytes_sent
+
+    def record_retry(self, method: str, url: str):
+        """记录一次重试"""
+        with self._lock:
+            self._stats(method, url).retries += 1
+
+    def record_sleep(self, method: str, url: str, seconds: float, reason: str):
+        """
+        记录一次等待
+
+        Args:
+            reason: "rate_limit"（429后退避）、"retry"（失败后重试）或 "pacing"（请求间隔）
+        """
+        with self._lock:
+            self._stats(method, url).sleep_seconds[reason] += seconds
+
+    def total_sleep(self, reason: Optional[str] = None) -> float:
+        """所有端点累计的等待时间（秒）"""
+        with self._lock:
+            return sum(seconds for stats in self._endpoints.values()
+                       for r, seconds in stats.sleep_seconds.items() if reason is None or r == reason)
+
+    def total_requests(self) -> int:
+        """所有端点累计的请求数"""
+        with self._lock:
+            return sum(stats.requests for stats in self._endpoints.values())
+
+    def snapshot(self) -> Dict:
+        """返回可序列化为JSON的指标快照"""
+        with self._lock:
+            endpoints = {f"{method} {endpoint}": stats.to_dict()
+                         for (method, endpoint), stats in sorted(self._endpoints.items())}
+            started_at = self.started_at
+
+        return {
+            "started_at": datetime.fromtimestamp(started_at).isoformat(),
+            "finished_at": datetime.now().isoformat(),
+            "wall_time": round(time.time() - started_at, 6),
+            "total_requests": sum(e["requests"] for e in endpoints.values()),
+            "total_retries": sum(e["retries"] for e in endpoints.values()),
+            "total_bytes_received": sum(e["bytes_received"] for e in endpoints.values()),
+            "total_sleep_seconds": round(sum(sum(e["sleep_seconds"].values())
+                                             for e in endpoints.values()), 6),
+            "endpoints": endpoints,
+        }
+
+    def to_prometheus(self) -> str:
+        """以Prometheus文本格式输出指标"""
+        with self._lock:
+            items = sorted(self._endpoints.items())
+
+        lines = [
+            "# HELP bgm_http_requests_total HTTP requests by endpoint and status.",
+            "# TYPE bgm_http_requests_total counter",
+        ]
+        for (method, endpoint), stats in items:
+            for status, count in sorted(stats.statuses.items()):
+                lines.append(f'bgm_http_requests_total{{method="{method}",endpoint="{endpoint}",'
+                             f'status="{status}"}} {count}')
+            for error, count in sorted(stats.errors.items()):
+                lines.append(f'bgm_http_requests_total{{method="{method}",endpoint="{endpoint}",'
+                             f'status="error",error="{error}"}} {count}')
+
+        lines += ["# HELP bgm_http_request_duration_seconds HTTP request latency.",
+                  "# TYPE bgm_http_request_duration_seconds histogram"]
+        for (method, endpoint), stats in items:
+            labels = f'method="{method}",endpoint="{endpoint}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), stats.bucket_counts):
+                cumulative += count
+                lines.append(f'bgm_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"bgm_http_request_duration_seconds_sum{{{labels}}} {stats.latency_sum:.6f}")
+            lines.append(f"bgm_http_request_duration_seconds_count{{{labels}}} {cumulative}")
+
+        for name, help_text, attr in (
+                ("bgm_http_retries_total", "HTTP request retries.", "retries"),
+                ("bgm_http_sent_bytes_total", "Request payload bytes.", "bytes_sent"),
+                ("bgm_http_received_bytes_total", "Response payload bytes.", "bytes_received")):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (method, endpoint), stats in items:
+                lines.append(f'{name}{{method="{method}",endpoint="{endpoint}"}} {getattr(stats, attr)}')
+
+        lines += ["# HELP bgm_http_sleep_seconds_total Time spent waiting before requests.",
+                  "# TYPE bgm_http_sleep_seconds_total counter"]
+        for (method, endpoint), stats in items:
+            for reason, seconds in sorted(stats.sleep_seconds.items()):
+                lines.append(f'bgm_http_sleep_seconds_total{{method="{method}",endpoint="{endpoint}",'
+                             f'reason="{reason}"}} {seconds:.6f}')
+
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, run_name: str, output_dir: str = METRICS_DIR) -> tuple:
+        """
+        写出JSON报告和Prometheus文本格式文件
+
+        Args:
+            run_name: 运行名称（入口脚本名）
+            output_dir: 输出目录
+
+        Returns:
+            (JSON报告路径, Prometheus文件路径)
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        base = os.path.join(output_dir, f"{run_name}_{timestamp}")
+
+        report = self.snapshot()
+        report["run"] = run_name
+        with open(f"{base}.json", "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        with open(f"{base}.prom", "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+
+        return f"{base}.json", f"{base}.prom"
+
+
+# 进程内共享的指标注册表
+http_metrics = HTTPMetrics()
+
+_report_registered = set()
+
+
+def send_request(sender, method: str, url: str, **kwargs):
+    """
+    发送HTTP请求并记录延迟、状态码和传输字节数
+
+    所有客户端都通过此函数发出请求，是指标采集的唯一入口。
+
+    Args:
+        sender: requests.Session 或 requests 模块（提供 request 方法）
+        method: HTTP方法
+        url: 完整URL
+        **kwargs: 传给 request 的其他参数
+
+    Returns:
+        requests.Response
+    """
+    with span(f"{method} {normalize_endpoint(url)}", "http", url=url) as request_span:
+        start = time.perf_counter()
+        try:
+            response = sender.request(method, url, **kwargs)
+        except Exception as e:
+            http_metrics.observe_error(method, url, type(e).__name__, time.perf_counter() - start)
+            raise
+
+        latency = time.perf_counter() - start
+        body = getattr(response.request, "body", None) or b""
+        if kwargs.get("stream"):
+            # 流式响应的正文尚未读取（分块传输时也没有 Content-Length），在读取正文时逐块累计
+            _count_streamed_bytes(response, method, url)
+            http_metrics.observe_response(method, url, response.status_code, latency, bytes_sent=len(body))
+            request_span.set(status=response.status_code)
+            return response
+
+        received = len(response.content or b"")
+        http_metrics.observe_response(method, url, response.status_code, latency,
+                                      bytes_sent=len(body), bytes_received=received)
+        request_span.set(status=response.status_code, bytes=received)
+        return response
+
+
+def _count_streamed_bytes(response, method: str, url: str):
+    """包装 response.iter_content，读取正文时把每块的字节数计入指标（response.content 也经由它读取）"""
+    iter_content = response.iter_content
+
+    def counting_iter_content(*args, **kwargs):
+        for chunk in iter_content(*args, **kwargs):
+            http_metrics.add_bytes_received(method, url, len(chunk))
+            yield chunk
+
+    response.iter_content = counting_iter_content
+
+
+def sleep_before_retry(method: str, url: str, seconds: float, reason: str = "retry"):
+    """
+    记录一次重试及其等待时间，然后等待
+
+    Args:
+        method: HTTP方法
+        url: 请求URL
+        seconds: 等待秒数
+        reason: "rate_limit"（429后退避）或 "retry"（失败后重试）
+    """
+    http_metrics.record_retry(method, url)
+    http_metrics.record_sleep(method, url, seconds, reason)
+    with span("retry_wait", "retry", reason=reason, seconds=seconds):
+        get_clock().sleep(seconds)
+
+
+def pace(method: str, url: str, priority: str = "fetch", flow: str = "") -> float:
+    """
+    在进程共享的请求调度器中排队等待轮到本次请求，并记录等待时间
+
+    Args:
+        method: HTTP方法
+        url: 即将请求的URL
+        priority: 优先级（见 src.scheduler.PRIORITIES）
+        flow: 请求来源，同一优先级内不同来源轮流放行
+
+    Returns:
+        实际等待的秒数
+    """
+    waited = get_scheduler().acquire(priority, flow)
+    http_metrics.record_sleep(method, url, waited, "pacing")
+    return waited
+
+
+def enable_run_report(run_name: str, output_dir: str = METRICS_DIR):
+    """
+    在进程退出时写出本次运行的指标报告
+
+    Args:
+        run_name: 运行名称（入口脚本名）
+        output_dir: 输出目录
+    """
+    if run_name in _report_registered:
+        return
+    _report_registered.add(run_name)
+
+    def write():
+        if not http_metrics.total_requests():
+            return
+        json_path, prom_path = http_metrics.write_report(run_name, output_dir)
+        snapshot = http_metrics.snapshot()
+        print(f"\n请求指标: {snapshot['total_requests']} 次请求, {snapshot['total_retries']} 次重试, "
+              f"等待 {snapshot['total_sleep_seconds']:.1f} 秒, "
+              f"接收 {snapshot['total_bytes_received'] / 1024:.1f} KiB")
+        print(f"  报告: {json_path}")
+        print(f"  Prometheus: {prom_path}")
+
+    atexit.register(write)
@@ -0,0 +1,382 @@
+"""
+流水线运行器
+把 main.py、get_index.py、get_current_ranks.py 和 upload_to_index.py 建模为带依赖的阶段：
+
+    fetch ──────────────┐
+    index ──→ ranks ──→ upload
+
+每个阶段声明输入（上游输出文件）和输出，阶段脚本及其递归导入的项目内模块自动计入输入。运行前计算输入指纹，
+指纹与上次成功运行一致且输出仍然存在时跳过该阶段；互不依赖的阶段并发执行。
+状态保存在 output/.pipeline/state.json，各阶段的输出日志保存在 output/.pipeline/logs/。
+"""
+import argparse
+import ast
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config.config import INDICES_DIR, JSON_OUTPUT_DIR, OLD_INDEX_ID, OUTPUT_DIR, RANKS_DIR
+from src.tracing import add_trace_argument, setup_tracing, span
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PIPELINE_DIR = os.path.join(OUTPUT_DIR, ".pipeline")
+STATE_FILE = os.path.join(PIPELINE_DIR, "state.json")
+LOG_DIR = os.path.join(PIPELINE_DIR, "logs")
+
+# 访问远程数据的阶段即使输入未变，超过该时间（小时）也会重新运行
+REMOTE_MAX_AGE_HOURS = 24
+
+# 阶段失败时显示的日志行数
+LOG_TAIL_LINES = 20
+
+_GLOB_CHARS = set("*?[")
+
+
+def code_dependencies(script: str) -> List[str]:
+    """
+    脚本及其递归导入的项目内模块文件（包括函数内的延迟导入）
+
+    Args:
+        script: 脚本路径（相对于项目根目录）
+
+    Returns:
+        按路径排序的 .py 文件列表
+    """
+    found = set()
+    queue = [os.path.join(ROOT_DIR, script)]
+    while queue:
+        path = queue.pop()
+        if path in found:
+            continue
+        found.add(path)
+        with open(path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                # from src import x 中的 x 也可能是模块
+                names = [node.module] + [f"{node.module}.{alias.name}" for alias in node.names]
+            else:
+                continue
+            for name in names:
+                module_path = os.path.join(ROOT_DIR, *name.split(".")) + ".py"
+                if os.path.isfile(module_path):
+                    queue.append(module_path)
+    return sorted(found)
+
+
+class Stage:
+    """流水线中的一个阶段"""
+
+    def __init__(self, name: str, script: str, args: List[str] = None, inputs: List[str] = None,
+                 outputs: List[str] = None, deps: List[str] = None, remote: bool = False):
+        """
+        Args:
+            name: 阶段名称
+            script: 执行的脚本（相对于项目根目录，在当前目录下运行）
+            args: 脚本参数
+            inputs: 输入文件（脚本和它导入的模块自动加入）；含通配符的模式取最新的匹配文件，只比较内容
+            outputs: 输出文件模式，每个模式至少匹配一个文件才视为输出完整
+            deps: 依赖的阶段
+            remote: 是否读取远程数据（输入未变时按 max_age 判断是否过期）
+        """
+        self.name = name
+        self.script = script
+        self.args = list(args or [])
+        self.inputs = code_dependencies(script) + list(inputs or [])
+        self.outputs = list(outputs or [])
+        self.deps = list(deps or [])
+        self.remote = remote
+
+    def command(self) -> List[str]:
+        return [sys.executable, os.path.join(ROOT_DIR, self.script)] + self.args
+
+
+def build_stages(year: int) -> Dict[str, Stage]:
+    """
+    定义年度流程的各阶段
+
+    Args:
+        year: 排行年份
+
+    Returns:
+        {阶段名称: Stage}
+    """
+    export_file = os.path.join(JSON_OUTPUT_DIR, f"bangumi_worst_anime_{year}.json")
+    index_snapshot = os.path.join(INDICES_DIR, f"index_{OLD_INDEX_ID}_*.json")
+    index_subjects = os.path.join(INDICES_DIR, f"index_{OLD_INDEX_ID}_*.subjects.ndjson")
+    ranks_file = os.path.join(RANKS_DIR, "ranks_*.json")
+
+    # 代码输入（脚本、config/config.py 和导入的 src 模块）由 Stage 自动加入
+    stages = [
+        Stage("fetch", "main.py", args=["--year", str(year)], outputs=[export_file], remote=True),
+        Stage("index", "get_index.py", outputs=[index_snapshot], remote=True),
+        Stage("ranks", "get_current_ranks.py", inputs=[index_snapshot],
+              outputs=[ranks_file], deps=["index"], remote=True),
+        Stage("upload", "upload_to_index.py",
+              inputs=[export_file, index_snapshot, index_subjects, ranks_file],
+              deps=["fetch", "index", "ranks"]),
+    ]
+    return {stage.name: stage for stage in stages}
+
+
+class PipelineState:
+    """各阶段上次成功运行的指纹，以及文件内容哈希的缓存（按大小和修改时间失效）"""
+
+    def __init__(self, path: str = STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Dict] = {}
+        self.files: Dict[str, List] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.stages = data.get("stages", {})
+            self.files = data.get("files", {})
+
+    def file_hash(self, path: str) -> str:
+        """文件内容的SHA-256，大小和修改时间未变时使用缓存"""
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        with self._lock:
+            cached = self.files.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        value = digest.hexdigest()
+        with self._lock:
+            self.files[key] = [stat.st_size, stat.st_mtime_ns, value]
+        return value
+
+    def record(self, name: str, fingerprint: str, duration: float):
+        """记录阶段成功运行"""
+        with self._lock:
+            self.stages[name] = {
+                "fingerprint": fingerprint,
+                "finished_at": time.time(),
+                "duration": round(duration, 3),
+            }
+            self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"stages": self.stages, "files": self.files}, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+
+def resolve_input(pattern: str) -> Optional[str]:
+    """解析输入模式：普通路径原样返回，通配符模式返回最新的匹配文件"""
+    if _GLOB_CHARS & set(pattern):
+        matches = glob.glob(pattern)
+        return max(matches, key=os.path.getmtime) if matches else None
+    return pattern if os.path.exists(pattern) else None
+
+
+def fingerprint_stage(stage: Stage, state: PipelineState) -> str:
+    """
+    计算阶段输入的指纹：命令参数和每个输入文件的内容哈希
+
+    通配符输入只比较内容，不比较文件名，因此上游重新生成了内容相同的带时间戳文件时不会触发下游。
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([stage.script] + stage.args).encode("utf-8"))
+    for pattern in stage.inputs:
+        path = resolve_input(pattern)
+        digest.update(f"\0{pattern}\0{state.file_hash(path) if path else 'missing'}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def check_stage(stage: Stage, fingerprint: str, state: PipelineState, force: bool,
+                max_age_hours: Optional[float]) -> Optional[str]:
+    """
+    判断阶段是否需要运行
+
+    Returns:
+        需要运行的原因；已是最新时返回 None
+    """
+    if force:
+        return "--force"
+    previous = state.stages.get(stage.name)
+    if not previous:
+        return "首次运行"
+    if previous.get("fingerprint") != fingerprint:
+        return "输入已变化"
+    for pattern in stage.outputs:
+        if not glob.glob(pattern):
+            return f"输出缺失: {pattern}"
+    if stage.remote and max_age_hours is not None:
+        age_hours = (time.time() - previous.get("finished_at", 0)) / 3600
+        if age_hours > max_age_hours:
+            return f"远程数据已超过 {max_age_hours:g} 小时"
+    return None
+
+
+def run_stage(stage: Stage) -> tuple:
+    """
+    以子进程运行阶段，输出写入日志文件
+
+    Returns:
+        (退出码, 日志文件路径, 耗时)
+    """
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_path = os.path.join(LOG_DIR, f"{stage.name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+
+    start = time.perf_counter()
+    with span(stage.name, "stage", command=" ".join(stage.command()[1:])):
+        with open(log_path, "w", encoding="utf-8") as log:
+            returncode = subprocess.run(stage.command(), stdout=log, stderr=subprocess.STDOUT,
+                                        env=env).returncode
+    return returncode, log_path, time.perf_counter() - start
+
+
+def select_stages(stages: Dict[str, Stage], targets: List[str]) -> List[str]:
+    """选择目标阶段及其所有上游阶段，按定义顺序返回"""
+    selected = set()
+
+    def visit(name: str):
+        if name not in selected:
+            selected.add(name)
+            for dep in stages[name].deps:
+                visit(dep)
+
+    for target in targets:
+        visit(target)
+    return [name for name in stages if name in selected]
+
+
+def run_pipeline(stages: Dict[str, Stage], targets: List[str], force: List[str] = (),
+                 max_age_hours: Optional[float] = REMOTE_MAX_AGE_HOURS, jobs: int = 2,
+                 dry_run: bool = False, state: PipelineState = None) -> Dict[str, Dict]:
+    """
+    按依赖顺序运行阶段，跳过已是最新的阶段，互不依赖的阶段并发运行
+
+    Args:
+        stages: 所有阶段
+        targets: 目标阶段（自动包含上游阶段）
+        force: 强制运行的阶段（"all" 表示全部）
+        max_age_hours: 远程阶段的最大缓存时间，None 表示不过期
+        jobs: 同时运行的阶段数
+        dry_run: 只显示计划，不运行
+        state: 流水线状态（默认从 STATE_FILE 读取）
+
+    Returns:
+        {阶段名称: {"status": ran/skipped/failed/blocked, "reason": str, "duration": float, "log": str}}
+    """
+    state = state or PipelineState()
+    pending = select_stages(stages, targets)
+    force = set(pending) if "all" in force else set(force)
+    planned = set()
+    results: Dict[str, Dict] = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        while pending or running:
+            # 启动所有依赖已完成的阶段
+            for name in list(pending):
+                stage = stages[name]
+                if any(dep not in results for dep in stage.deps):
+                    continue
+                pending.remove(name)
+                dep_status = [results[dep]["status"] for dep in stage.deps]
+
+                if any(status in ("failed", "blocked") for status in dep_status):
+                    results[name] = {"status": "blocked", "reason": "上游阶段失败"}
+                    print(f"  ✗ {name:<7s} 跳过（上游阶段失败）")
+                    continue
+
+                # 上游在本次运行中重新执行时，输入必然已写入磁盘，此时才计算指纹
+                fingerprint = fingerprint_stage(stage, state)
+                reason = check_stage(stage, fingerprint, state, name in force, max_age_hours)
+                if reason is None and planned & set(stage.deps):
+                    reason = "上游阶段将运行"
+                if reason is None:
+                    results[name] = {"status": "skipped", "reason": "已是最新"}
+                    print(f"  = {name:<7s} 已是最新，跳过")
+                    continue
+                if dry_run:
+                    # 预演时假设该阶段已运行，下游按其输入变化处理
+                    results[name] = {"status": "ran", "reason": reason, "dry_run": True}
+                    planned.add(name)
+                    print(f"  ▶ {name:<7s} 将运行（{reason}）")
+                    continue
+
+                print(f"  ▶ {name:<7s} 开始（{reason}）: {' '.join(stage.command()[1:])}")
+                running[executor.submit(run_stage, stage)] = (name, fingerprint, reason)
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, fingerprint, reason = running.pop(future)
+                returncode, log_path, duration = future.result()
+                result = {"reason": reason, "duration": duration, "log": log_path}
+                if returncode == 0:
+                    state.record(name, fingerprint, duration)
+                    result["status"] = "ran"
+                    print(f"  ✓ {name:<7s} 完成 {duration:.1f}s")
+                else:
+                    result["status"] = "failed"
+                    print(f"  ✗ {name:<7s} 失败（退出码 {returncode}，{duration:.1f}s），日志: {log_path}")
+                    with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+                        for line in f.readlines()[-LOG_TAIL_LINES:]:
+                            print(f"      {line.rstrip()}")
+                results[name] = result
+
+    return results
+
+
+def main(argv=None):
+    """主函数"""
+    stage_names = list(build_stages(datetime.now().year))
+    parser = argparse.ArgumentParser(description="按依赖顺序运行年度流程，跳过输入未变化的阶段")
+    parser.add_argument("targets", nargs="*", metavar="STAGE", help=f"目标阶段（自动包含上游阶段，默认全部）: {', '.join(stage_names)}")
+    parser.add_argument("--year", type=int, default=datetime.now().year,
+                        help="年份（默认：当前年份）")
+    parser.add_argument("--force", nargs="*", default=None, metavar="STAGE",
+                        help="强制运行指定阶段；不带参数时强制运行全部阶段")
+    parser.add_argument("--max-age", type=float, default=REMOTE_MAX_AGE_HOURS,
+                        help=f"远程数据的最大缓存时间（小时，默认：{REMOTE_MAX_AGE_HOURS}，0 表示每次重新获取）")
+    parser.add_argument("--jobs", type=int, default=2, help="同时运行的阶段数（默认：2）")
+    parser.add_argument("--dry-run", action="store_true", help="只显示将运行的阶段")
+    add_trace_argument(parser)
+    args = parser.parse_args(argv)
+    setup_tracing("pipeline", args.trace)
+
+    stages = build_stages(args.year)
+    targets = args.targets or list(stages)
+    force = ["all"] if args.force == [] else (args.force or [])
+    unknown = [name for name in targets + force if name not in stages and name != "all"]
+    if unknown:
+        parser.error(f"未知阶段: {', '.join(unknown)}（可选: {', '.join(stage_names)}）")
+
+    print("=" * 60)
+    print("Bangumi烂番排行流水线")
+    print("=" * 60)
+    start = time.perf_counter()
+    with span("pipeline", "run", targets=targets):
+        results = run_pipeline(stages, targets, force=force, max_age_hours=args.max_age,
+                               jobs=args.jobs, dry_run=args.dry_run)
+
+    print("-" * 60)
+    counts = {status: sum(1 for r in results.values() if r["status"] == status)
+              for status in ("ran", "skipped", "failed", "blocked")}
+    print(f"运行 {counts['ran']} 个, 跳过 {counts['skipped']} 个, 失败 {counts['failed']} 个, "
+          f"未运行 {counts['blocked']} 个, 总耗时 {time.perf_counter() - start:.1f}s")
+    return 1 if counts["failed"] or counts["blocked"] else 0
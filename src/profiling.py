@@ -0,0 +1,106 @@
+"""
+内置性能分析
+为入口脚本提供 --profile 参数：记录 cProfile 数据和 tracemalloc 内存分配，
+退出时写入 output/profiles/ 并输出摘要
+"""
+import atexit
+import cProfile
+import io
+import os
+import pstats
+import tracemalloc
+from datetime import datetime
+
+PROFILE_DIR = os.path.join("output", "profiles")
+
+# tracemalloc 记录的调用栈深度
+TRACEMALLOC_FRAMES = 10
+
+# 摘要和报告中列出的条目数
+SUMMARY_LIMIT = 5
+REPORT_LIMIT = 30
+
+
+def add_profile_argument(parser):
+    """为入口脚本添加 --profile 参数"""
+    parser.add_argument("--profile", action="store_true",
+                        help=f"记录 cProfile 和 tracemalloc 数据（写入 {PROFILE_DIR}/）")
+
+
+def setup_profiling(run_name: str, enabled: bool, output_dir: str = PROFILE_DIR):
+    """
+    根据 --profile 参数开始性能分析，并在进程退出时写出结果
+
+    输出文件:
+        {run_name}_{timestamp}.prof     cProfile 原始数据（可用 snakeviz / pstats 查看）
+        {run_name}_{timestamp}.cpu.txt  按累计耗时排序的函数列表
+        {run_name}_{timestamp}.mem.txt  按代码行汇总的内存分配和峰值
+
+    cProfile 只记录主线程；并发抓取的工作线程请配合 --trace 查看。
+
+    Args:
+        run_name: 运行名称（入口脚本名）
+        enabled: 是否启用
+        output_dir: 输出目录
+    """
+    if not enabled:
+        return
+
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    def write():
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        os.makedirs(output_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        base = os.path.join(output_dir, f"{run_name}_{timestamp}")
+
+        profiler.dump_stats(f"{base}.prof")
+
+        cpu_report = io.StringIO()
+        stats = pstats.Stats(profiler, stream=cpu_report)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(REPORT_LIMIT)
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(REPORT_LIMIT)
+        with open(f"{base}.cpu.txt", "w", encoding="utf-8") as f:
+            f.write(cpu_report.getvalue())
+
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+        top_allocations = snapshot.statistics("lineno")
+        with open(f"{base}.mem.txt", "w", encoding="utf-8") as f:
+            f.write(f"当前内存: {current / 1024:.1f} KiB\n")
+            f.write(f"峰值内存: {peak / 1024:.1f} KiB\n\n")
+            f.write(f"内存分配最多的 {REPORT_LIMIT} 行:\n")
+            for stat in top_allocations[:REPORT_LIMIT]:
+                f.write(f"{stat}\n")
+            f.write(f"\n内存分配最多的 {SUMMARY_LIMIT} 个调用栈:\n")
+            for stat in snapshot.statistics("traceback")[:SUMMARY_LIMIT]:
+                f.write(f"\n{stat.count} 个对象, {stat.size / 1024:.1f} KiB\n")
+                for line in stat.traceback.format():
+                    f.write(f"{line}\n")
+
+        # 控制台摘要
+        print("\n" + "=" * 60)
+        print("性能分析摘要")
+        print("=" * 60)
+        print(f"峰值内存: {peak / 1024 / 1024:.2f} MiB")
+        print(f"累计耗时最多的 {SUMMARY_LIMIT} 个函数:")
+        for (filename, line, name), (_, calls, _, cumulative, _) in sorted(
+                stats.stats.items(), key=lambda item: -item[1][3])[:SUMMARY_LIMIT]:
+            print(f"  {cumulative:>8.3f}s  {calls:>7d} 次  {name} ({os.path.basename(filename)}:{line})")
+        print(f"内存分配最多的 {SUMMARY_LIMIT} 行:")
+        for stat in top_allocations[:SUMMARY_LIMIT]:
+            frame = stat.traceback[0]
+            print(f"  {stat.size / 1024:>10.1f} KiB  {stat.count:>7d} 个  "
+                  f"{os.path.basename(frame.filename)}:{frame.lineno}")
+        print(f"详细结果: {base}.prof / .cpu.txt / .mem.txt")
+
+    atexit.register(write)
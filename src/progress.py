@@ -0,0 +1,155 @@
+"""
+进度报告
+按固定间隔显示已完成数量、每秒条目数、每秒请求数、限速等待时间和预计剩余时间。
+标准输出是终端时原地刷新一行，否则输出周期性的结构化日志行。
+除完成条目时刷新外，后台线程也按间隔刷新，请求重试或限速等待期间速率和预计剩余时间仍会更新。
+时间取自 src.clock 的共享时钟，模拟运行时随虚拟时间推进。
+"""
+import sys
+import threading
+from typing import Optional
+
+from src.clock import SystemClock, get_clock
+from src.metrics import http_metrics
+
+# 默认刷新间隔（秒）：终端和日志分别设置，日志行不宜过密
+TTY_INTERVAL = 0.5
+LOG_INTERVAL = 10.0
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """将秒数格式化为 H:MM:SS 或 M:SS"""
+    if seconds is None:
+        return "--:--"
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+class ProgressReporter:
+    """长时间抓取和上传的进度报告器"""
+
+    def __init__(self, label: str, total: Optional[int] = None, interval: Optional[float] = None,
+                 stream=None, clock: Optional[SystemClock] = None):
+        """
+        Args:
+            label: 任务名称
+            total: 总数量（未知时可稍后通过 set_total 设置）
+            interval: 刷新间隔（秒），默认终端 0.5 秒、非终端 10 秒
+            stream: 输出流，默认标准输出
+            clock: 时钟，默认使用进程内共享的时钟
+        """
+        self.label = label
+        self.total = total
+        self.stream = stream or sys.stdout
+        self.is_tty = hasattr(self.stream, "isatty") and self.stream.isatty()
+        self.interval = interval if interval is not None else (TTY_INTERVAL if self.is_tty else LOG_INTERVAL)
+        self.clock = clock or get_clock()
+        self.done = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._start = self.clock.now()
+        self._last_render = self._start
+        self._start_requests = http_metrics.total_requests()
+        self._start_wait = self._rate_limit_wait()
+        self._line_length = 0
+
+    @staticmethod
+    def _rate_limit_wait() -> float:
+        return http_metrics.total_sleep("rate_limit") + http_metrics.total_sleep("pacing")
+
+    def set_total(self, total: int):
+        """设置或更新总数量"""
+        with self._lock:
+            self.total = total
+
+    def update(self, count: int = 1):
+        """记录完成的数量，到达刷新间隔时输出进度"""
+        with self._lock:
+            self.done += count
+            self._refresh()
+
+    def refresh(self):
+        """没有新完成的条目时，到达刷新间隔也输出进度（由后台线程定期调用）"""
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        if self._closed:
+            return
+        now = self.clock.now()
+        if now - self._last_render < self.interval:
+            return
+        self._last_render = now
+        self._render(now)
+
+    def start(self) -> "ProgressReporter":
+        """启动按间隔刷新的后台线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"progress-{self.label}", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        # 按真实时间唤醒；模拟运行时虚拟时钟可能跑得更快，每次唤醒都按时钟判断是否到达间隔
+        while not self._stop.wait(self.interval):
+            self.refresh()
+
+    def stats(self, now: Optional[float] = None) -> dict:
+        """当前进度统计"""
+        elapsed = max(1e-9, (now if now is not None else self.clock.now()) - self._start)
+        items_per_second = self.done / elapsed
+        remaining = None
+        if self.total is not None and items_per_second > 0:
+            remaining = max(0, self.total - self.done) / items_per_second
+        return {
+            "done": self.done,
+            "total": self.total,
+            "elapsed": elapsed,
+            "items_per_second": items_per_second,
+            "requests_per_second": (http_metrics.total_requests() - self._start_requests) / elapsed,
+            "rate_limit_wait": self._rate_limit_wait() - self._start_wait,
+            "eta": remaining,
+        }
+
+    def _render(self, now: float, final: bool = False):
+        stats = self.stats(now)
+        total = stats["total"]
+        if self.is_tty:
+            percent = f" {stats['done'] / total:>6.1%}" if total else ""
+            line = (f"{self.label}: {stats['done']}/{total if total is not None else '?'}{percent} | "
+                    f"{stats['items_per_second']:.2f} 条/s | {stats['requests_per_second']:.2f} 请求/s | "
+                    f"限速等待 {stats['rate_limit_wait']:.1f}s | "
+                    f"{'用时 ' + format_duration(stats['elapsed']) if final else 'ETA ' + format_duration(stats['eta'])}")
+            padding = " " * max(0, self._line_length - len(line))
+            self._line_length = len(line)
+            self.stream.write(f"\r{line}{padding}" + ("\n" if final else ""))
+        else:
+            self.stream.write(
+                f"progress task={self.label} done={stats['done']} total={total if total is not None else ''} "
+                f"items_per_s={stats['items_per_second']:.3f} requests_per_s={stats['requests_per_second']:.3f} "
+                f"rate_limit_wait_s={stats['rate_limit_wait']:.1f} elapsed_s={stats['elapsed']:.1f} "
+                f"eta_s={'' if stats['eta'] is None else round(stats['eta'], 1)}"
+                f"{' final=1' if final else ''}\n")
+        self.stream.flush()
+
+    def close(self):
+        """停止后台线程并输出最终进度"""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._render(self.clock.now(), final=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,40 @@
+"""
+榜单比较
+比较两次榜单的新上榜、落榜和名次变化，供监视模式和只读排行服务使用（不依赖网络请求相关模块）
+"""
+from typing import Dict, List, Optional
+
+
+def diff_rankings(old: List[Dict], new: List[Dict], position_key: Optional[str] = None) -> Dict:
+    """
+    比较两次榜单
+
+    Args:
+        old: 上一次的榜单（按位置排序）
+        new: 本次的榜单（按位置排序）
+        position_key: 条目自身的名次字段（如 "rank_position"）；为空时按列表顺序从 1 编号
+
+    Returns:
+        {"entered": [...], "left": [...], "moved": [...]}
+    """
+    def positions(ranking: List[Dict]) -> Dict[int, int]:
+        if position_key is None:
+            return {anime["id"]: position for position, anime in enumerate(ranking, 1)}
+        return {anime["id"]: anime[position_key] for anime in ranking}
+
+    old_positions = positions(old)
+    new_positions = positions(new)
+
+    def brief(anime: Dict, **extra) -> Dict:
+        return {"id": anime["id"], "name": anime.get("name_cn") or anime.get("name", ""),
+                "rank": anime.get("rank"), "score": anime.get("score"), **extra}
+
+    return {
+        "entered": [brief(anime, position=new_positions[anime["id"]])
+                    for anime in new if anime["id"] not in old_positions],
+        "left": [brief(anime, position=old_positions[anime["id"]])
+                 for anime in old if anime["id"] not in new_positions],
+        "moved": [brief(anime, old_position=old_positions[anime["id"]], position=new_positions[anime["id"]])
+                  for anime in new
+                  if anime["id"] in old_positions and old_positions[anime["id"]] != new_positions[anime["id"]]],
+    }
@@ -0,0 +1,336 @@
+"""
+只读排行服务
+启动时把导出的排行文件（output/json/bangumi_worst_{类型}_{年份}.json）读入内存，
+按类型、年份、ID 和是否受限建立索引，并预先生成所有响应的JSON、gzip压缩数据和ETag；
+请求只做一次字典查找。导出文件变化时在后台重新构建并整体替换，读请求不会看到中间状态。
+
+接口:
+    GET /                                 可用的类型和年份
+    GET /{类型}/{年份}                    完整榜单（年份可用 latest）
+    GET /{类型}/{年份}/normal             普通内容
+    GET /{类型}/{年份}/nsfw               受限内容
+    GET /{类型}/{年份}/movers             与上一年榜单（或去年的索引快照，只含普通内容）相比的新上榜、落榜和名次变化
+    GET /subjects/{id}                    条目在各类型、各年份榜单中的记录
+    GET /health                           服务状态
+"""
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from config.config import INDICES_DIR, JSON_OUTPUT_DIR, OLD_INDEX_ID
+from src.index_snapshot import iter_snapshot_subjects
+from src.ranking_diff import diff_rankings
+
+# bangumi_worst_{类型}_{年份}.json
+EXPORT_FILE_PATTERN = re.compile(r"^bangumi_worst_([a-z]+)_(\d{4})\.json$")
+
+# 检查导出文件是否变化的间隔（秒）
+RELOAD_INTERVAL = 5.0
+
+# 小于该大小的响应不压缩
+GZIP_MIN_SIZE = 512
+
+
+class PrecomputedResponse:
+    """预先编码的响应：JSON正文、gzip压缩正文和ETag"""
+
+    __slots__ = ("body", "gzip_body", "etag")
+
+    def __init__(self, data):
+        self.body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.gzip_body = gzip.compress(self.body, mtime=0) if len(self.body) >= GZIP_MIN_SIZE else None
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()}"'
+
+
+def find_export_files(export_dir: str) -> Dict[Tuple[str, int], str]:
+    """
+    列出导出目录中的排行文件
+
+    Returns:
+        {(类型, 年份): 文件路径}
+    """
+    files = {}
+    if os.path.isdir(export_dir):
+        for filename in os.listdir(export_dir):
+            match = EXPORT_FILE_PATTERN.match(filename)
+            if match:
+                files[(match.group(1), int(match.group(2)))] = os.path.join(export_dir, filename)
+    return files
+
+
+def load_index_ranking(indices_dir: str, index_id: int) -> Optional[List[Dict]]:
+    """
+    从最新的索引快照中读取排行（条目评论以名次开头，如 "1 -" 或 "3 ↑2"）
+
+    Returns:
+        按名次排序的条目列表（名次在 rank_position 字段，与导出文件一致）；没有快照时返回 None
+    """
+    files = glob.glob(os.path.join(indices_dir, f"index_{index_id}_*.json"))
+    if not files:
+        return None
+
+    ranking = []
+    for subject in iter_snapshot_subjects(max(files, key=os.path.getmtime)):
+        parts = (subject.get("comment") or "").split()
+        if parts and parts[0].isdigit() and subject.get("id"):
+            ranking.append({"id": subject["id"], "name": subject.get("name", ""),
+                            "name_cn": subject.get("name_cn", ""), "rank_position": int(parts[0])})
+    ranking.sort(key=lambda entry: entry["rank_position"])
+    return ranking
+
+
+class RankingSnapshot:
+    """某一时刻全部排行数据的只读内存索引和预生成响应"""
+
+    def __init__(self, export_dir: str = JSON_OUTPUT_DIR, indices_dir: str = INDICES_DIR,
+                 index_id: int = OLD_INDEX_ID):
+        """
+        Args:
+            export_dir: 导出文件目录
+            indices_dir: 索引快照目录（没有上一年导出文件时，动画的名次变化与该快照对比）
+            index_id: 上一年的索引ID
+        """
+        self.files = find_export_files(export_dir)
+        self.signature = self.file_signature(self.files)
+        self.loaded_at = datetime.now().isoformat(timespec="seconds")
+        self.rankings: Dict[Tuple[str, int], Dict] = {}
+        self.responses: Dict[str, PrecomputedResponse] = {}
+
+        for key, path in sorted(self.files.items()):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            ranking = sorted(data.get("normal", []) + data.get("nsfw", []),
+                             key=lambda entry: entry.get("rank_position", 0))
+            self.rankings[key] = {
+                "metadata": data.get("metadata", {}),
+                "all": ranking,
+                "normal": [entry for entry in ranking if not entry.get("nsfw", False)],
+                "nsfw": [entry for entry in ranking if entry.get("nsfw", False)],
+            }
+
+        self._build_responses(indices_dir, index_id)
+
+    @staticmethod
+    def file_signature(files: Dict[Tuple[str, int], str]) -> Tuple:
+        """导出文件的路径、大小和修改时间，用于判断是否需要重新加载"""
+        signature = []
+        for path in sorted(files.values()):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signature.append((path, stat.st_size, stat.st_mtime_ns))
+        return tuple(signature)
+
+    def _build_responses(self, indices_dir: str, index_id: int):
+        years_by_category: Dict[str, List[int]] = {}
+        for category, year in self.rankings:
+            years_by_category.setdefault(category, []).append(year)
+
+        subjects: Dict[int, List[Dict]] = {}
+        index_ranking = None
+
+        for (category, year), ranking in self.rankings.items():
+            previous = self.rankings.get((category, year - 1))
+            current_list = ranking["all"]
+            if previous is not None:
+                previous_list, baseline = previous["all"], f"{category}/{year - 1}"
+            elif category == "anime" and year == max(years_by_category[category]):
+                if index_ranking is None:
+                    index_ranking = load_index_ranking(indices_dir, index_id) or []
+                # 索引只收录普通内容，名次沿用导出文件中与受限内容合并编号的 rank_position
+                previous_list, current_list, baseline = index_ranking, ranking["normal"], f"index/{index_id}"
+            else:
+                previous_list, baseline = None, None
+
+            movers = {"category": category, "year": year, "baseline": baseline}
+            movers.update(diff_rankings(previous_list, current_list, position_key="rank_position")
+                          if previous_list else {"entered": [], "left": [], "moved": []})
+
+            paths = [f"/{category}/{year}"]
+            if year == max(years_by_category[category]):
+                paths.append(f"/{category}/latest")
+            for path in paths:
+                self.responses[path] = PrecomputedResponse(
+                    {"metadata": ranking["metadata"], "data": ranking["all"]})
+                self.responses[f"{path}/normal"] = PrecomputedResponse(
+                    {"metadata": ranking["metadata"], "data": ranking["normal"]})
+                self.responses[f"{path}/nsfw"] = PrecomputedResponse(
+                    {"metadata": ranking["metadata"], "data": ranking["nsfw"]})
+                self.responses[f"{path}/movers"] = PrecomputedResponse(movers)
+
+            for entry in ranking["all"]:
+                subjects.setdefault(entry["id"], []).append({"category": category, "year": year, **entry})
+
+        for subject_id, entries in subjects.items():
+            self.responses[f"/subjects/{subject_id}"] = PrecomputedResponse(
+                {"id": subject_id, "rankings": sorted(entries, key=lambda e: (e["category"], -e["year"]))})
+
+        self.responses["/"] = PrecomputedResponse({
+            "categories": {category: sorted(years, reverse=True)
+                           for category, years in sorted(years_by_category.items())},
+            "loaded_at": self.loaded_at,
+        })
+
+
+class RankingRequestHandler(BaseHTTPRequestHandler):
+    """排行服务请求处理"""
+
+    server_version = "BangumiRanking/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body: bool):
+        path = self.path.split("?", 1)[0].rstrip("/") or "/"
+        if path == "/health":
+            snapshot = self.server.snapshot
+            self._send_plain(200, {"status": "ok", "loaded_at": snapshot.loaded_at,
+                                   "files": len(snapshot.files), "responses": len(snapshot.responses)},
+                             send_body)
+            return
+
+        # 只读取一次当前快照，重新加载时替换的是整个对象
+        response = self.server.snapshot.responses.get(path)
+        if response is None:
+            self._send_plain(404, {"error": "not found", "path": path}, send_body)
+            return
+
+        if self.headers.get("If-None-Match") == response.etag:
+            self.send_response(304)
+            self.send_header("ETag", response.etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        use_gzip = response.gzip_body is not None and "gzip" in self.headers.get("Accept-Encoding", "")
+        body = response.gzip_body if use_gzip else response.body
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("ETag", response.etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _send_plain(self, status: int, data: Dict, send_body: bool):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+
+class RankingServer:
+    """在后台线程中运行的排行服务，定期检查导出文件并原子地替换快照"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8080, export_dir: str = JSON_OUTPUT_DIR,
+                 indices_dir: str = INDICES_DIR, reload_interval: float = RELOAD_INTERVAL):
+        self.export_dir = export_dir
+        self.indices_dir = indices_dir
+        self.reload_interval = reload_interval
+        self.httpd = ThreadingHTTPServer((host, port), RankingRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.snapshot = RankingSnapshot(export_dir, indices_dir)
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def snapshot(self) -> RankingSnapshot:
+        return self.httpd.snapshot
+
+    def reload_if_changed(self) -> bool:
+        """
+        导出文件有变化时重新构建快照并替换
+
+        Returns:
+            是否重新加载
+        """
+        files = find_export_files(self.export_dir)
+        if RankingSnapshot.file_signature(files) == self.httpd.snapshot.signature:
+            return False
+        start = time.perf_counter()
+        snapshot = RankingSnapshot(self.export_dir, self.indices_dir)
+        self.httpd.snapshot = snapshot
+        print(f"[OK] 已重新加载 {len(snapshot.files)} 个排行文件（{(time.perf_counter() - start) * 1000:.1f} ms）")
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval):
+            try:
+                self.reload_if_changed()
+            except (OSError, ValueError) as e:
+                # 导出文件正在写入时可能读到不完整的JSON，保留旧快照，下次再试
+                print(f"[WARN] 重新加载失败，继续使用旧数据: {e}")
+
+    def start(self) -> "RankingServer":
+        self._threads = [threading.Thread(target=self.httpd.serve_forever, daemon=True),
+                         threading.Thread(target=self._watch, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main(argv=None):
+    """主函数"""
+    parser = argparse.ArgumentParser(description="只读排行服务：从内存中返回预生成的排行数据")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--export-dir", default=JSON_OUTPUT_DIR,
+                        help=f"导出文件目录（默认：{JSON_OUTPUT_DIR}）")
+    parser.add_argument("--reload-interval", type=float, default=RELOAD_INTERVAL,
+                        help=f"检查导出文件变化的间隔（秒，默认：{RELOAD_INTERVAL}）")
+    args = parser.parse_args(argv)
+
+    server = RankingServer(args.host, args.port, export_dir=args.export_dir,
+                           reload_interval=args.reload_interval).start()
+    snapshot = server.snapshot
+    print(f"排行服务已启动: {server.url}（{len(snapshot.files)} 个排行文件，{len(snapshot.responses)} 个预生成响应）")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\n已停止")
+    finally:
+        server.stop()
+    return 0
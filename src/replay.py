@@ -0,0 +1,153 @@
+"""
+离线回放
+从 search_worst_anime 保存的调试响应中重建一次抓取的全部分页，
+包括抓取结束前为补齐重叠窗口之间的缺口而重新抓取（补抓）的分页
+"""
+import bisect
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+DEBUG_DIR = os.path.join("output", "debug")
+
+# 补抓分页的调试文件名前缀
+REFETCH_PREFIX = "refetch_"
+
+# api_response_[refetch_]offset_{offset}_{YYYYmmdd_HHMMSS}.json
+RESPONSE_FILE_PATTERN = re.compile(r"^api_response_(refetch_)?offset_(\d+)_(\d{8}_\d{6})\.json$")
+
+
+def list_captured_responses(debug_dir: str = DEBUG_DIR) -> List[Dict]:
+    """
+    列出调试目录中保存的所有响应文件
+
+    Args:
+        debug_dir: 调试输出目录
+
+    Returns:
+        [{"offset": int, "timestamp": str, "refetch": bool, "path": str}, ...]，按时间戳和偏移量排序
+        （同一秒内先抓取后补抓）
+    """
+    if not os.path.isdir(debug_dir):
+        raise FileNotFoundError(f"调试目录不存在: {debug_dir}")
+
+    captured = []
+    for filename in os.listdir(debug_dir):
+        match = RESPONSE_FILE_PATTERN.match(filename)
+        if match:
+            captured.append({
+                "offset": int(match.group(2)),
+                "timestamp": match.group(3),
+                "refetch": bool(match.group(1)),
+                "path": os.path.join(debug_dir, filename)
+            })
+
+    captured.sort(key=lambda x: (x["timestamp"], x["refetch"], x["offset"]))
+    return captured
+
+
+def list_captured_runs(debug_dir: str = DEBUG_DIR) -> List[str]:
+    """
+    列出所有抓取批次（以 offset=0 响应的时间戳标识）
+
+    Args:
+        debug_dir: 调试输出目录
+
+    Returns:
+        按时间顺序排列的批次时间戳列表
+    """
+    return [c["timestamp"] for c in list_captured_responses(debug_dir) if c["offset"] == 0 and not c["refetch"]]
+
+
+def group_captured_runs(captured: List[Dict]) -> Dict[str, Dict[int, List[str]]]:
+    """
+    按抓取批次分组已保存的响应
+
+    下一次抓取（下一个首次抓取的 offset=0 响应）开始前保存的响应都属于本批次；
+    同一批次中同一偏移量保存了多次时（补抓），按保存顺序全部保留。
+
+    Args:
+        captured: list_captured_responses() 的结果
+
+    Returns:
+        {批次时间戳: {偏移量: [响应文件路径, ...]}}，按时间顺序排列
+    """
+    runs = [c["timestamp"] for c in captured if c["offset"] == 0 and not c["refetch"]]
+    grouped: Dict[str, Dict[int, List[str]]] = {run: {} for run in runs}
+    for c in captured:
+        position = bisect.bisect_right(runs, c["timestamp"])
+        if position:
+            grouped[runs[position - 1]].setdefault(c["offset"], []).append(c["path"])
+    return grouped
+
+
+def read_run_pages(by_offset: Dict[int, List[str]]) -> List[Dict]:
+    """
+    按抓取顺序读取一个批次的分页响应
+
+    从 offset=0 开始，每一步推进到本页范围内最靠后的已保存偏移量（兼容重叠窗口），
+    每个偏移量取最早保存的响应；之后按保存顺序附上各偏移量后来补抓的响应，
+    按条目ID去重时补抓的数据覆盖先前的数据，与抓取时相同。
+
+    Args:
+        by_offset: {偏移量: [响应文件路径, ...]}（group_captured_runs() 中的一个批次）
+
+    Returns:
+        按抓取顺序排列的API响应列表
+    """
+    def load(path: str) -> Dict:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    pages = []
+    offset = 0
+    while offset in by_offset:
+        result = load(by_offset[offset][0])
+        pages.append(result)
+
+        data = result.get("data") if result else None
+        if not data:
+            break
+
+        end = offset + len(data)
+        if end >= result.get("total", 0):
+            break
+        # 分页窗口可能互相重叠：下一页取本页范围内最靠后的已保存偏移量
+        following = [o for o in by_offset if offset < o <= end]
+        if not following:
+            break
+        offset = max(following)
+
+    refetched = sorted((path for paths in by_offset.values() for path in paths[1:]),
+                       key=lambda path: RESPONSE_FILE_PATTERN.match(os.path.basename(path)).group(3))
+    pages.extend(load(path) for path in refetched)
+    return pages
+
+
+def load_captured_pages(debug_dir: str = DEBUG_DIR, run: Optional[str] = None) -> List[Dict]:
+    """
+    重建一次抓取中依次收到的分页响应
+
+    同一目录下可能保存了多次抓取的响应。从指定批次（默认最新一次）的
+    offset=0 响应开始，每一步推进到本页范围内最靠后的已保存偏移量（兼容重叠窗口），
+    并选取该批次之后最早保存的对应偏移量响应；补抓的分页附在最后。
+
+    Args:
+        debug_dir: 调试输出目录
+        run: 批次时间戳（offset=0 响应文件名中的时间戳），默认最新一次
+
+    Returns:
+        按抓取顺序排列的API响应列表
+    """
+    grouped = group_captured_runs(list_captured_responses(debug_dir))
+    if not grouped:
+        raise FileNotFoundError(f"在 {debug_dir} 中未找到 offset=0 的响应文件")
+
+    runs = list(grouped)
+    if run is None:
+        run = runs[-1]
+    elif run not in grouped:
+        raise ValueError(f"未找到抓取批次: {run}（可用: {', '.join(runs)}）")
+
+    return read_run_pages(grouped[run])
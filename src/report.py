@@ -0,0 +1,240 @@
+"""
+统计报告
+用 NumPy 按列计算评分分布、评分人数分位数以及普通/受限内容的对比，
+覆盖本次抓取的完整排名区间和历年导出的榜单，输出 JSON 和 Markdown 摘要
+"""
+import argparse
+import json
+import os
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from config.config import JSON_OUTPUT_DIR, REPORTS_DIR, SUBJECT_TYPES
+
+# 评分直方图的区间边界（0-10 分，每 0.5 分一档）
+SCORE_BINS = np.arange(0.0, 10.5, 0.5)
+# 评分人数的分位点
+RATING_PERCENTILES = (10, 25, 50, 75, 90, 99)
+# 一次遍历迭代器时使用的行结构
+COLUMN_DTYPE = np.dtype([("score", np.float64), ("rank", np.int64), ("rating_total", np.int64), ("nsfw", bool)])
+
+EXPORT_FILE_PATTERN = re.compile(r"^bangumi_worst_([a-z]+)_(\d{4})\.json$")
+
+
+def to_columns(anime_list: Iterable[Dict]) -> Dict[str, np.ndarray]:
+    """
+    将条目列表转换为列数组
+
+    Args:
+        anime_list: 动漫列表（DataProcessor 或导出文件中的条目）；也可以是只能遍历一次的迭代器，
+            如外部排序的输出
+
+    Returns:
+        {"score", "rank", "rating_total", "nsfw"} -> 数组
+    """
+    if not isinstance(anime_list, list):
+        rows = np.fromiter(((a.get("score") or 0, a.get("rank") or 0, a.get("rating_total") or 0,
+                             bool(a.get("nsfw"))) for a in anime_list), dtype=COLUMN_DTYPE)
+        return {name: rows[name] for name in COLUMN_DTYPE.names}
+    count = len(anime_list)
+    return {
+        "score": np.fromiter((a.get("score") or 0 for a in anime_list), dtype=np.float64, count=count),
+        "rank": np.fromiter((a.get("rank") or 0 for a in anime_list), dtype=np.int64, count=count),
+        "rating_total": np.fromiter((a.get("rating_total") or 0 for a in anime_list),
+                                    dtype=np.int64, count=count),
+        "nsfw": np.fromiter((bool(a.get("nsfw")) for a in anime_list), dtype=bool, count=count),
+    }
+
+
+def summarize(columns: Dict[str, np.ndarray]) -> Dict:
+    """
+    计算一组条目的统计量
+
+    Args:
+        columns: to_columns() 的结果（可以是按掩码筛选后的子集）
+
+    Returns:
+        条目数、评分统计和直方图、评分人数分位数、排名范围
+    """
+    score = columns["score"]
+    votes = columns["rating_total"]
+    if not len(score):
+        return {"count": 0}
+
+    histogram, _ = np.histogram(score, bins=SCORE_BINS)
+    percentiles = np.percentile(votes, RATING_PERCENTILES)
+    return {
+        "count": int(len(score)),
+        "score": {
+            "mean": round(float(score.mean()), 3),
+            "median": round(float(np.median(score)), 3),
+            "min": float(score.min()),
+            "max": float(score.max()),
+            "histogram": histogram.tolist(),
+        },
+        "rating_total": {
+            "sum": int(votes.sum()),
+            "percentiles": {f"p{p}": round(float(v), 1) for p, v in zip(RATING_PERCENTILES, percentiles)},
+        },
+        "rank": {"min": int(columns["rank"].min()), "max": int(columns["rank"].max())},
+    }
+
+
+def summarize_split(anime_list: Iterable[Dict]) -> Dict:
+    """
+    分别统计全部、普通和受限内容
+
+    Returns:
+        {"all": ..., "normal": ..., "nsfw": ...}
+    """
+    columns = to_columns(anime_list)
+    nsfw = columns["nsfw"]
+    return {
+        "all": summarize(columns),
+        "normal": summarize({name: values[~nsfw] for name, values in columns.items()}),
+        "nsfw": summarize({name: values[nsfw] for name, values in columns.items()}),
+    }
+
+
+def load_archived_years(category: str = "anime", export_dir: str = JSON_OUTPUT_DIR) -> Dict[int, List[Dict]]:
+    """
+    读取历年导出的榜单
+
+    Args:
+        category: 条目类型名称
+        export_dir: 导出文件目录
+
+    Returns:
+        {年份: 榜单条目}
+    """
+    years = {}
+    if not os.path.isdir(export_dir):
+        return years
+    for filename in os.listdir(export_dir):
+        match = EXPORT_FILE_PATTERN.match(filename)
+        if not match or match.group(1) != category:
+            continue
+        with open(os.path.join(export_dir, filename), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        years[int(match.group(2))] = data.get("normal", []) + data.get("nsfw", [])
+    return years
+
+
+def build_report(category: str = "anime", crawled: Optional[Iterable[Dict]] = None,
+                 year: Optional[int] = None, export_dir: str = JSON_OUTPUT_DIR) -> Dict:
+    """
+    生成统计报告
+
+    Args:
+        category: 条目类型名称
+        crawled: 本次抓取的完整排名区间（为空时只统计历年榜单）
+        year: 本次抓取对应的年份
+        export_dir: 导出文件目录
+
+    Returns:
+        报告数据
+    """
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "category": category,
+        "year": year,
+        "score_bins": SCORE_BINS.tolist(),
+    }
+    if crawled is not None:
+        report["crawled"] = summarize_split(crawled)
+    report["years"] = {str(y): summarize_split(entries)
+                       for y, entries in sorted(load_archived_years(category, export_dir).items())}
+    return report
+
+
+def render_markdown(report: Dict) -> str:
+    """将报告渲染为 Markdown"""
+    label = next((t["label"] for t in SUBJECT_TYPES.values() if t["name"] == report["category"]),
+                 report["category"])
+    lines = [f"# {label}统计报告", "", f"生成时间: {report['generated_at']}", ""]
+
+    def fmt(summary: Dict, *path, digits: int = 2) -> str:
+        value = summary
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        return "-" if value is None else f"{value:.{digits}f}"
+
+    crawled = report.get("crawled")
+    if crawled and crawled["all"]["count"]:
+        lines += [f"## 本次抓取（{report.get('year') or ''}）", "",
+                  "| 范围 | 条目数 | 平均评分 | 评分中位数 | 评分人数中位数 | 评分人数P90 |",
+                  "|------|--------|----------|------------|----------------|-------------|"]
+        for name, title in (("all", "全部"), ("normal", "普通"), ("nsfw", "受限")):
+            summary = crawled[name]
+            lines.append(f"| {title} | {summary['count']} | {fmt(summary, 'score', 'mean')} | "
+                         f"{fmt(summary, 'score', 'median')} | "
+                         f"{fmt(summary, 'rating_total', 'percentiles', 'p50', digits=0)} | "
+                         f"{fmt(summary, 'rating_total', 'percentiles', 'p90', digits=0)} |")
+
+        lines += ["", "### 评分分布", "", "| 评分 | 普通 | 受限 |", "|------|------|------|"]
+        bins = report["score_bins"]
+        normal_hist = crawled["normal"].get("score", {}).get("histogram", [0] * (len(bins) - 1))
+        nsfw_hist = crawled["nsfw"].get("score", {}).get("histogram", [0] * (len(bins) - 1))
+        for low, high, normal_count, nsfw_count in zip(bins, bins[1:], normal_hist, nsfw_hist):
+            if normal_count or nsfw_count:
+                lines.append(f"| {low:.1f}-{high:.1f} | {normal_count} | {nsfw_count} |")
+        lines.append("")
+
+    if report["years"]:
+        lines += ["## 历年榜单", "",
+                  "| 年份 | 条目数 | 普通 | 受限 | 平均评分 | 评分中位数 | 评分人数中位数 | 评分人数P90 |",
+                  "|------|--------|------|------|----------|------------|----------------|-------------|"]
+        for year, split in report["years"].items():
+            summary = split["all"]
+            lines.append(f"| {year} | {summary['count']} | {split['normal']['count']} | "
+                         f"{split['nsfw']['count']} | {fmt(summary, 'score', 'mean')} | "
+                         f"{fmt(summary, 'score', 'median')} | "
+                         f"{fmt(summary, 'rating_total', 'percentiles', 'p50', digits=0)} | "
+                         f"{fmt(summary, 'rating_total', 'percentiles', 'p90', digits=0)} |")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def write_report(report: Dict, output_dir: str = REPORTS_DIR) -> str:
+    """
+    写出 JSON 和 Markdown 报告
+
+    Args:
+        report: build_report() 的结果
+        output_dir: 输出目录
+
+    Returns:
+        JSON 报告路径（Markdown 报告与其同名，扩展名为 .md）
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    suffix = f"_{report['year']}" if report.get("year") else ""
+    base = os.path.join(output_dir, f"report_{report['category']}{suffix}")
+    with open(f"{base}.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    with open(f"{base}.md", "w", encoding="utf-8") as f:
+        f.write(render_markdown(report))
+    print(f"[OK] 统计报告已保存: {base}.json, {base}.md")
+    return f"{base}.json"
+
+
+def main(argv=None):
+    """主函数：只统计历年导出的榜单"""
+    parser = argparse.ArgumentParser(description="生成历年榜单的评分和评分人数统计报告")
+    parser.add_argument("--types", nargs="+", default=["anime"], metavar="TYPE",
+                        help="条目类型名称（默认：anime）")
+    parser.add_argument("--export-dir", default=JSON_OUTPUT_DIR,
+                        help=f"导出文件目录（默认：{JSON_OUTPUT_DIR}）")
+    parser.add_argument("--output-dir", default=REPORTS_DIR,
+                        help=f"报告输出目录（默认：{REPORTS_DIR}）")
+    args = parser.parse_args(argv)
+
+    for category in args.types:
+        report = build_report(category, export_dir=args.export_dir)
+        if not report["years"]:
+            print(f"未找到 {category} 类型的导出文件: {args.export_dir}")
+            continue
+        write_report(report, args.output_dir)
+    return 0
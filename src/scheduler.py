@@ -0,0 +1,196 @@
+"""
+请求调度器
+进程内所有访问 Bangumi API 的代码共享同一个请求间隔。等待发出请求的调用按优先级排队：
+交互查询和索引写入优先于批量抓取；同一优先级内按请求来源（如条目类型、索引ID）轮流放行，
+一个来源的大量请求不会独占预算；最低的后台优先级只在没有其他请求等待时放行，用于空闲时预取。
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Optional
+
+from src.clock import SystemClock, get_clock
+from src.log import get_logger, kv
+from src.tracing import tracer
+
+logger = get_logger("scheduler")
+
+# 优先级: 名称 -> 顺序（数字越小越先放行）；最后一个为后台优先级
+PRIORITIES = {
+    "interactive": 0,  # 交互查询
+    "upload": 1,  # 索引写入
+    "hydrate": 2,  # 逐个查询条目信息
+    "fetch": 3,  # 批量抓取（搜索分页、索引镜像）
+    "prefetch": 4,  # 后台预取，只在空闲时放行
+}
+BACKGROUND = "prefetch"
+
+
+class RequestScheduler:
+    """按优先级和来源公平排队的请求间隔调度器（线程安全）"""
+
+    def __init__(self, min_interval: float, clock: Optional[SystemClock] = None):
+        """
+        Args:
+            min_interval: 相邻两次请求之间的最小间隔（秒）
+            clock: 时钟，为空时使用进程内共享的时钟（见 src.clock）
+        """
+        self.min_interval = min_interval
+        self.clock = clock
+        # 后台请求只在其他请求停止至少这么久之后放行
+        self.idle_after = 2 * min_interval
+        self._cond = threading.Condition()
+        self._next_time = 0.0
+        self._last_foreground = 0.0
+        # 每个优先级: 来源 -> 等待中的票据队列，按轮转顺序排列
+        self._queues: Dict[int, "OrderedDict[str, deque]"] = {level: OrderedDict() for level in PRIORITIES.values()}
+        self.granted: Dict[str, int] = {name: 0 for name in PRIORITIES}
+        self.waited: Dict[str, float] = {name: 0.0 for name in PRIORITIES}
+
+    def _head(self) -> Optional[object]:
+        """下一个应放行的票据"""
+        for level in sorted(self._queues):
+            flows = self._queues[level]
+            if flows:
+                return next(iter(flows.values()))[0]
+        return None
+
+    def pending(self, priority: Optional[str] = None) -> int:
+        """等待中的请求数（可只统计某个优先级）"""
+        with self._cond:
+            levels = [PRIORITIES[priority]] if priority else list(self._queues)
+            return sum(len(queue) for level in levels for queue in self._queues[level].values())
+
+    def acquire(self, priority: str = "fetch", flow: str = "") -> float:
+        """
+        阻塞直到轮到本次请求
+
+        Args:
+            priority: 优先级名称（见 PRIORITIES）
+            flow: 请求来源，同一优先级内不同来源轮流放行
+
+        Returns:
+            实际等待的秒数
+        """
+        level = PRIORITIES[priority]
+        ticket = object()
+        clock = self.clock or get_clock()
+        start = clock.now()
+        trace_start = time.perf_counter()
+        with self._cond:
+            flows = self._queues[level]
+            flows.setdefault(flow, deque()).append(ticket)
+            # 新请求可能优先于当前队首，唤醒正在计时等待的线程重新判断
+            self._cond.notify_all()
+            while True:
+                if self._head() is ticket:
+                    now = clock.now()
+                    ready = self._next_time
+                    if priority == BACKGROUND:
+                        ready = max(ready, self._last_foreground + self.idle_after)
+                    wait = ready - now
+                    if wait <= 0:
+                        break
+                    clock.wait(self._cond, wait)
+                else:
+                    self._cond.wait()
+
+            self._next_time = max(now, self._next_time) + self.min_interval
+            if priority != BACKGROUND:
+                self._last_foreground = now
+            queue = flows[flow]
+            queue.popleft()
+            if queue:
+                flows.move_to_end(flow)
+            else:
+                del flows[flow]
+            waited = now - start
+            self.granted[priority] += 1
+            self.waited[priority] += waited
+            self._cond.notify_all()
+
+        if waited > 0.001 and tracer.enabled:
+            tracer.add_event("pacing_wait", "wait", trace_start, time.perf_counter(),
+                             {"seconds": round(waited, 3), "priority": priority, "flow": flow})
+        return waited
+
+    def stats(self) -> Dict[str, Dict]:
+        """各优先级的放行次数和累计等待时间"""
+        with self._cond:
+            return {name: {"granted": self.granted[name], "waited_s": round(self.waited[name], 3)}
+                    for name in PRIORITIES if self.granted[name]}
+
+
+class BackgroundLane:
+    """在后台线程中依次执行低优先级任务（任务中的请求应使用 prefetch 优先级）"""
+
+    def __init__(self, name: str = "background"):
+        self.name = name
+        self._tasks: deque = deque()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def stopped(self) -> bool:
+        """任务可在循环中检查，停止后尽快返回"""
+        return self._stopped
+
+    def submit(self, fn: Callable, *args, **kwargs):
+        """提交一个任务"""
+        with self._cond:
+            self._tasks.append((fn, args, kwargs))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._tasks and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                fn, args, kwargs = self._tasks.popleft()
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                logger.warning("后台任务失败", extra=kv(lane=self.name, error=str(e)))
+
+    def stop(self, timeout: Optional[float] = None):
+        """丢弃未开始的任务并等待当前任务结束"""
+        with self._cond:
+            self._stopped = True
+            self._tasks.clear()
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+
+_default_scheduler: Optional[RequestScheduler] = None
+_default_lock = threading.Lock()
+
+
+def set_scheduler(scheduler: Optional[RequestScheduler]) -> Optional[RequestScheduler]:
+    """
+    替换进程内共享的调度器（如模拟运行时换成使用虚拟时钟的调度器）
+
+    Args:
+        scheduler: 新的调度器，为空时下次使用时按配置重新创建
+
+    Returns:
+        替换前的调度器
+    """
+    global _default_scheduler
+    with _default_lock:
+        previous = _default_scheduler
+        _default_scheduler = scheduler
+        return previous
+
+
+def get_scheduler() -> RequestScheduler:
+    """进程内共享的调度器（请求间隔为配置 RATE_LIMIT_DELAY）"""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            from config.config import RATE_LIMIT_DELAY
+            _default_scheduler = RequestScheduler(RATE_LIMIT_DELAY)
+        return _default_scheduler
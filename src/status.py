@@ -0,0 +1,61 @@
+"""
+本地数据状态
+列出配置和各阶段最新的输出文件，只读取文件信息，不访问网络也不导入请求相关模块
+"""
+import glob
+import os
+from datetime import datetime
+from typing import List, Optional
+
+from config.config import INDICES_DIR, JSON_OUTPUT_DIR, NEW_INDEX_ID, OLD_INDEX_ID, RANKS_DIR
+
+
+def latest_file(pattern: str) -> Optional[str]:
+    """返回匹配模式的最新文件（按修改时间），没有则返回 None"""
+    files = glob.glob(pattern)
+    return max(files, key=os.path.getmtime) if files else None
+
+
+def describe_file(path: Optional[str]) -> str:
+    """文件的修改时间和大小"""
+    if not path:
+        return "（无）"
+    stat = os.stat(path)
+    modified = datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
+    return f"{path}  {modified}  {stat.st_size / 1024:.1f} KiB"
+
+
+def collect_status() -> List[tuple]:
+    """
+    收集各阶段最新的输出文件
+
+    Returns:
+        (名称, 文件路径或None) 列表
+    """
+    index_ids = list(dict.fromkeys([OLD_INDEX_ID, NEW_INDEX_ID]))
+    rows = [("排行数据", latest_file(os.path.join(JSON_OUTPUT_DIR, "bangumi_worst_anime_*.json")))]
+    for index_id in index_ids:
+        rows.append((f"索引 {index_id} 快照", latest_file(os.path.join(INDICES_DIR, f"index_{index_id}_*.json"))))
+    rows.append(("NSFW排名", latest_file(os.path.join(RANKS_DIR, "ranks_*.json"))))
+    return rows
+
+
+def main(argv=None):
+    """显示配置和本地输出文件状态"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="显示配置和本地输出文件状态")
+    parser.parse_args(argv)
+
+    import config.config as config
+
+    print("配置:")
+    print(f"  API地址: {config.BANGUMI_BASE_URL}")
+    print(f"  访问令牌: {'已设置' if config.BANGUMI_ACCESS_TOKEN else '未设置'}")
+    print(f"  今年索引: {NEW_INDEX_ID}  去年索引: {OLD_INDEX_ID}")
+    print(f"  请求间隔: {config.RATE_LIMIT_DELAY}s  重试延迟: {config.RETRY_DELAY}s")
+
+    print("\n最新输出:")
+    for name, path in collect_status():
+        print(f"  {name:<12s} {describe_file(path)}")
+    return 0
@@ -0,0 +1,127 @@
+"""
+增量JSON解析
+在响应字节到达的同时逐个解析顶层对象中某个数组的元素，
+不需要先把整个响应读入内存再调用 json.loads
+"""
+import codecs
+import json
+from typing import Dict, Iterable, Iterator, Optional
+
+_WHITESPACE = " \t\r\n"
+_DELIMITERS = _WHITESPACE + ",]}"
+
+
+class _NeedMoreData(Exception):
+    """缓冲区中的数据不足以完成当前解析步骤"""
+
+
+def iter_array_items(chunks: Iterable[bytes], key: str = "data",
+                     meta: Optional[Dict] = None) -> Iterator:
+    """
+    从顶层JSON对象的字节流中逐个解析 key 对应数组的元素
+
+    例如 {"total": 2, "data": [{...}, {...}]} 依次产出两个元素，
+    其他顶层字段（total、limit、offset 等）在解析到时写入 meta。
+
+    Args:
+        chunks: 响应字节块（如 response.iter_content()）
+        key: 要逐个解析的数组字段名
+        meta: 用于接收其他顶层字段的字典
+
+    Yields:
+        数组中的每个元素
+
+    Raises:
+        ValueError: 响应不是JSON对象，或数据不完整
+    """
+    meta = meta if meta is not None else {}
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    pos = 0
+    eof = False
+    state = "start"
+    current_key = None
+
+    def skip(chars: str = _WHITESPACE):
+        nonlocal pos
+        while pos < len(buffer) and buffer[pos] in chars:
+            pos += 1
+        if pos >= len(buffer):
+            raise _NeedMoreData
+
+    def decode_value():
+        nonlocal pos
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            raise _NeedMoreData
+        # 数字和字面量只有在后面跟着分隔符时才算结束：
+        # 在缓冲区末尾时后面可能还有数字（"12" 后面还有 "3"），
+        # 在小数点或指数处被截断时 raw_decode 只会解析出前半部分（"2." 后面还有 "5"）
+        if buffer[pos] not in "{[\"" and not eof:
+            if end >= len(buffer) or buffer[end] not in _DELIMITERS:
+                raise _NeedMoreData
+        pos = end
+        return value
+
+    while True:
+        # 每一步要么完整完成，要么在数据不足时回到该步开始的位置
+        step_start = pos
+        try:
+            if state == "start":
+                skip()
+                if buffer[pos] != "{":
+                    raise ValueError(f"响应不是JSON对象: {buffer[pos:pos + 20]!r}")
+                pos += 1
+                state = "key"
+            elif state == "key":
+                skip(_WHITESPACE + ",")
+                if buffer[pos] == "}":
+                    return
+                current_key = decode_value()
+                skip()
+                if buffer[pos] != ":":
+                    raise ValueError(f"JSON字段名后缺少冒号: {buffer[pos:pos + 20]!r}")
+                pos += 1
+                state = "array" if current_key == key else "value"
+            elif state == "value":
+                skip()
+                meta[current_key] = decode_value()
+                state = "key"
+            elif state == "array":
+                skip()
+                if buffer[pos] == "[":
+                    pos += 1
+                    state = "item"
+                else:
+                    # 字段存在但不是数组（例如 null），按普通字段处理
+                    meta[current_key] = decode_value()
+                    state = "key"
+            elif state == "item":
+                skip(_WHITESPACE + ",")
+                if buffer[pos] == "]":
+                    pos += 1
+                    state = "key"
+                else:
+                    yield decode_value()
+        except _NeedMoreData:
+            if eof:
+                raise ValueError("响应JSON不完整")
+            chunk = next(chunks, None)
+            # 丢弃已解析的部分，缓冲区只保留未完成的元素
+            buffer = buffer[step_start:]
+            pos = 0
+            if chunk is None:
+                eof = True
+                buffer += text_decoder.decode(b"", final=True)
+            else:
+                buffer += text_decoder.decode(chunk)
+
+
+def tee_chunks(chunks: Iterable[bytes], file) -> Iterator[bytes]:
+    """在产出字节块的同时写入文件（用于保存原始响应）"""
+    for chunk in chunks:
+        file.write(chunk)
+        yield chunk
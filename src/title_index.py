@@ -0,0 +1,291 @@
+"""
+标题检索索引
+为导出的排行文件和索引快照中的条目标题（name / name_cn）建立 n-gram 倒排索引：
+中日韩文字按二元组切分，拉丁字母和数字按三元组切分（词首尾补空格）。
+索引保存在导出目录中，来源文件新增或变化时只重新处理这些文件。
+"""
+import argparse
+import json
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Set, Tuple
+
+from config.config import INDICES_DIR, JSON_OUTPUT_DIR
+from src.index_snapshot import iter_snapshot_subjects
+
+INDEX_FILE = os.path.join(JSON_OUTPUT_DIR, "title_index.json")
+INDEX_VERSION = 1
+
+# bangumi_worst_{类型}_{年份}.json / index_{索引ID}_{时间戳}.json
+EXPORT_FILE_PATTERN = re.compile(r"^bangumi_worst_([a-z]+)_(\d{4})\.json$")
+SNAPSHOT_FILE_PATTERN = re.compile(r"^index_(\d+)_(\d{8}_\d{6})\.json$")
+
+# 匹配的查询 n-gram 比例低于该值的结果不返回
+MIN_SCORE = 0.3
+
+_CJK_PATTERN = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]+")
+_WORD_PATTERN = re.compile(r"[0-9a-z]+")
+
+
+def normalize_title(title: str) -> str:
+    """全角转半角、统一大小写"""
+    return unicodedata.normalize("NFKC", title or "").lower()
+
+
+def title_tokens(title: str) -> Set[str]:
+    """
+    将标题切分为 n-gram
+
+    Args:
+        title: 标题
+
+    Returns:
+        中日韩文字的二元组（单字时为单字）和拉丁词的三元组
+    """
+    text = normalize_title(title)
+    tokens = set()
+    for run in _CJK_PATTERN.findall(text):
+        if len(run) == 1:
+            tokens.add(run)
+        tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    for word in _WORD_PATTERN.findall(text):
+        padded = f" {word} "
+        tokens.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return tokens
+
+
+def find_sources(export_dir: str = JSON_OUTPUT_DIR, indices_dir: str = INDICES_DIR) -> Dict[str, str]:
+    """
+    列出索引的来源文件：所有导出文件，以及每个索引ID最新的快照
+
+    Returns:
+        {来源名称: 文件路径}，来源名称如 "anime/2026"、"index/74044"
+    """
+    sources = {}
+    if os.path.isdir(export_dir):
+        for filename in os.listdir(export_dir):
+            match = EXPORT_FILE_PATTERN.match(filename)
+            if match:
+                sources[f"{match.group(1)}/{match.group(2)}"] = os.path.join(export_dir, filename)
+
+    latest_snapshots: Dict[str, Tuple[str, str]] = {}
+    if os.path.isdir(indices_dir):
+        for filename in os.listdir(indices_dir):
+            match = SNAPSHOT_FILE_PATTERN.match(filename)
+            if match and match.group(2) > latest_snapshots.get(match.group(1), ("", ""))[0]:
+                latest_snapshots[match.group(1)] = (match.group(2), os.path.join(indices_dir, filename))
+    for index_id, (_, path) in latest_snapshots.items():
+        sources[f"index/{index_id}"] = path
+    return sources
+
+
+def read_source(path: str) -> Iterable[Dict]:
+    """
+    读取来源文件中的条目
+
+    Yields:
+        {"id", "name", "name_cn", "position", "rank", "score"}
+    """
+    if SNAPSHOT_FILE_PATTERN.match(os.path.basename(path)):
+        for subject in iter_snapshot_subjects(path):
+            # 索引条目的评论以名次开头，如 "1 -" 或 "3 ↑2"
+            parts = (subject.get("comment") or "").split()
+            yield {"id": subject.get("id"), "name": subject.get("name", ""),
+                   "name_cn": subject.get("name_cn", ""),
+                   "position": int(parts[0]) if parts and parts[0].isdigit() else None,
+                   "rank": None, "score": None}
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    for entry in data.get("normal", []) + data.get("nsfw", []):
+        yield {"id": entry.get("id"), "name": entry.get("name", ""), "name_cn": entry.get("name_cn", ""),
+               "position": entry.get("rank_position"), "rank": entry.get("rank"), "score": entry.get("score")}
+
+
+class TitleIndex:
+    """条目标题的 n-gram 倒排索引"""
+
+    def __init__(self):
+        self.sources: Dict[str, List] = {}  # 来源名称 -> [路径, 大小, 修改时间]
+        self.subjects: Dict[int, Dict] = {}  # 条目ID -> {"name", "name_cn", "occurrences": {来源: 记录}}
+        self.postings: Dict[str, Set[int]] = {}  # n-gram -> 条目ID集合
+
+    @classmethod
+    def load(cls, path: str = INDEX_FILE) -> "TitleIndex":
+        """读取保存的索引，不存在或版本不符时返回空索引"""
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            return index
+        index.sources = data["sources"]
+        index.subjects = {int(subject_id): subject for subject_id, subject in data["subjects"].items()}
+        index.postings = {token: set(ids) for token, ids in data["postings"].items()}
+        return index
+
+    def save(self, path: str = INDEX_FILE):
+        """原子地写出索引"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "sources": self.sources,
+                       "subjects": {str(k): v for k, v in self.subjects.items()},
+                       "postings": {token: sorted(ids) for token, ids in self.postings.items()}},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, path)
+
+    def _index_subject(self, subject_id: int, add: bool):
+        subject = self.subjects[subject_id]
+        for token in title_tokens(subject["name"]) | title_tokens(subject["name_cn"]):
+            if add:
+                self.postings.setdefault(token, set()).add(subject_id)
+            else:
+                ids = self.postings.get(token)
+                if ids is not None:
+                    ids.discard(subject_id)
+                    if not ids:
+                        del self.postings[token]
+
+    def _remove_source(self, source: str):
+        for subject_id in [sid for sid, s in self.subjects.items() if source in s["occurrences"]]:
+            del self.subjects[subject_id]["occurrences"][source]
+            if not self.subjects[subject_id]["occurrences"]:
+                self._index_subject(subject_id, add=False)
+                del self.subjects[subject_id]
+        self.sources.pop(source, None)
+
+    def _add_source(self, source: str, path: str):
+        for entry in read_source(path):
+            subject_id = entry.pop("id")
+            if not subject_id:
+                continue
+            subject = self.subjects.get(subject_id)
+            if subject is None:
+                subject = self.subjects[subject_id] = {"name": entry["name"], "name_cn": entry["name_cn"],
+                                                       "occurrences": {}}
+                self._index_subject(subject_id, add=True)
+            elif entry["name_cn"] and not subject["name_cn"]:
+                self._index_subject(subject_id, add=False)
+                subject["name_cn"] = entry["name_cn"]
+                self._index_subject(subject_id, add=True)
+            subject["occurrences"][source] = {"position": entry["position"], "rank": entry["rank"],
+                                              "score": entry["score"]}
+        stat = os.stat(path)
+        self.sources[source] = [path, stat.st_size, stat.st_mtime_ns]
+
+    def update(self, sources: Dict[str, str]) -> List[str]:
+        """
+        增量更新：只处理新增、变化或已删除的来源
+
+        Args:
+            sources: find_sources() 的结果
+
+        Returns:
+            发生变化的来源名称
+        """
+        changed = []
+        for source in list(self.sources):
+            if source not in sources:
+                self._remove_source(source)
+                changed.append(source)
+        for source, path in sorted(sources.items()):
+            stat = os.stat(path)
+            if self.sources.get(source) == [path, stat.st_size, stat.st_mtime_ns]:
+                continue
+            self._remove_source(source)
+            self._add_source(source, path)
+            changed.append(source)
+        return changed
+
+    def search(self, query: str, limit: int = 10, min_score: float = MIN_SCORE) -> List[Dict]:
+        """
+        模糊查找标题
+
+        按查询 n-gram 的命中比例排序；查询太短无法切分时退化为子串匹配。
+
+        Args:
+            query: 查询文本（中文、日文或拉丁字母标题的一部分）
+            limit: 最多返回条数
+            min_score: 最低命中比例
+
+        Returns:
+            [{"id", "name", "name_cn", "score", "occurrences"}, ...]
+        """
+        tokens = title_tokens(query)
+        # 单个汉字只在单字标题中被索引，其余情况按子串匹配
+        if any(len(token) > 1 for token in tokens):
+            hits = Counter()
+            for token in tokens:
+                hits.update(self.postings.get(token, ()))
+            scored = [(count / len(tokens), subject_id) for subject_id, count in hits.items()
+                      if count / len(tokens) >= min_score]
+        else:
+            needle = normalize_title(query).strip()
+            scored = [(1.0, subject_id) for subject_id, subject in self.subjects.items()
+                      if needle and (needle in normalize_title(subject["name"])
+                                     or needle in normalize_title(subject["name_cn"]))]
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [{"id": subject_id, "name": self.subjects[subject_id]["name"],
+                 "name_cn": self.subjects[subject_id]["name_cn"], "score": round(score, 3),
+                 "occurrences": self.subjects[subject_id]["occurrences"]}
+                for score, subject_id in scored[:limit]]
+
+
+def load_title_index(path: str = INDEX_FILE, export_dir: str = JSON_OUTPUT_DIR,
+                     indices_dir: str = INDICES_DIR, rebuild: bool = False) -> TitleIndex:
+    """
+    读取索引，并在来源文件变化时增量更新后保存
+
+    Args:
+        path: 索引文件路径
+        export_dir: 导出文件目录
+        indices_dir: 索引快照目录
+        rebuild: 忽略已保存的索引，完全重建
+
+    Returns:
+        最新的索引
+    """
+    index = TitleIndex() if rebuild else TitleIndex.load(path)
+    changed = index.update(find_sources(export_dir, indices_dir))
+    if changed or rebuild:
+        index.save(path)
+    return index
+
+
+def main(argv=None):
+    """主函数"""
+    parser = argparse.ArgumentParser(description="按标题查找条目在各年份榜单和索引中的名次")
+    parser.add_argument("query", nargs="?", help="标题或标题的一部分（中文、日文或英文）")
+    parser.add_argument("--limit", type=int, default=10, help="最多显示条数（默认：10）")
+    parser.add_argument("--rebuild", action="store_true", help="完全重建索引")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    args = parser.parse_args(argv)
+
+    index = load_title_index(rebuild=args.rebuild)
+    if not args.query:
+        print(f"索引: {INDEX_FILE}（{len(index.sources)} 个来源，{len(index.subjects)} 个条目，"
+              f"{len(index.postings)} 个 n-gram）")
+        return 0
+
+    results = index.search(args.query, limit=args.limit)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return 0
+    if not results:
+        print(f"未找到: {args.query}")
+        return 1
+    for result in results:
+        print(f"{result['id']:>7d}  {result['name_cn'] or result['name']}  "
+              f"({result['name']})  匹配度 {result['score']:.2f}")
+        for source, occurrence in sorted(result["occurrences"].items(), reverse=True):
+            details = f"第 {occurrence['position']} 名" if occurrence["position"] else "未记录名次"
+            if occurrence["rank"]:
+                details += f"，Bangumi排名 {occurrence['rank']}，评分 {occurrence['score']}"
+            print(f"         {source:<14s} {details}")
+    return 0
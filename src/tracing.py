@@ -0,0 +1,175 @@
+"""
+轻量级阶段追踪
+记录嵌套的耗时区间（运行 → 阶段 → 分页/条目请求 → 重试），
+输出为 Chrome trace-event JSON，可在 chrome://tracing 或 Perfetto 中查看
+
+未启用时 span() 直接返回共享的空对象，几乎没有开销。
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+TRACE_DIR = os.path.join("output", "traces")
+
+# 通过环境变量启用追踪（值为输出文件路径，留空则自动生成）
+TRACE_ENV = "BGM_TRACE"
+
+
+class _NoopSpan:
+    """追踪未启用时使用的空区间"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """一个耗时区间，退出时记录为 Chrome 'X'（complete）事件"""
+
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.add_event(self.name, self.cat, self.start, end, self.args)
+        return False
+
+    def set(self, **args):
+        """在区间结束前补充参数（例如响应状态码）"""
+        self.args.update(args)
+
+
+class Tracer:
+    """收集追踪事件"""
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._events: List[Dict] = []
+        self._thread_names: Dict[int, str] = {}
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+
+    def add_event(self, name: str, cat: str, start: float, end: float, args: Dict):
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": round((start - self._origin) * 1e6, 3),
+            "dur": round((end - start) * 1e6, 3),
+            "pid": self._pid,
+            "tid": thread.ident,
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self._events.append(event)
+            self._thread_names.setdefault(thread.ident, thread.name)
+
+    def to_chrome_trace(self) -> Dict:
+        """生成 Chrome trace-event 格式的数据"""
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+
+        metadata = [{"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid,
+                     "args": {"name": name}} for tid, name in thread_names.items()]
+        return {"traceEvents": metadata + sorted(events, key=lambda e: e["ts"]),
+                "displayTimeUnit": "ms"}
+
+    def write(self, path: str) -> str:
+        """写出追踪文件"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f, ensure_ascii=False)
+        return path
+
+
+tracer = Tracer()
+
+
+def span(name: str, cat: str = "stage", **args):
+    """
+    创建一个追踪区间（用作 with 语句）
+
+    Args:
+        name: 区间名称
+        cat: 分类（run / stage / page / subject / http / retry）
+        **args: 附加参数，显示在追踪查看器中
+
+    Returns:
+        上下文管理器；未启用追踪时为共享的空对象
+    """
+    if not tracer.enabled:
+        return _NOOP_SPAN
+    return Span(tracer, name, cat, args)
+
+
+def enable_tracing(run_name: str, path: Optional[str] = None) -> str:
+    """
+    启用追踪，并在进程退出时写出追踪文件
+
+    Args:
+        run_name: 运行名称（入口脚本名）
+        path: 输出文件路径，默认 output/traces/{run_name}_{timestamp}.json
+
+    Returns:
+        追踪文件路径
+    """
+    if not path:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(TRACE_DIR, f"{run_name}_{timestamp}.json")
+
+    if not tracer.enabled:
+        tracer.enabled = True
+
+        def write():
+            tracer.write(path)
+            print(f"\n追踪文件已保存到: {path}（可在 chrome://tracing 或 ui.perfetto.dev 中打开）")
+
+        atexit.register(write)
+
+    return path
+
+
+def add_trace_argument(parser):
+    """为入口脚本添加 --trace 参数"""
+    parser.add_argument("--trace", nargs="?", const="", default=os.getenv(TRACE_ENV),
+                        metavar="PATH",
+                        help=f"记录阶段追踪并输出 Chrome trace JSON（默认写入 {TRACE_DIR}/，"
+                             f"也可通过环境变量 {TRACE_ENV} 启用）")
+
+
+def setup_tracing(run_name: str, trace_arg: Optional[str]):
+    """根据 --trace 参数启用追踪（参数为 None 时不启用）"""
+    if trace_arg is not None:
+        enable_tracing(run_name, trace_arg or None)
@@ -0,0 +1,196 @@
+"""
+监视模式
+首次完整抓取后，只轮询榜单末位附近及以上的排名区间，在内存中维护榜单；
+榜单成员或顺序变化时才重新导出，并可写出变化记录（delta）文件。
+两次轮询之间的空闲时间里，在后台以最低优先级预取榜单末位附近条目的详情，供变化记录使用
+"""
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config.config import MIN_RANK, TOP_N, WATCH_INTERVAL, WATCH_PREFETCH_COUNT, WATCH_RANK_MARGIN
+from src.api_client import BangumiAPIClient
+from src.clock import get_clock
+from src.data_processor import DataProcessor
+from src.exporters import JSONExporter
+from src.log import get_logger, kv
+from src.metrics import http_metrics
+from src.ranking_diff import diff_rankings
+from src.scheduler import BackgroundLane
+from src.tracing import span
+
+logger = get_logger("watcher")
+
+
+def rank_order(anime_list: List[Dict], top_n: int) -> List[Dict]:
+    """按 rank 从大到小取前 top_n 条（与 JSONExporter 的榜单顺序一致）"""
+    return sorted(anime_list, key=lambda x: -x.get("rank", 0))[:top_n]
+
+
+class RankingWatcher:
+    """在内存中维护榜单，增量轮询排名区间"""
+
+    def __init__(self, api_client: BangumiAPIClient, data_processor: DataProcessor,
+                 exporter: JSONExporter, year: int, top_n: int = TOP_N,
+                 margin: int = WATCH_RANK_MARGIN, write_delta: bool = False,
+                 prefetch_count: int = WATCH_PREFETCH_COUNT):
+        """
+        Args:
+            api_client: API客户端
+            data_processor: 数据处理器
+            exporter: 导出器
+            year: 导出年份
+            top_n: 榜单条目数
+            margin: 轮询区间在榜单末位排名之下额外包含的排名数
+            write_delta: 榜单变化时是否写出变化记录文件
+            prefetch_count: 空闲时预取详情的条目数（榜单末位及其下方各一半）
+        """
+        self.api_client = api_client
+        self.data_processor = data_processor
+        self.exporter = exporter
+        self.year = year
+        self.top_n = top_n
+        self.margin = margin
+        self.write_delta = write_delta
+        self.prefetch_count = prefetch_count
+        self.ranking: List[Dict] = []
+        self.band: List[Dict] = []
+        self.polls = 0
+        self.subject_details: Dict[int, Dict] = {}  # 条目ID -> 预取到的详情摘要
+
+    def band_min_rank(self) -> int:
+        """本次轮询的排名下限：榜单未满时使用完整抓取的阈值"""
+        if len(self.ranking) < self.top_n:
+            return MIN_RANK
+        return max(MIN_RANK, self.ranking[-1].get("rank", 0) - self.margin)
+
+    def fetch_band(self, min_rank: int) -> List[Dict]:
+        """
+        抓取排名大于 min_rank 的所有条目
+
+        排名可能在抓取各页之间变化，后一页会重复前一页末尾的条目，按条目ID去重（保留最近一次抓取到的数据）
+        """
+        anime_by_id: Dict[int, Dict] = {}
+        offset = 0
+        while True:
+            result = self.api_client.search_worst_anime(offset=offset, min_rank=min_rank,
+                                                        project=self.data_processor.project_item)
+            page = result.get("data") if result else None
+            if not page:
+                break
+            for anime in page:
+                anime_by_id[anime["id"]] = anime
+            offset += len(page)
+            if offset >= result.get("total", 0):
+                break
+        return list(anime_by_id.values())
+
+    def poll(self) -> Optional[Dict]:
+        """
+        轮询一次排名区间并更新榜单
+
+        Returns:
+            榜单变化（diff_rankings 的结果）；没有变化时返回 None
+        """
+        min_rank = self.band_min_rank()
+        requests_before = http_metrics.total_requests()
+        with span("poll", "stage", min_rank=min_rank) as stage:
+            band = self.fetch_band(min_rank)
+            # 区间内条目不足时（例如大量条目排名上升离开了区间），扩大到完整范围重新抓取
+            if len(band) < self.top_n and min_rank > MIN_RANK:
+                logger.info("区间内条目不足，扩大到完整范围", extra=kv(min_rank=min_rank, count=len(band)))
+                min_rank = MIN_RANK
+                band = self.fetch_band(min_rank)
+            stage.set(items=len(band))
+
+        self.polls += 1
+        self.band = band
+        new_ranking = rank_order(band, self.top_n)
+        requests = http_metrics.total_requests() - requests_before
+        if [a["id"] for a in new_ranking] == [a["id"] for a in self.ranking]:
+            # 成员和顺序未变，只更新评分等字段
+            self.ranking = new_ranking
+            logger.info("榜单未变化", extra=kv(min_rank=min_rank, band=len(band), requests=requests))
+            return None
+
+        changes = diff_rankings(self.ranking, new_ranking)
+        self.ranking = new_ranking
+        logger.info("榜单已变化", extra=kv(min_rank=min_rank, band=len(band), requests=requests,
+                                         entered=len(changes["entered"]), left=len(changes["left"]),
+                                         moved=len(changes["moved"])))
+        return changes
+
+    def cutoff_candidates(self) -> List[int]:
+        """榜单末位附近（榜单内和刚好在榜单外）尚未预取详情的条目ID，离末位越近越靠前"""
+        if not self.prefetch_count or not self.ranking:
+            return []
+        ranked = rank_order(self.band, len(self.band))
+        cutoff = len(self.ranking)
+        half = max(1, self.prefetch_count // 2)
+        positions = range(max(0, cutoff - half), min(len(ranked), cutoff + half))
+        # 从末位向两侧展开
+        positions = sorted(positions, key=lambda position: abs(position - cutoff + 0.5))
+        subject_ids = [ranked[position]["id"] for position in positions]
+        return [subject_id for subject_id in subject_ids if subject_id not in self.subject_details]
+
+    def prefetch(self, subject_ids: List[int], lane: BackgroundLane):
+        """在后台线程中以 prefetch 优先级获取条目详情（有其他请求时让路）"""
+        for subject_id in subject_ids:
+            if lane.stopped:
+                return
+            data = self.api_client.get_subject(subject_id, priority="prefetch")
+            rating = data.get("rating") or {}
+            self.subject_details[subject_id] = {
+                "rating_total": rating.get("total"),
+                "rating_count": rating.get("count"),
+                "collection": data.get("collection"),
+            }
+        logger.debug("预取完成", extra=kv(count=len(subject_ids), cached=len(self.subject_details)))
+
+    def export(self, changes: Dict) -> str:
+        """导出当前榜单，并按需写出变化记录"""
+        sorted_anime = self.data_processor.sort_by_score([dict(anime) for anime in self.ranking])
+        normal_list, nsfw_list = self.data_processor.separate_nsfw(sorted_anime)
+        filepath = self.exporter.export(normal_list, nsfw_list, year=self.year, top_n=self.top_n)
+
+        if self.write_delta and self.polls > 1:
+            delta_dir = os.path.join(self.exporter.output_dir, "deltas")
+            os.makedirs(delta_dir, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            delta_path = os.path.join(delta_dir, f"bangumi_worst_anime_{self.year}_{timestamp}.delta.json")
+            changed_ids = {anime["id"] for entries in changes.values() for anime in entries}
+            details = {str(subject_id): self.subject_details[subject_id]
+                       for subject_id in sorted(changed_ids) if subject_id in self.subject_details}
+            with open(delta_path, "w", encoding="utf-8") as f:
+                json.dump({"timestamp": datetime.now().isoformat(), "year": self.year, **changes,
+                           "details": details}, f, ensure_ascii=False, indent=2)
+            print(f"[OK] 变化记录已保存: {delta_path}")
+
+        return filepath
+
+    def run(self, interval: float = WATCH_INTERVAL, iterations: Optional[int] = None):
+        """
+        持续轮询，直到达到轮询次数或被中断
+
+        Args:
+            interval: 两次轮询之间的间隔（秒）
+            iterations: 轮询次数（含首次完整抓取），None 表示不限
+        """
+        lane = BackgroundLane("watch-prefetch")
+        try:
+            while True:
+                changes = self.poll()
+                if changes is not None:
+                    self.export(changes)
+                if iterations is not None and self.polls >= iterations:
+                    break
+                candidates = self.cutoff_candidates()
+                if candidates:
+                    lane.submit(self.prefetch, candidates, lane)
+                with span("watch_wait", "wait", seconds=interval):
+                    get_clock().sleep(interval)
+        except KeyboardInterrupt:
+            print("\n监视已停止")
+        finally:
+            lane.stop(timeout=5)
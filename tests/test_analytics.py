@@ -0,0 +1,66 @@
+"""批量趋势分析：两天的抓取和一个索引快照合并为每日变化和条目时间序列"""
+import json
+
+from src.analytics import find_snapshot_tasks, run_analytics, write_analytics
+
+
+def make_subject(subject_id: int, rank: int, score: float) -> dict:
+    return {"id": subject_id, "name": f"subject {subject_id}", "name_cn": f"条目{subject_id}", "date": "2020-01-01",
+            "nsfw": False, "rating": {"rank": rank, "score": score, "total": 100}}
+
+
+def write_page(debug_dir, offset, timestamp, subjects, total):
+    debug_dir.mkdir(parents=True, exist_ok=True)
+    (debug_dir / f"api_response_offset_{offset}_{timestamp}.json").write_text(
+        json.dumps({"total": total, "limit": 3, "offset": offset, "data": subjects}, ensure_ascii=False),
+        encoding="utf-8")
+
+
+def test_daily_churn_and_title_series(tmp_path):
+    debug_dir, indices_dir = tmp_path / "debug", tmp_path / "indices"
+    # 第一天分两页抓取，名次依次为 1 2 3 | 4 5
+    write_page(debug_dir, 0, "20260101_120000",
+               [make_subject(1, 10009, 3.0), make_subject(2, 10008, 3.1), make_subject(3, 10007, 3.2)], total=5)
+    write_page(debug_dir, 3, "20260101_120001",
+               [make_subject(4, 10006, 3.3), make_subject(5, 10005, 3.4)], total=5)
+    # 第二天条目 3 离开，条目 4 排名升到第一，新增条目 6
+    write_page(debug_dir, 0, "20260102_120000",
+               [make_subject(4, 10010, 2.0), make_subject(1, 10009, 2.5), make_subject(2, 10008, 3.1),
+                make_subject(5, 10005, 3.4), make_subject(6, 10004, 3.5)], total=5)
+    indices_dir.mkdir()
+    (indices_dir / "index_7_20260101_180000.json").write_text(json.dumps({"index_info": {"id": 7}, "subjects": [
+        {"id": 1, "name": "subject 1", "comment": "1 -"},
+        {"id": 3, "name": "subject 3", "comment": "2 NEW"},
+    ]}), encoding="utf-8")
+
+    tasks = find_snapshot_tasks(str(debug_dir), str(indices_dir))
+    assert [(task[0], task[1]) for task in tasks] == [
+        ("crawl", "20260101_120000"), ("index", "20260101_180000"), ("crawl", "20260102_120000")]
+
+    aggregator = run_analytics(tasks, workers=1, top_n=3, band=1)
+
+    assert aggregator.snapshots == 3
+    first, second = aggregator.churn()
+    assert first == {"date": "2026-01-01", "run": "20260101_120000", "size": 3,
+                     "cutoff_rank": 10007, "cutoff_score": 3.2}
+    # 榜单 [1, 2, 3] -> [4, 1, 2]，分界线附近 [3, 4] -> [2, 5]
+    assert second == {"date": "2026-01-02", "run": "20260102_120000", "size": 3,
+                      "cutoff_rank": 10008, "cutoff_score": 3.1, "entered": 1, "left": 1, "band_changed": 2}
+
+    series = {record["id"]: record for record in aggregator.title_series()}
+    assert set(series) == {1, 2, 3, 4, 5, 6}
+    assert series[1]["crawl"] == {"t": ["20260101_120000", "20260102_120000"], "position": [1, 2],
+                                  "rank": [10009, 10009], "score": [3.0, 2.5], "rating_total": [100, 100]}
+    assert series[1]["index/7"] == {"t": ["20260101_180000"], "position": [1]}
+    assert series[1]["name_cn"] == "条目1"
+    assert (series[1]["first_seen"], series[1]["last_seen"]) == ("20260101_120000", "20260102_120000")
+    assert series[1]["score_drift"] == -0.5
+    assert series[3]["last_seen"] == "20260101_180000"
+    assert series[4]["crawl"]["position"] == [4, 1]
+    assert series[6]["first_seen"] == "20260102_120000"
+
+    churn_path, series_path = write_analytics(aggregator, str(tmp_path / "reports"))
+    with open(churn_path, encoding="utf-8") as f:
+        assert json.load(f)["days"] == [first, second]
+    with open(series_path, encoding="utf-8") as f:
+        assert [json.loads(line)["id"] for line in f] == [1, 2, 3, 4, 5, 6]
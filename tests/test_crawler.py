@@ -0,0 +1,66 @@
+"""排名区间抓取：重叠窗口按条目ID去重，窗口之间出现缺口时补抓前一窗口"""
+from src.crawler import BandCrawler
+from src.replay import REFETCH_PREFIX
+
+
+class ShiftingClient:
+    """按偏移量返回条目；第 shift_at 次请求前，排在最前面的 shift 个条目离开区间"""
+
+    def __init__(self, size: int, shift: int = 0, shift_at: int = 2):
+        self.subjects = [{"id": subject_id, "rank": 10000 + subject_id} for subject_id in range(1, size + 1)]
+        self.shift = shift
+        self.shift_at = shift_at
+        self.requests = []
+
+    def search_worst_anime(self, offset=0, limit=10, debug_prefix="", **kwargs):
+        self.requests.append((offset, debug_prefix))
+        if len(self.requests) == self.shift_at:
+            del self.subjects[:self.shift]
+        return {"total": len(self.subjects), "limit": limit, "offset": offset,
+                "data": self.subjects[offset:offset + limit]}
+
+
+def test_overlapping_windows_are_deduplicated():
+    client = ShiftingClient(size=40)
+    crawler = BandCrawler(client, page_size=10, overlap=2, concurrency=1)
+
+    items, report = crawler.crawl()
+
+    assert [item["id"] for item in items] == list(range(1, 41))
+    # 窗口偏移量 0、8、16、24、32，相邻窗口各重叠 2 条
+    assert report["pages"] == 5
+    assert report["duplicates"] == 8
+    assert report["complete"]
+    assert report["refetched_pages"] == 0
+    assert report["gaps_found"] == []
+
+
+def test_gap_between_windows_triggers_refetch():
+    client = ShiftingClient(size=40, shift=5)
+    crawler = BandCrawler(client, page_size=10, overlap=2, concurrency=1)
+
+    items, report = crawler.crawl()
+
+    # 第一个窗口之后条目前移 5 位，偏移量 8 的窗口与第一个窗口没有共同条目
+    assert report["gaps_found"] == [[0, 8]]
+    assert report["gaps_unresolved"] == []
+    assert report["refetched_pages"] == 1
+    assert client.requests[-1] == (0, REFETCH_PREFIX)
+    # 落在缺口中的条目由补抓的窗口找回
+    ids = {item["id"] for item in items}
+    assert {11, 12, 13} <= ids
+    assert len(ids) == len(items)
+    assert report["total"] == 35
+    assert report["complete"]
+
+
+def test_unresolved_gap_marks_report_incomplete():
+    client = ShiftingClient(size=40, shift=5)
+    crawler = BandCrawler(client, page_size=10, overlap=2, concurrency=1, refetch_rounds=0)
+
+    items, report = crawler.crawl()
+
+    assert report["gaps_unresolved"] == [[0, 8]]
+    assert report["refetched_pages"] == 0
+    assert not report["complete"]
+    assert not {11, 12, 13} & {item["id"] for item in items}
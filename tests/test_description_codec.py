@@ -0,0 +1,36 @@
+"""索引描述编解码：拆分后每段都不超过长度限制"""
+import pytest
+
+from src.description_codec import CONTINUATION_LINE, parse_description, render_description
+
+
+def entry(position: int, name: str) -> dict:
+    return {"rank_position": position, "change": "-", "id": 100 + position, "name": name}
+
+
+def test_split_parts_fit_and_round_trip():
+    entries = [entry(position, f"条目{position}") for position in range(1, 30)]
+    parts = render_description(["开头"], entries, max_length=120)
+
+    assert len(parts) > 1
+    assert all(len(part) <= 120 for part in parts)
+    assert all(part.startswith(CONTINUATION_LINE) for part in parts[1:])
+    parsed = [e["id"] for part in parts for e in parse_description(part)["entries"]]
+    assert parsed == [e["id"] for e in entries]
+
+
+def test_overlong_entry_in_middle_raises_entry_error():
+    entries = [entry(1, "短"), entry(2, "长" * 200), entry(3, "短")]
+    with pytest.raises(ValueError, match="无法容纳"):
+        render_description(["开头"], entries, max_length=80)
+
+
+def test_overlong_last_entry_raises_entry_error():
+    entries = [entry(1, "短"), entry(2, "长" * 200)]
+    with pytest.raises(ValueError, match="无法容纳"):
+        render_description(["开头"], entries, max_length=80)
+
+
+def test_overlong_header_raises_header_error():
+    with pytest.raises(ValueError, match="开头文本"):
+        render_description(["开" * 100], [], max_length=80)
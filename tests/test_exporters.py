@@ -0,0 +1,67 @@
+"""导出器：流式写出的JSON与 json.dump 一致，只有生成时间变化时不替换文件"""
+import json
+import os
+
+import pytest
+
+from src.exporters import MANIFEST_FILE, Exporter, JSONExporter, build_ranked_table
+
+
+def make_anime(anime_id: int, nsfw: bool = False, **fields) -> dict:
+    anime = {"id": anime_id, "name": f"subject {anime_id}", "name_cn": "", "score": 3.5,
+             "rank": 10000 + anime_id, "rating_total": 100, "nsfw": nsfw, "date": "2026-01-01"}
+    anime.update(fields)
+    return anime
+
+
+def expected_json(table: dict) -> bytes:
+    data = {key: table[key] for key in ("metadata", "normal", "nsfw")}
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+@pytest.mark.parametrize("normal, nsfw", [
+    ([make_anime(1, name='引号"反斜杠\\', name_cn="换行\n制表\t控制\u0001"),
+      make_anime(2, name="Ünïcödé ☃ 😀", tags=["中文", [], {}], score=None)],
+     [make_anime(3, nsfw=True, name_cn="受限")]),
+    ([make_anime(1, name_cn="只有普通条目")], []),
+    ([], [make_anime(1, nsfw=True)]),
+    ([], []),
+])
+def test_streamed_json_matches_json_dump(tmp_path, normal, nsfw):
+    table = build_ranked_table(normal, nsfw, year=2026)
+
+    path, changed = JSONExporter(output_dir=str(tmp_path)).write_file(table)
+
+    assert changed
+    with open(path, "rb") as f:
+        assert f.read() == expected_json(table)
+
+
+def test_fetch_date_change_keeps_file_and_manifest(tmp_path):
+    exporter = JSONExporter(output_dir=str(tmp_path))
+    entries = [make_anime(1), make_anime(2, nsfw=True)]
+    table = build_ranked_table(entries, [], year=2026)
+    path, _ = exporter.write_file(table)
+    manifest_path = os.path.join(str(tmp_path), MANIFEST_FILE)
+    # 把修改时间调到过去，文件被替换时一定能看出来
+    for file in (path, manifest_path):
+        os.utime(file, ns=(1_000_000_000, 1_000_000_000))
+    with open(manifest_path, "rb") as f:
+        manifest = f.read()
+
+    table["metadata"]["fetch_date"] = "2000-01-01T00:00:00"
+    assert exporter.write_file(table) == (path, False)
+
+    assert os.stat(path).st_mtime_ns == 1_000_000_000
+    assert os.stat(manifest_path).st_mtime_ns == 1_000_000_000
+    with open(manifest_path, "rb") as f:
+        assert f.read() == manifest
+    assert not os.path.exists(f"{path}.tmp")
+
+    table["normal"][0]["score"] = 1.0
+    assert exporter.write_file(table) == (path, True)
+
+
+def test_exporter_requires_write(tmp_path):
+    with pytest.raises(TypeError):
+        Exporter(output_dir=str(tmp_path))
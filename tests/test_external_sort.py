@@ -0,0 +1,65 @@
+"""外部排序：结果与 sorted() 一致，归并时打开的文件数受限"""
+import os
+import random
+
+import pytest
+
+from src.external_sort import ExternalSorter, SpillingRanking
+
+
+def make_records(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    # 键有大量重复，用于检查稳定性
+    return [{"key": rng.randint(0, 20), "seq": seq, "name": "条目" * rng.randint(1, 5)} for seq in range(count)]
+
+
+def test_matches_sorted_with_bounded_fan_in(tmp_path):
+    records = make_records(500)
+    sorter = ExternalSorter(lambda record: record["key"], memory_budget=2000, tmp_dir=str(tmp_path), fan_in=3)
+    sorter.extend(records)
+    assert len(sorter.runs) > 3
+
+    assert list(sorter) == sorted(records, key=lambda record: record["key"])
+    # 中间归并后最终归并只打开 fan_in - 1 个段文件（另加内存缓冲）
+    assert len(sorter.runs) <= 2
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(path) for path in sorter.runs)
+    # 可以再次遍历
+    assert list(sorter) == sorted(records, key=lambda record: record["key"])
+
+    sorter.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_budget_counts_string_size_not_characters(tmp_path):
+    ascii_sorter = ExternalSorter(lambda record: record, memory_budget=10 ** 6, tmp_dir=str(tmp_path))
+    cjk_sorter = ExternalSorter(lambda record: record, memory_budget=10 ** 6, tmp_dir=str(tmp_path))
+    ascii_sorter.add("a" * 100)
+    cjk_sorter.add("条" * 100)
+    # 字符数相同，中文文本占用的内存约为两倍
+    assert cjk_sorter._buffer_bytes - ascii_sorter._buffer_bytes >= 100
+
+
+def open_files_under(directory) -> list:
+    fd_dir = "/proc/self/fd"
+    paths = []
+    for fd in os.listdir(fd_dir):
+        try:
+            paths.append(os.readlink(os.path.join(fd_dir, fd)))
+        except OSError:
+            continue
+    return [path for path in paths if path.startswith(str(directory))]
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="需要 /proc/self/fd")
+def test_top_by_rank_closes_run_files(tmp_path):
+    store = SpillingRanking(memory_budget_mb=0.002, tmp_dir=str(tmp_path))
+    for subject_id in range(1, 201):
+        store[subject_id] = {"id": subject_id, "rank": subject_id, "score": 3.0, "nsfw": False}
+    assert store.stats()["runs"] > 2
+
+    top = store.top_by_rank(5)
+
+    assert [anime["id"] for anime in top] == [200, 199, 198, 197, 196]
+    assert open_files_under(tmp_path) == []
+    store.close()
+    assert os.listdir(tmp_path) == []
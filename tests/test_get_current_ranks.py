@@ -0,0 +1,11 @@
+"""获取当前排名：缺少访问令牌或索引快照时以非零状态退出"""
+import get_current_ranks
+
+
+def test_get_current_ranks_exits_nonzero_without_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(get_current_ranks.get_latest_index_file, "__defaults__", (str(tmp_path), None))
+    monkeypatch.setattr(get_current_ranks, "BANGUMI_ACCESS_TOKEN", "token")
+    assert get_current_ranks.run() == 1
+
+    monkeypatch.setattr(get_current_ranks, "BANGUMI_ACCESS_TOKEN", "")
+    assert get_current_ranks.run() == 1
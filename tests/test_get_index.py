@@ -0,0 +1,17 @@
+"""索引快照：有索引镜像失败或缺失时以非零状态退出"""
+import get_index
+
+
+def test_get_index_exits_nonzero_on_failed_mirror(monkeypatch):
+    def mirror_index(index_id, force=False):
+        if index_id == 2:
+            raise RuntimeError("boom")
+        return {"index_id": index_id, "status": "updated", "filepath": "x.json", "subject_count": 1}
+
+    monkeypatch.setattr(get_index, "mirror_index", mirror_index)
+    assert get_index.main(["--index-ids", "1", "2"]) == 1
+    assert get_index.main(["--index-ids", "1"]) == 0
+
+    monkeypatch.setattr(get_index, "mirror_index", lambda index_id, force=False: {
+        "index_id": index_id, "status": "missing", "filepath": None, "subject_count": 0})
+    assert get_index.main(["--index-ids", "1"]) == 1
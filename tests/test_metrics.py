@@ -0,0 +1,52 @@
+"""HTTP请求指标：流式响应在读取正文时累计收到的字节数"""
+import io
+
+import requests
+
+from src import metrics
+from src.metrics import HTTPMetrics, send_request
+
+BODY = '{"total": 2, "data": [{"id": 1, "name": "名字"}, {"id": 2}]}'.encode("utf-8")
+
+
+class FakeSender:
+    """返回分块传输（没有 Content-Length）的响应"""
+
+    def request(self, method, url, stream=False, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.raw = io.BytesIO(BODY)
+        response.headers["Transfer-Encoding"] = "chunked"
+        return response
+
+
+def received_bytes() -> int:
+    return metrics.http_metrics.snapshot()["total_bytes_received"]
+
+
+def test_streamed_response_counts_bytes_as_consumed(monkeypatch):
+    monkeypatch.setattr(metrics, "http_metrics", HTTPMetrics())
+
+    response = send_request(FakeSender(), "POST", "https://api.bgm.tv/v0/search/subjects?offset=0", stream=True)
+    assert received_bytes() == 0
+
+    chunks = response.iter_content(chunk_size=7)
+    next(chunks)
+    assert received_bytes() == 7
+    assert b"".join(chunks) == BODY[7:]
+    assert received_bytes() == len(BODY)
+    assert metrics.http_metrics.total_requests() == 1
+
+
+def test_streamed_content_and_plain_responses(monkeypatch):
+    monkeypatch.setattr(metrics, "http_metrics", HTTPMetrics())
+
+    # 流式请求中直接读取 response.content（如错误响应）同样计入
+    assert send_request(FakeSender(), "GET", "https://api.bgm.tv/v0/subjects/1", stream=True).content == BODY
+    assert received_bytes() == len(BODY)
+
+    send_request(FakeSender(), "GET", "https://api.bgm.tv/v0/subjects/2")
+    assert received_bytes() == 2 * len(BODY)
+    endpoint = metrics.http_metrics.snapshot()["endpoints"]["GET /v0/subjects/{id}"]
+    assert endpoint["requests"] == 2 and endpoint["bytes_received"] == 2 * len(BODY)
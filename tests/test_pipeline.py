@@ -0,0 +1,61 @@
+"""流水线运行器：失败的阶段不记录指纹，代码变化触发重新运行"""
+import os
+
+from src import pipeline
+from src.pipeline import PipelineState, Stage, build_stages, run_pipeline
+
+
+def make_stage(tmp_path, name: str, code: str, **kwargs) -> Stage:
+    script = tmp_path / f"{name}.py"
+    script.write_text(code, encoding="utf-8")
+    # 绝对路径的脚本不受 ROOT_DIR 影响
+    return Stage(name, str(script), **kwargs)
+
+
+def test_failing_stage_is_not_recorded(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, "LOG_DIR", str(tmp_path / "logs"))
+    output = tmp_path / "ranks.json"
+    stages = {
+        "index": make_stage(tmp_path, "index", "import sys\nsys.exit(1)\n"),
+        "ranks": make_stage(tmp_path, "ranks", f"open({str(output)!r}, 'w').write('[]')\n",
+                            outputs=[str(output)], deps=["index"]),
+    }
+    state = PipelineState(str(tmp_path / "state.json"))
+
+    results = run_pipeline(stages, ["ranks"], max_age_hours=None, jobs=1, state=state)
+
+    assert results["index"]["status"] == "failed"
+    assert results["ranks"]["status"] == "blocked"
+    assert state.stages == {}
+    assert not output.exists()
+    # 下次运行时失败的阶段仍需要运行
+    assert PipelineState(state.path).stages == {}
+
+
+def test_successful_stage_is_recorded_and_skipped(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, "LOG_DIR", str(tmp_path / "logs"))
+    output = tmp_path / "out.txt"
+    stages = {"fetch": make_stage(tmp_path, "fetch", f"open({str(output)!r}, 'w').write('ok')\n",
+                                  outputs=[str(output)])}
+    state = PipelineState(str(tmp_path / "state.json"))
+
+    assert run_pipeline(stages, ["fetch"], max_age_hours=None, jobs=1, state=state)["fetch"]["status"] == "ran"
+    assert "fetch" in state.stages
+    assert run_pipeline(stages, ["fetch"], max_age_hours=None, jobs=1, state=state)["fetch"]["status"] == "skipped"
+
+    # 脚本变化后重新运行
+    (tmp_path / "fetch.py").write_text(f"open({str(output)!r}, 'w').write('changed')\n", encoding="utf-8")
+    assert run_pipeline(stages, ["fetch"], max_age_hours=None, jobs=1, state=state)["fetch"]["status"] == "ran"
+
+
+def test_stage_inputs_include_imported_modules():
+    stages = build_stages(2026)
+
+    def code(name):
+        return {os.path.relpath(path, pipeline.ROOT_DIR).replace(os.sep, "/") for path in stages[name].inputs}
+
+    assert {"main.py", "config/config.py", "src/crawler.py", "src/stream_json.py", "src/external_sort.py",
+            "src/report.py", "src/metrics.py", "src/scheduler.py"} <= code("fetch")
+    assert {"get_index.py", "src/index_snapshot.py"} <= code("index")
+    assert {"get_current_ranks.py", "src/description_codec.py"} <= code("ranks")
+    assert {"upload_to_index.py", "src/description_codec.py", "src/index_snapshot.py"} <= code("upload")
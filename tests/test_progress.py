@@ -0,0 +1,45 @@
+"""进度报告：没有新完成的条目时也按间隔刷新，时间取自可替换的时钟"""
+import io
+import time
+
+from src.clock import VirtualClock
+from src.progress import ProgressReporter
+
+
+def test_refresh_during_stall_uses_injected_clock():
+    clock = VirtualClock()
+    stream = io.StringIO()
+    progress = ProgressReporter("抓取", total=100, interval=10, stream=stream, clock=clock)
+
+    clock.sleep(10)
+    progress.update(10)
+    first = progress.stats()
+    assert stream.getvalue().count("\n") == 1
+
+    # 限速等待期间没有完成条目：不到间隔不刷新，到达间隔后刷新，速率下降、预计剩余时间变长
+    clock.sleep(5)
+    progress.refresh()
+    assert stream.getvalue().count("\n") == 1
+    clock.sleep(5)
+    progress.refresh()
+    assert stream.getvalue().count("\n") == 2
+    second = progress.stats()
+    assert second["elapsed"] >= 20
+    assert second["items_per_second"] < first["items_per_second"]
+    assert second["eta"] > first["eta"]
+
+    progress.close()
+    assert "final=1" in stream.getvalue().splitlines()[-1]
+
+
+def test_background_thread_renders_without_updates():
+    stream = io.StringIO()
+    with ProgressReporter("上传", total=10, interval=0.02, stream=stream):
+        time.sleep(0.2)
+        lines_while_stalled = stream.getvalue().count("\n")
+    assert lines_while_stalled >= 2
+    lines = stream.getvalue().splitlines()
+    assert lines[-1].endswith("final=1")
+    # 关闭后后台线程已停止
+    time.sleep(0.05)
+    assert stream.getvalue().splitlines() == lines
@@ -0,0 +1,61 @@
+"""只读排行服务：与去年索引快照对比名次变化"""
+import json
+
+from src.ranking_service import RankingSnapshot
+
+
+def write_export(export_dir, year, entries):
+    export_dir.mkdir(parents=True, exist_ok=True)
+    data = {"metadata": {"year": year},
+            "normal": [entry for entry in entries if not entry["nsfw"]],
+            "nsfw": [entry for entry in entries if entry["nsfw"]]}
+    (export_dir / f"bangumi_worst_anime_{year}.json").write_text(json.dumps(data), encoding="utf-8")
+
+
+def write_index_snapshot(indices_dir, index_id, subjects):
+    indices_dir.mkdir(parents=True, exist_ok=True)
+    (indices_dir / f"index_{index_id}_20250101_000000.json").write_text(
+        json.dumps({"index_info": {"id": index_id}, "subjects": subjects}), encoding="utf-8")
+
+
+def test_index_baseline_compares_normal_entries_by_own_position(tmp_path):
+    # 今年: 1 普通(10)、2 受限(20)、3 普通(11)、4 普通(12)
+    write_export(tmp_path / "json", 2026, [
+        {"id": 10, "name": "a", "rank_position": 1, "nsfw": False},
+        {"id": 20, "name": "b", "rank_position": 2, "nsfw": True},
+        {"id": 11, "name": "c", "rank_position": 3, "nsfw": False},
+        {"id": 12, "name": "d", "rank_position": 4, "nsfw": False},
+    ])
+    # 去年索引: 名次同样与受限内容合并编号（2 为受限条目，不在索引中），13 已落榜
+    write_index_snapshot(tmp_path / "indices", 1, [
+        {"id": 10, "name": "a", "comment": "1 -"},
+        {"id": 11, "name": "c", "comment": "3 ↑1"},
+        {"id": 13, "name": "e", "comment": "4 NEW"},
+    ])
+
+    snapshot = RankingSnapshot(str(tmp_path / "json"), str(tmp_path / "indices"), index_id=1)
+    movers = json.loads(snapshot.responses["/anime/2026/movers"].body)
+
+    assert movers["baseline"] == "index/1"
+    assert [entry["id"] for entry in movers["entered"]] == [12]
+    assert movers["entered"][0]["position"] == 4
+    assert [entry["id"] for entry in movers["left"]] == [13]
+    assert movers["moved"] == []
+
+
+def test_previous_export_baseline(tmp_path):
+    write_export(tmp_path / "json", 2025, [
+        {"id": 10, "name": "a", "rank_position": 1, "nsfw": False},
+        {"id": 20, "name": "b", "rank_position": 2, "nsfw": True},
+    ])
+    write_export(tmp_path / "json", 2026, [
+        {"id": 20, "name": "b", "rank_position": 1, "nsfw": True},
+        {"id": 10, "name": "a", "rank_position": 2, "nsfw": False},
+    ])
+
+    snapshot = RankingSnapshot(str(tmp_path / "json"), str(tmp_path / "indices"), index_id=1)
+    movers = json.loads(snapshot.responses["/anime/2026/movers"].body)
+
+    assert movers["baseline"] == "anime/2025"
+    assert {entry["id"]: (entry["old_position"], entry["position"]) for entry in movers["moved"]} == {
+        20: (2, 1), 10: (1, 2)}
@@ -0,0 +1,55 @@
+"""离线回放：补抓的分页与重叠窗口一起回放，重现抓取时补齐的缺口"""
+import re
+from urllib.parse import parse_qs, urlparse
+
+from main import collect_anime
+from src import api_client
+from src.api_client import BangumiAPIClient
+from src.crawler import BandCrawler
+from src.data_processor import DataProcessor
+from src.replay import DEBUG_DIR, load_captured_pages
+
+
+def make_subject(subject_id: int) -> dict:
+    return {"id": subject_id, "name": f"subject {subject_id}", "name_cn": "", "date": "2020-01-01",
+            "nsfw": False, "rating": {"rank": 10000 + subject_id, "score": 3.0, "total": 100}}
+
+
+class ShiftingCatalog:
+    """第一页返回后，排在最前面的条目离开区间，后面的窗口整体前移，相邻窗口之间出现缺口"""
+
+    def __init__(self, size: int, shift: int):
+        self.subjects = [make_subject(subject_id) for subject_id in range(1, size + 1)]
+        self.shift = shift
+        self.requests = 0
+
+    def __call__(self, method, endpoint, json=None, **kwargs):
+        query = parse_qs(urlparse(endpoint).query)
+        offset, limit = int(query["offset"][0]), int(query["limit"][0])
+        self.requests += 1
+        if self.requests == 2:
+            del self.subjects[:self.shift]
+        return {"total": len(self.subjects), "limit": limit, "offset": offset,
+                "data": self.subjects[offset:offset + limit]}
+
+
+def test_replay_includes_refetched_pages(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(api_client, "BANGUMI_ACCESS_TOKEN", "test-token")
+    client = BangumiAPIClient(save_debug=True)
+    catalog = ShiftingCatalog(size=40, shift=5)
+    monkeypatch.setattr(client, "_make_request", catalog)
+
+    crawler = BandCrawler(client, page_size=10, overlap=2, concurrency=1)
+    items, report = crawler.crawl()
+
+    assert report["gaps_found"] and not report["gaps_unresolved"]
+    assert report["refetched_pages"] >= 1
+    debug_files = [path.name for path in (tmp_path / DEBUG_DIR).iterdir()]
+    assert any(re.match(r"^api_response_refetch_offset_\d+_", name) for name in debug_files)
+
+    replayed = collect_anime(load_captured_pages(str(tmp_path / DEBUG_DIR)), DataProcessor())
+
+    assert {anime["id"] for anime in replayed} == {item["id"] for item in items}
+    # 第一次抓取时落在缺口中的条目只出现在补抓的分页里
+    assert {11, 12, 13} <= {anime["id"] for anime in replayed}
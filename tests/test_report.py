@@ -0,0 +1,47 @@
+"""统计报告：列表和只能遍历一次的迭代器得到相同的统计量，普通/受限内容一侧为空时也能统计"""
+import numpy as np
+import pytest
+
+from src.report import render_markdown, summarize_split, to_columns
+
+ANIME = [
+    {"id": 1, "score": 2.5, "rank": 10010, "rating_total": 120, "nsfw": False},
+    {"id": 2, "score": 3.75, "rank": 10004, "rating_total": 35, "nsfw": True},
+    {"id": 3, "score": None, "rank": 10002, "rating_total": 0, "nsfw": False},
+    {"id": 4, "score": 9.9, "rank": 10001, "rating_total": 4000},
+    {"id": 5, "score": 5.0, "rank": None, "rating_total": None, "nsfw": True},
+]
+
+
+def test_list_and_iterator_give_same_columns_and_summary():
+    from_list = to_columns(ANIME)
+    from_iterator = to_columns(iter(ANIME))
+
+    assert set(from_list) == set(from_iterator)
+    for name in from_list:
+        assert from_list[name].dtype == from_iterator[name].dtype
+        np.testing.assert_array_equal(from_list[name], from_iterator[name])
+    assert summarize_split(ANIME) == summarize_split(anime for anime in ANIME)
+
+
+@pytest.mark.parametrize("nsfw", [False, True])
+def test_split_with_one_side_empty(nsfw):
+    entries = [dict(anime, nsfw=nsfw) for anime in ANIME]
+
+    split = summarize_split(iter(entries))
+
+    present, empty = ("nsfw", "normal") if nsfw else ("normal", "nsfw")
+    assert split[empty] == {"count": 0}
+    assert split[present] == split["all"]
+    assert split["all"]["count"] == len(ANIME)
+    assert split["all"]["score"]["max"] == 9.9
+    assert split["all"]["rank"] == {"min": 0, "max": 10010}
+
+    report = {"generated_at": "2026-01-01T00:00:00", "category": "anime", "year": 2026,
+              "score_bins": np.arange(0.0, 10.5, 0.5).tolist(), "crawled": split, "years": {}}
+    assert "| 全部 | 5 |" in render_markdown(report)
+
+
+def test_empty_input():
+    assert summarize_split([]) == summarize_split(iter([])) == {
+        "all": {"count": 0}, "normal": {"count": 0}, "nsfw": {"count": 0}}
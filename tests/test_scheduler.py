@@ -0,0 +1,126 @@
+"""请求调度器：按优先级放行，同一优先级内按来源轮转，后台预取只在前台空闲后放行"""
+import threading
+import time
+
+import pytest
+
+from src.clock import VirtualClock
+from src.scheduler import BackgroundLane, RequestScheduler
+
+INTERVAL = 10.0
+
+
+class GatedClock(VirtualClock):
+    """虚拟时钟；ready() 为假时 wait 真正阻塞，让多个请求先排好队再依次放行"""
+
+    def __init__(self):
+        super().__init__()
+        self.ready = lambda: True
+
+    def wait(self, condition, timeout):
+        while not self.ready():
+            condition.wait(0.01)
+        super().wait(condition, timeout)
+
+
+def grant_order(scheduler: RequestScheduler, clock: GatedClock, requests):
+    """
+    按顺序把请求排入队列，全部排好后再放行
+
+    Returns:
+        [(优先级, 来源), ...]，按放行顺序排列
+    """
+    # 先放行一次请求，后面的请求都需要等待请求间隔
+    scheduler.acquire("fetch", "prime")
+    granted_before = sum(scheduler.granted.values())
+    order = []
+    gate = threading.Event()
+    # 上一个放行的请求记录下来之后，才放行下一个
+    clock.ready = lambda: gate.is_set() and granted_before + len(order) == sum(scheduler.granted.values())
+
+    def request(priority, flow):
+        scheduler.acquire(priority, flow)
+        order.append((priority, flow))
+
+    threads = []
+    for priority, flow in requests:
+        thread = threading.Thread(target=request, args=(priority, flow), daemon=True)
+        thread.start()
+        threads.append(thread)
+        deadline = time.monotonic() + 5
+        while scheduler.pending() < len(threads):
+            assert time.monotonic() < deadline, "请求没有进入队列"
+            time.sleep(0.001)
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+    return order
+
+
+def test_higher_priority_is_granted_first():
+    clock = GatedClock()
+    scheduler = RequestScheduler(INTERVAL, clock=clock)
+
+    order = grant_order(scheduler, clock, [
+        ("fetch", "anime"), ("prefetch", "watch"), ("hydrate", "anime"), ("upload", "index"), ("interactive", "")])
+
+    assert [priority for priority, _ in order] == ["interactive", "upload", "hydrate", "fetch", "prefetch"]
+
+
+def test_flows_take_turns_within_a_priority():
+    clock = GatedClock()
+    scheduler = RequestScheduler(INTERVAL, clock=clock)
+
+    order = grant_order(scheduler, clock, [
+        ("fetch", "anime"), ("fetch", "anime"), ("fetch", "anime"),
+        ("fetch", "book"), ("fetch", "book"), ("fetch", "music")])
+
+    assert [flow for _, flow in order] == ["anime", "book", "music", "anime", "book", "anime"]
+
+
+def test_prefetch_waits_until_foreground_is_idle():
+    clock = VirtualClock()
+    scheduler = RequestScheduler(INTERVAL, clock=clock)
+
+    assert scheduler.acquire("fetch") == pytest.approx(0, abs=0.1)
+    # 请求间隔之后还要再等一个间隔：前台停止 2 个间隔后才放行
+    assert scheduler.acquire("prefetch") == pytest.approx(2 * INTERVAL, abs=0.1)
+    # 后台请求不推迟前台请求的空闲计时，只占用请求间隔
+    assert scheduler.acquire("fetch") == pytest.approx(INTERVAL, abs=0.1)
+    assert scheduler.acquire("prefetch") == pytest.approx(2 * INTERVAL, abs=0.1)
+
+    clock.sleep(5 * INTERVAL)
+    assert scheduler.acquire("prefetch") == pytest.approx(0, abs=0.1)
+    assert scheduler.stats()["prefetch"]["granted"] == 3
+
+
+def test_background_lane_runs_tasks_in_order_and_stops():
+    lane = BackgroundLane("test")
+    results = []
+    done = threading.Event()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    lane.submit(fail)
+    lane.submit(results.append, 1)
+    lane.submit(lambda: (results.append(2), done.set()))
+    assert done.wait(5)
+    # 失败的任务不影响后面的任务
+    assert results == [1, 2]
+
+    started = threading.Event()
+
+    def long_task():
+        started.set()
+        while not lane.stopped:
+            time.sleep(0.001)
+
+    lane.submit(long_task)
+    lane.submit(results.append, 3)
+    assert started.wait(5)
+    lane.stop(timeout=5)
+
+    # 停止时未开始的任务被丢弃
+    assert results == [1, 2]
+    assert not lane._thread.is_alive()
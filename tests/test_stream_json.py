@@ -0,0 +1,48 @@
+"""增量JSON解析：任意位置切分的字节流与一次性解析结果一致"""
+import json
+
+import pytest
+
+from src.stream_json import iter_array_items
+
+DOCUMENT = json.dumps({
+    "total": 3,
+    "score": 2.5,
+    "ratio": -1.25e-3,
+    "data": [
+        {"id": 1, "name": "名字", "score": 6.75, "tags": ["a", "\"b\""], "nsfw": False},
+        {"id": 22, "name_cn": "", "rating": {"rank": 1234, "score": 1.0e2}, "extra": None},
+        3.5,
+        -12,
+        True,
+    ],
+    "offset": 10,
+}, ensure_ascii=False).encode("utf-8")
+
+
+def split(data: bytes, size: int):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 7])
+def test_chunked_document_matches_json_loads(size):
+    expected = json.loads(DOCUMENT)
+    meta = {}
+
+    items = list(iter_array_items(split(DOCUMENT, size), "data", meta))
+
+    assert items == expected.pop("data")
+    assert meta == expected
+
+
+@pytest.mark.parametrize("chunks, data, meta", [
+    ([b'{"score": 2.', b'5, "data": [{"id": 1}]}'], [{"id": 1}], {"score": 2.5}),
+    ([b'{"data": [1.', b'5]}'], [1.5], {}),
+    ([b'{"data": [1e', b'3, 2]}'], [1000.0, 2], {}),
+    ([b'{"total": 1', b'2, "data": []}'], [], {"total": 12}),
+])
+def test_scalar_split_at_chunk_boundary(chunks, data, meta):
+    received = {}
+
+    assert list(iter_array_items(chunks, "data", received)) == data
+    assert received == meta
@@ -0,0 +1,104 @@
+"""标题检索索引：中日韩二元组、拉丁三元组、单字子串匹配和增量更新"""
+import json
+import os
+
+from src.title_index import TitleIndex, find_sources, title_tokens
+
+
+def write_export(export_dir, year, entries):
+    export_dir.mkdir(parents=True, exist_ok=True)
+    data = {"metadata": {"year": year}, "normal": entries, "nsfw": []}
+    path = export_dir / f"bangumi_worst_anime_{year}.json"
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def write_index_snapshot(indices_dir, index_id, subjects):
+    indices_dir.mkdir(parents=True, exist_ok=True)
+    path = indices_dir / f"index_{index_id}_20250101_000000.json"
+    path.write_text(json.dumps({"index_info": {"id": index_id}, "subjects": subjects}, ensure_ascii=False),
+                    encoding="utf-8")
+    return path
+
+
+def entry(subject_id, name, name_cn="", position=1):
+    return {"id": subject_id, "name": name, "name_cn": name_cn, "rank_position": position,
+            "rank": 10000 + subject_id, "score": 3.0}
+
+
+def build_index(tmp_path) -> TitleIndex:
+    index = TitleIndex()
+    index.update(find_sources(str(tmp_path / "json"), str(tmp_path / "indices")))
+    return index
+
+
+def result_ids(index, query):
+    return [result["id"] for result in index.search(query)]
+
+
+def test_title_tokens():
+    assert title_tokens("進撃の巨人") == {"進撃", "撃の", "の巨", "巨人"}
+    assert title_tokens("Ｆａｔｅ") == {" fa", "fat", "ate", "te "}
+    assert title_tokens("龙") == {"龙"}
+
+
+def test_cjk_bigram_and_latin_trigram_matching(tmp_path):
+    write_export(tmp_path / "json", 2026, [
+        entry(1, "進撃の巨人", "进击的巨人", 1),
+        entry(2, "Fate/stay night", "命运之夜", 2),
+        entry(3, "巨人の星", "", 3),
+    ])
+    index = build_index(tmp_path)
+
+    # "巨人" 的二元组同时出现在两个标题中，"进击" 只在一个标题中
+    assert sorted(result_ids(index, "巨人")) == [1, 3]
+    assert result_ids(index, "进击的")[0] == 1
+    # 拉丁三元组：大小写和全角不影响匹配，拼写有误时按命中比例排序
+    assert result_ids(index, "STAY NIGHT") == [2]
+    assert result_ids(index, "stya night")[0] == 2
+    assert index.search("stay night")[0]["occurrences"] == {"anime/2026": {"position": 2, "rank": 10002, "score": 3.0}}
+
+
+def test_single_cjk_character_falls_back_to_substring(tmp_path):
+    write_export(tmp_path / "json", 2026, [
+        entry(1, "進撃の巨人", "进击的巨人", 1),
+        entry(2, "Fate/stay night", "命运之夜", 2),
+    ])
+    index = build_index(tmp_path)
+
+    # 单字不会被切分成二元组，按子串匹配
+    assert result_ids(index, "夜") == [2]
+    assert result_ids(index, "人") == [1]
+    assert result_ids(index, "猫") == []
+
+
+def test_incremental_update(tmp_path):
+    export_path = write_export(tmp_path / "json", 2026, [entry(1, "進撃の巨人", "进击的巨人", 1)])
+    snapshot_path = write_index_snapshot(tmp_path / "indices", 7, [
+        {"id": 1, "name": "進撃の巨人", "comment": "2 ↑1"},
+        {"id": 4, "name": "ポプテピピック", "comment": "5 NEW"},
+    ])
+    index = build_index(tmp_path)
+    sources = find_sources(str(tmp_path / "json"), str(tmp_path / "indices"))
+    assert set(index.subjects[1]["occurrences"]) == {"anime/2026", "index/7"}
+    assert result_ids(index, "ポプテ") == [4]
+
+    # 没有变化时不重新处理
+    assert index.update(sources) == []
+
+    # 导出文件变化后重新处理该文件，旧标题的 n-gram 被移除
+    write_export(tmp_path / "json", 2026, [entry(2, "Fate/stay night", "命运之夜", 1)])
+    os.utime(export_path, ns=(1_000_000_000, 1_000_000_000))
+    assert index.update(sources) == ["anime/2026"]
+    assert result_ids(index, "命运") == [2]
+    # 条目 1 仍在索引快照中，只剩该来源的记录
+    assert set(index.subjects[1]["occurrences"]) == {"index/7"}
+
+    # 删除的来源不再出现在结果和倒排表中
+    os.remove(snapshot_path)
+    assert index.update(find_sources(str(tmp_path / "json"), str(tmp_path / "indices"))) == ["index/7"]
+    assert set(index.subjects) == {2}
+    assert result_ids(index, "ポプテ") == []
+    assert result_ids(index, "巨人") == []
+    assert all(ids == {2} for ids in index.postings.values())
+    assert set(index.sources) == {"anime/2026"}
@@ -0,0 +1,31 @@
+"""监视模式：排名在分页之间变化时，区间抓取按条目ID去重"""
+from src.data_processor import DataProcessor
+from src.watcher import RankingWatcher
+
+
+class InsertingClient:
+    """第一页返回后，区间最前面插入一个新条目，后面的分页整体后移一位"""
+
+    def __init__(self, size: int, page_size: int):
+        self.subjects = [{"id": subject_id, "rank": 10000 + subject_id} for subject_id in range(size)]
+        self.page_size = page_size
+        self.requests = 0
+
+    def search_worst_anime(self, offset=0, min_rank=0, project=None, **kwargs):
+        self.requests += 1
+        if self.requests == 2:
+            self.subjects.insert(0, {"id": 100, "rank": 20000})
+        return {"total": len(self.subjects), "offset": offset,
+                "data": self.subjects[offset:offset + self.page_size]}
+
+
+def test_fetch_band_dedups_shifted_pages():
+    client = InsertingClient(size=10, page_size=5)
+    watcher = RankingWatcher(client, DataProcessor(), exporter=None, year=2026, top_n=5)
+
+    band = watcher.fetch_band(min_rank=0)
+
+    ids = [anime["id"] for anime in band]
+    assert len(ids) == len(set(ids))
+    # 第二页重复了第一页末尾的条目 4
+    assert ids == list(range(10))
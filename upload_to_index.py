@@ -2,30 +2,40 @@
 Bangumi索引上传脚本
 将烂番排行数据上传到Bangumi索引
 """
+import argparse
 import json
-import time
+import logging
 import requests
 from pathlib import Path
 from typing import Dict, List, Tuple
-from dotenv import load_dotenv
-import os
-
-# 加载环境变量
-load_dotenv()
-
-# 配置参数
-BANGUMI_BASE_URL = "https://api.bgm.tv"
-BANGUMI_ACCESS_TOKEN = os.getenv("BANGUMI_ACCESS_TOKEN")
-NEW_INDEX_ID = 87084  # 今年的索引ID
-OLD_INDEX_ID = 74044  # 去年的索引ID
-RATE_LIMIT_DELAY = 1  # API调用间隔（秒）
-RETRY_TIMES = 3  # 重试次数
-RETRY_DELAY = 2  # 重试延迟（秒）
-
-# 数据文件路径
-DATA_FILE = Path(__file__).parent / "output" / "json" / "bangumi_worst_anime_2026.json"
-LAST_YEAR_INDICES_DIR = Path(__file__).parent / "output" / "indices"
-LAST_YEAR_RANKS_DIR = Path(__file__).parent / "output" / "ranks"
+from config.config import (
+    BANGUMI_BASE_URL,
+    BANGUMI_ACCESS_TOKEN,
+    NEW_INDEX_ID,
+    OLD_INDEX_ID,
+    REQUEST_TIMEOUT,
+    RETRY_TIMES,
+    RETRY_DELAY,
+    JSON_OUTPUT_DIR,
+    EXPORTS_DIR,
+    INDEX_DESCRIPTION_LIMIT,
+    INDICES_DIR,
+    RANKS_DIR
+)
+from src.description_codec import render_description
+from src.index_snapshot import iter_snapshot_subjects
+from src.log import add_logging_arguments, get_logger, kv, setup_logging_from_args
+from src.metrics import enable_run_report, pace, send_request, sleep_before_retry
+from src.profiling import add_profile_argument, setup_profiling
+from src.progress import ProgressReporter
+from src.tracing import add_trace_argument, setup_tracing, span
+
+# 数据文件路径（与其他脚本一样相对于当前目录）
+DATA_FILE = Path(JSON_OUTPUT_DIR) / "bangumi_worst_anime_2026.json"
+LAST_YEAR_INDICES_DIR = Path(INDICES_DIR)
+LAST_YEAR_RANKS_DIR = Path(RANKS_DIR)
+
+logger = get_logger("upload_to_index")
 
 
 class IndexUploader:
@@ -59,31 +69,27 @@ class IndexUploader:
         """发送HTTP请求，带重试机制"""
         url = f"{self.base_url}{endpoint}"
 
-        # 打印请求信息
-        print(f"\n{'='*60}")
-        print(f"请求详情:")
-        print(f"  方法: {method}")
-        print(f"  URL: {url}")
-        print(f"  Headers: {dict(self.session.headers)}")
-        if 'json' in kwargs:
-            print(f"  Payload: {json.dumps(kwargs['json'], ensure_ascii=False, indent=2)}")
-        print(f"{'='*60}\n")
+        # 请求详情只在DEBUG级别记录（令牌会被隐藏）
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("请求详情", extra=kv(method=method, url=url, headers=dict(self.session.headers),
+                                              payload=kwargs.get('json'), sample=True))
 
         for attempt in range(RETRY_TIMES):
             try:
-                response = self.session.request(
-                    method=method,
-                    url=url,
-                    timeout=30,
+                # 索引写入优先于同时进行的抓取请求
+                pace(method, url, "upload")
+                response = send_request(
+                    self.session,
+                    method,
+                    url,
+                    timeout=REQUEST_TIMEOUT,
                     **kwargs
                 )
 
-                # 打印响应信息
-                print(f"响应详情:")
-                print(f"  状态码: {response.status_code}")
-                print(f"  响应头: {dict(response.headers)}")
-                print(f"  响应体: {response.text}")
-                print(f"{'='*60}\n")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("响应详情", extra=kv(url=url, status=response.status_code,
+                                                      headers=dict(response.headers), body=response.text,
+                                                      sample=True))
 
                 if response.status_code in [200, 204]:
                     if response.content:
@@ -93,20 +99,22 @@ class IndexUploader:
                     raise Exception("认证失败：Token无效或已过期")
                 elif response.status_code == 429:
                     wait_time = RETRY_DELAY * (attempt + 1)
-                    print(f"触发速率限制，等待{wait_time}秒后重试...")
-                    time.sleep(wait_time)
+                    logger.warning("触发速率限制，等待后重试",
+                                   extra=kv(url=url, wait=wait_time, attempt=attempt + 1))
+                    sleep_before_retry(method, url, wait_time, "rate_limit")
                     continue
                 else:
-                    print(f"请求失败，状态码: {response.status_code}, 响应: {response.text}")
+                    logger.warning("请求失败", extra=kv(url=url, status=response.status_code,
+                                                        body=response.text[:500], attempt=attempt + 1))
                     if attempt < RETRY_TIMES - 1:
-                        time.sleep(RETRY_DELAY)
+                        sleep_before_retry(method, url, RETRY_DELAY)
                         continue
                     response.raise_for_status()
 
             except requests.exceptions.RequestException as e:
-                print(f"请求异常: {e}")
+                logger.warning("请求异常", extra=kv(url=url, error=str(e), attempt=attempt + 1))
                 if attempt < RETRY_TIMES - 1:
-                    time.sleep(RETRY_DELAY)
+                    sleep_before_retry(method, url, RETRY_DELAY)
                 else:
                     raise
 
@@ -151,12 +159,8 @@ class IndexUploader:
             latest_file = max(index_files, key=lambda f: f.stat().st_mtime)
             print(f"使用文件: {latest_file.name}")
 
-            # 读取JSON文件
-            with open(latest_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
-            subjects = data.get('subjects', [])
-            for subject in subjects:
+            # 逐条读取快照中的条目（兼容内联JSON和NDJSON快照）
+            for subject in iter_snapshot_subjects(str(latest_file)):
                 subject_id = subject.get('id')
                 # 从comment中提取排名，格式如 "1 -" 或 "1 ↑2"
                 comment = subject.get('comment', '')
@@ -244,10 +248,17 @@ class IndexUploader:
             return f"{current_rank} -"
 
 
-    def generate_description(self) -> str:
-        """生成索引描述，包含NSFW条目列表"""
+    def generate_description(self, max_length: int = INDEX_DESCRIPTION_LIMIT) -> List[str]:
+        """生成索引描述，包含NSFW条目列表
+
+        Args:
+            max_length: 每段描述的最大字符数，超出时拆分为多段（None 表示不拆分）
+
+        Returns:
+            各段描述，第一段用于索引本身
+        """
         # 基础描述
-        desc_lines = [
+        header = [
             "根据制表时的排名倒序排序",
             "制表时间：26/01/01",
             "排名后箭头代表和前一年表格排名变化",
@@ -256,15 +267,28 @@ class IndexUploader:
             "受限条目不直接录入，在此单独列出："
         ]
 
-        # 添加NSFW条目列表，带排名变化
+        # NSFW条目列表，带排名变化（generate_comment 的结果为 "名次 变化"）
+        entries = []
         for subject in self.nsfw_subjects:
-            rank_pos = subject['rank_position']
-            subject_id = subject['id']
-            name = subject.get('name_cn') or subject.get('name', '')
-            comment = self.generate_comment(rank_pos, subject_id, is_nsfw=True)
-            desc_lines.append(f"{comment} [url=https://bgm.tv/subject/{subject_id}]{name}[/url]")
-
-        return "\r\n".join(desc_lines)
+            comment = self.generate_comment(subject['rank_position'], subject['id'], is_nsfw=True)
+            entries.append({
+                "rank_position": subject['rank_position'],
+                "change": comment.partition(" ")[2],
+                "id": subject['id'],
+                "name": subject.get('name_cn') or subject.get('name', ''),
+            })
+
+        return render_description(header, entries, max_length=max_length)
+
+    def save_description_parts(self, parts: List[str]):
+        """描述超过长度限制时，保存所有分段以便手动发布第二段起的内容"""
+        output_dir = Path(EXPORTS_DIR)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        print(f"⚠ 描述超过 {INDEX_DESCRIPTION_LIMIT} 字符，已拆分为 {len(parts)} 段，第2段起需要手动发布")
+        for number, part in enumerate(parts, 1):
+            path = output_dir / f"index_{NEW_INDEX_ID}_description_{number}.txt"
+            path.write_text(part, encoding="utf-8")
+            print(f"  第{number}段（{len(part)} 字符）: {path}")
 
     def update_index_info(self, title: str, description: str):
         """更新索引的标题和描述"""
@@ -276,21 +300,6 @@ class IndexUploader:
         print("⚠ 跳过索引信息更新 (PUT /v0/indices/{index_id} API有bug)")
         return {}
 
-        # endpoint = f"/v0/indices/{NEW_INDEX_ID}"
-        # payload = {
-        #     "title": title,
-        #     "description": description
-        # }
-
-        # try:
-        #     result = self._make_request("PUT", endpoint, json=payload)
-        #     print("✓ 索引信息更新成功")
-        #     time.sleep(RATE_LIMIT_DELAY)
-        #     return result
-        # except Exception as e:
-        #     print(f"✗ 索引信息更新失败: {e}")
-        #     raise
-
     def upload_subject(self, subject_id: int, rank_position: int, comment: str):
         """上传单个条目到索引（使用PUT方法，如果不存在会自动创建）"""
         endpoint = f"/v0/indices/{NEW_INDEX_ID}/subjects/{subject_id}"
@@ -301,10 +310,9 @@ class IndexUploader:
 
         try:
             result = self._make_request("PUT", endpoint, json=payload)
-            time.sleep(RATE_LIMIT_DELAY)
             return result
         except Exception as e:
-            print(f"  ✗ 上传失败 (ID: {subject_id}): {e}")
+            logger.error("上传失败", extra=kv(subject_id=subject_id, error=str(e)))
             return None
 
     def upload_all_subjects(self):
@@ -314,20 +322,20 @@ class IndexUploader:
         success_count = 0
         fail_count = 0
 
-        for idx, subject in enumerate(self.normal_subjects, 1):
-            subject_id = subject['id']
-            rank_position = subject['rank_position']
-            name = subject.get('name_cn') or subject.get('name', '')
-            comment = self.generate_comment(rank_position, subject_id)
+        with ProgressReporter("上传条目", total=len(self.normal_subjects)) as progress:
+            for subject in self.normal_subjects:
+                subject_id = subject['id']
+                rank_position = subject['rank_position']
+                comment = self.generate_comment(rank_position, subject_id)
 
-            print(f"[{idx}/{len(self.normal_subjects)}] 上传: {name} (ID: {subject_id}, 排名: {rank_position}, Comment: {comment})")
+                with span("subject", "subject", id=subject_id, rank_position=rank_position):
+                    result = self.upload_subject(subject_id, rank_position, comment)
+                if result is not None:
+                    success_count += 1
+                else:
+                    fail_count += 1
 
-            result = self.upload_subject(subject_id, rank_position, comment)
-            if result is not None:
-                success_count += 1
-                print(f"  ✓ 成功")
-            else:
-                fail_count += 1
+                progress.update()
 
         print(f"\n上传完成: 成功 {success_count} 个, 失败 {fail_count} 个")
         return success_count, fail_count
@@ -343,23 +351,30 @@ class IndexUploader:
 
         try:
             # 加载数据
-            metadata = self.load_data()
+            with span("load_data"):
+                metadata = self.load_data()
             print(f"数据年份: {metadata.get('year', 'N/A')}")
             print(f"获取时间: {metadata.get('fetch_date', 'N/A')}")
 
             # 获取去年的排名数据
-            self.fetch_last_year_rankings()
-            self.fetch_last_year_nsfw_rankings()
+            with span("load_last_year_rankings"):
+                self.fetch_last_year_rankings()
+                self.fetch_last_year_nsfw_rankings()
 
             # 生成描述
-            description = self.generate_description()
+            with span("generate_description"):
+                description_parts = self.generate_description()
+            if len(description_parts) > 1:
+                self.save_description_parts(description_parts)
 
             # 步骤1: 更新索引信息
             title = "BANGUMI最差动漫TOP100（2026）"
-            self.update_index_info(title, description)
+            with span("update_index_info"):
+                self.update_index_info(title, description_parts[0])
 
             # 步骤2: 上传所有条目
-            success_count, fail_count = self.upload_all_subjects()
+            with span("upload_all_subjects", items=len(self.normal_subjects)):
+                success_count, fail_count = self.upload_all_subjects()
 
             # 完成
             elapsed_time = time_module.time() - start_time
@@ -377,11 +392,22 @@ class IndexUploader:
             raise
 
 
-def main():
+def main(argv=None):
     """主入口函数"""
+    parser = argparse.ArgumentParser(description="将烂番排行数据上传到Bangumi索引")
+    add_trace_argument(parser)
+    add_profile_argument(parser)
+    add_logging_arguments(parser)
+    args = parser.parse_args(argv)
+    setup_logging_from_args(args)
+
+    enable_run_report("upload_to_index")
+    setup_tracing("upload_to_index", args.trace)
+    setup_profiling("upload_to_index", args.profile)
     try:
         uploader = IndexUploader()
-        uploader.run()
+        with span("upload_to_index", "run"):
+            uploader.run()
     except Exception as e:
         print(f"\n程序异常退出: {e}")
         exit(1)